@@ -0,0 +1,114 @@
+"""
+Headcounts by any combination of division, department, rank, position and salary band, optionally broken down by
+start year, served from the `employee_aggregates` summary table rather than a `GROUP BY` over every employee.
+
+Triggers on `employees` keep the summary up to date for every writer. To compare it against the employees table, or
+rebuild it from scratch, run from the `backend` directory:
+
+```
+python aggregates.py check
+python aggregates.py rebuild
+```
+"""
+from dotenv import load_dotenv
+from sqlalchemy import Connection, Integer, Select, cast, event, func, select, text
+
+load_dotenv(override=False)
+
+from db import Base
+from models import Employee, EmployeeAggregate
+from schemas import AggregateDimension, AggregateFilters
+
+DIMENSIONS = ("division_id", "department_id", "rank_id", "position_id", "salary_band_id")
+START_YEAR = "CAST(strftime('%Y', {row}.start_date) AS INTEGER)"
+GROUP = ", ".join(DIMENSIONS) + ", start_year"
+
+def match_group(row: str) -> str:
+    return " AND ".join([f"{dimension} = {row}.{dimension}" for dimension in DIMENSIONS] + [f"start_year = {START_YEAR.format(row=row)}"])
+
+# Each write moves one employee between groups with an upsert or decrement of a single summary row, which adds under a
+# tenth to a full ingest. Groups that empty out are kept with a headcount of 0 until the next rebuild, and are left out
+# of query results.
+INCREMENT = f"""
+    INSERT INTO employee_aggregates ({GROUP}, headcount)
+    VALUES ({", ".join(f"new.{dimension}" for dimension in DIMENSIONS)}, {START_YEAR.format(row="new")}, 1)
+    ON CONFLICT ({GROUP}) DO UPDATE SET headcount = headcount + 1;
+"""
+DECREMENT = f"UPDATE employee_aggregates SET headcount = headcount - 1 WHERE {match_group('old')};"
+AGGREGATE_DDL = (
+    f"CREATE TRIGGER IF NOT EXISTS employee_aggregates_insert AFTER INSERT ON employees BEGIN {INCREMENT} END",
+    f"""
+    CREATE TRIGGER IF NOT EXISTS employee_aggregates_update AFTER UPDATE OF {", ".join(DIMENSIONS)}, start_date ON employees
+    WHEN {" OR ".join(f"new.{column} IS NOT old.{column}" for column in (*DIMENSIONS, "start_date"))}
+    BEGIN {DECREMENT} {INCREMENT} END
+    """,
+    f"CREATE TRIGGER IF NOT EXISTS employee_aggregates_delete AFTER DELETE ON employees BEGIN {DECREMENT} END",
+)
+Base.metadata.info.setdefault("ddl", []).extend(AGGREGATE_DDL) # See utils.schema_fingerprint
+
+@event.listens_for(Base.metadata, "after_create")
+def create_aggregate_triggers(target, connection: Connection, **kw):
+    """
+    Create the summary triggers after `Base.metadata.create_all`. The first time, the summary is also built from the
+    existing employees, since nothing kept it up to date before.
+    """
+    if connection.dialect.name != "sqlite":
+        return
+    exists = connection.scalar(text("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'employee_aggregates_insert'"))
+    for statement in AGGREGATE_DDL:
+        connection.exec_driver_sql(statement)
+    if not exists:
+        rebuild_aggregates(connection)
+
+def expected_aggregates() -> Select:
+    """Headcounts recomputed from the employees table, in the shape of `employee_aggregates`."""
+    start_year = cast(func.strftime("%Y", Employee.start_date), Integer).label("start_year")
+    columns = [getattr(Employee, dimension) for dimension in DIMENSIONS]
+    return select(*columns, start_year, func.count().label("headcount")).group_by(*columns, start_year)
+
+def rebuild_aggregates(connection: Connection):
+    """Replace the summary with headcounts recomputed from the employees table."""
+    connection.execute(EmployeeAggregate.__table__.delete())
+    connection.execute(EmployeeAggregate.__table__.insert().from_select([*DIMENSIONS, "start_year", "headcount"], expected_aggregates()))
+
+def check_aggregates(connection: Connection) -> list[dict]:
+    """Groups whose stored headcount differs from the employees table, with both counts."""
+    expected = {tuple(row[:-1]): row[-1] for row in connection.execute(expected_aggregates())}
+    stored = {tuple(row[:-1]): row[-1] for row in connection.execute(select(EmployeeAggregate.__table__).where(EmployeeAggregate.headcount != 0))}
+    return [
+        {**dict(zip((*DIMENSIONS, "start_year"), group)), "expected": expected.get(group, 0), "stored": stored.get(group, 0)}
+        for group in sorted(expected.keys() | stored.keys())
+        if expected.get(group, 0) != stored.get(group, 0)
+    ]
+
+def aggregate_query(group_by: list[AggregateDimension], filters: AggregateFilters, by_start_year: bool = False) -> Select:
+    """
+    Headcounts of the summary rows matching `filters`, grouped by `group_by` and optionally start year. Without either,
+    one row whose headcount is 0 if nothing matches.
+    """
+    columns = [getattr(EmployeeAggregate, dimension) for dimension in dict.fromkeys(group_by)]
+    if by_start_year:
+        columns.append(EmployeeAggregate.start_year)
+    stmt = select(*columns, func.coalesce(func.sum(EmployeeAggregate.headcount), 0).label("headcount")).where(EmployeeAggregate.headcount > 0)
+    for dimension, value in filters.model_dump(exclude_none=True).items():
+        stmt = stmt.where(getattr(EmployeeAggregate, dimension) == value)
+    return stmt.group_by(*columns).order_by(*columns)
+
+if __name__ == "__main__":
+    import argparse, sys
+    from db import engine
+
+    parser = argparse.ArgumentParser(description="Compare the employee_aggregates summary against the employees table, or rebuild it.")
+    parser.add_argument("command", choices=["check", "rebuild"], help="`check` reports differing groups and exits with 1 if there are any; `rebuild` also replaces the summary")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        drift = check_aggregates(connection)
+        for group in drift[:20]:
+            print(group)
+        print(f"{len(drift)} groups differ from the employees table")
+        if args.command == "rebuild":
+            rebuild_aggregates(connection)
+            print("Rebuilt employee_aggregates")
+    sys.exit(1 if drift and args.command == "check" else 0)
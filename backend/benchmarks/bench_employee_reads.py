@@ -0,0 +1,76 @@
+"""
+Benchmark loading a page of dashboard rows: the six-request flow joined on the client against `/employees/enriched`.
+
+Run from the `backend` directory:
+
+```
+python -m benchmarks.bench_employee_reads --employees 10000 --limit 1000
+```
+"""
+import os, tempfile
+from statistics import median
+from time import perf_counter
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/bench_reads.db"
+os.environ.setdefault("CONFIG_PATH", "config.yaml")
+os.environ.setdefault("SCHEMA_DIR_PATH", "division_schemas")
+
+from fastapi.testclient import TestClient
+
+from benchmarks.bench_upsert import make_records
+from db import engine, get_db_context
+from db_ops import add_employees_from_records
+from models import Base
+from utils import seed_db
+
+def six_requests(client: TestClient, limit: int) -> tuple[list[dict], int]:
+    """The dashboard's previous flow: employees plus every reference table, joined client-side."""
+    responses = [client.get(path) for path in (f"/employees/?limit={limit}", "/divisions/", "/ranks/", "/positions/", "/departments/", "/bands/")]
+    employees, _, ranks, positions, departments, _ = [response.json() for response in responses]
+    rank_map = {r["id"]: r["name"] for r in ranks}
+    position_map = {p["id"]: p["name"] for p in positions}
+    department_map = {d["id"]: d["name"] for d in departments}
+    rows = [{**e, "rank": rank_map[e["rank_id"]], "position": position_map[e["position_id"]], "department": department_map[e["department_id"]]} for e in employees["items"]]
+    return rows, sum(len(response.content) for response in responses)
+
+def enriched(client: TestClient, limit: int, format: str) -> tuple[list[dict], int]:
+    """One request to `/employees/enriched`."""
+    response = client.get(f"/employees/enriched?limit={limit}&format={format}")
+    body = response.json()
+    rows = body["items"] if format == "rows" else [dict(zip(body["columns"], values)) for values in zip(*body["columns"].values())]
+    return rows, len(response.content)
+
+def bench(client: TestClient, fn, *args, repeat: int) -> tuple[float, int]:
+    """Returns the median latency in milliseconds and the response bytes of `fn`."""
+    timings = []
+    for _ in range(repeat):
+        start = perf_counter()
+        _, size = fn(client, *args)
+        timings.append((perf_counter() - start) * 1000)
+    return median(timings), size
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--employees", type=int, default=10_000)
+    parser.add_argument("--limit", type=int, default=1_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    with get_db_context() as db:
+        seed_db(db)
+        add_employees_from_records(make_records(args.employees), 1, db)
+
+    from main import app
+    with TestClient(app) as client:
+        print(f"{args.employees} employees, page of {args.limit}, median of {args.repeat}")
+        for name, fn, fn_args in (
+            ("six requests + client join", six_requests, (args.limit,)),
+            ("/employees/enriched rows", enriched, (args.limit, "rows")),
+            ("/employees/enriched columnar", enriched, (args.limit, "columnar")),
+        ):
+            latency, size = bench(client, fn, *fn_args, repeat=args.repeat)
+            print(f"{name:<30} {latency:8.1f} ms {size / 1024:8.1f} KiB")
@@ -0,0 +1,99 @@
+"""
+Benchmark `ingest.py` serially and with a process pool over a synthetic tree of divisions and dated CSVs.
+
+Run from the `backend` directory:
+
+```
+python -m benchmarks.bench_ingest_parallel --divisions 8 --dates 4 --rows 5000 --workers 4
+```
+"""
+import os, csv, random, hashlib, tempfile, yaml
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+from time import perf_counter
+
+_tmp_dir = Path(tempfile.mkdtemp())
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/bench_ingest.db"
+os.environ["CONFIG_PATH"] = str(_tmp_dir / "config.yaml")
+os.environ["SCHEMA_DIR_PATH"] = str(_tmp_dir / "division_schemas")
+
+def make_tree(divisions: int, dates: int, rows: int, seed: int = 0) -> Path:
+    """Write a config, one division-1 style schema per division and `dates` snapshots of `rows` employees per division."""
+    rng = random.Random(seed)
+    with open("config.yaml") as f:
+        config = yaml.safe_load(f)
+    with open(Path("division_schemas") / "division_1.yaml") as f:
+        schema = yaml.safe_load(f)
+
+    config["divisions"] = list(range(1, divisions + 1))
+    with open(os.environ["CONFIG_PATH"], "w") as f:
+        yaml.safe_dump(config, f, sort_keys=False)
+
+    schema_dir = Path(os.environ["SCHEMA_DIR_PATH"]); schema_dir.mkdir()
+    data_dir = _tmp_dir / "data"
+    for division_id in config["divisions"]:
+        with open(schema_dir / f"division_{division_id}.yaml", "w") as f:
+            yaml.safe_dump({**schema, "division_id": division_id}, f, sort_keys=False)
+
+        division_dir = data_dir / f"division_{division_id:03d}"; division_dir.mkdir(parents=True)
+        for day in range(1, dates + 1):
+            with open(division_dir / f"employees_202401{day:02d}.csv", "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["Name", "Position", "Department", "Salary Band", "Contact Number", "Start Date"])
+                for i in range(rows):
+                    writer.writerow([
+                        f"D{division_id}First{i} D{division_id}Surname{i}",
+                        f"{rng.choice(config['ranks'])} {rng.choice(config['positions'])}",
+                        rng.choice(config["departments"]),
+                        rng.choice(config["salary_bands"]),
+                        f"+44 7{rng.randint(100, 999)} {rng.randint(100000, 999999)}",
+                        f"20{rng.randint(10, 23)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}",
+                    ])
+    return data_dir
+
+def table_digest() -> str:
+    """Hash every employee row so runs can be compared."""
+    from sqlalchemy import text
+    from db import engine
+    digest = hashlib.md5()
+    with engine.connect() as conn:
+        for row in conn.execute(text("SELECT * FROM employees ORDER BY id")):
+            digest.update(repr(tuple(row)).encode())
+    return digest.hexdigest()
+
+def run(data_dir: Path, workers: int) -> tuple[float, str, str]:
+    """Ingest the tree into a fresh database. Returns wall-clock seconds, printed output and table digest."""
+    from db import engine
+    from models import Base
+    from ingest import ingest_directory
+
+    Base.metadata.drop_all(bind=engine)
+    output = StringIO()
+    start = perf_counter()
+    with redirect_stdout(output):
+        ingest_directory(data_dir, workers=workers)
+    return perf_counter() - start, output.getvalue(), table_digest()
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--divisions", type=int, default=8)
+    parser.add_argument("--dates", type=int, default=4)
+    parser.add_argument("--rows", type=int, default=5_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    data_dir = make_tree(args.divisions, args.dates, args.rows)
+    total_rows = args.divisions * args.dates * args.rows
+
+    serial_seconds, serial_output, serial_digest = run(data_dir, 1)
+    assert f"Created {args.rows} employees" in serial_output, serial_output
+    parallel_seconds, parallel_output, parallel_digest = run(data_dir, args.workers)
+
+    print(f"{args.divisions} divisions x {args.dates} dates x {args.rows} rows ({total_rows} rows), {os.cpu_count()} CPUs")
+    print(f"serial      {serial_seconds:8.2f}s {total_rows / serial_seconds:>10.0f} rows/s")
+    print(f"{args.workers:>2} workers  {parallel_seconds:8.2f}s {total_rows / parallel_seconds:>10.0f} rows/s")
+    print(f"speedup     {serial_seconds / parallel_seconds:8.2f}x")
+    print(f"identical   {serial_output == parallel_output and serial_digest == parallel_digest}")
@@ -0,0 +1,150 @@
+"""
+Benchmark each layer of the ingest path over a synthetic tree from `benchmarks.synthetic`: `DivisionCSVParser.parse_csv`,
+`add_employees_from_records`, `ingest.py` end to end and `/upload-csv` through the FastAPI TestClient. Reports rows/s,
+peak RSS and SQL statements per stage, and writes the results as JSON so runs on different commits can be compared.
+
+Run from the `backend` directory:
+
+```
+python -m benchmarks.bench_ingest_suite --rows 20000 --snapshots 3 --output results.json
+python -m benchmarks.bench_ingest_suite --rows 20000 --snapshots 3 --compare results.json
+```
+"""
+import os, sys, json, platform, resource, subprocess, tempfile
+from contextlib import redirect_stdout
+from datetime import datetime
+from io import StringIO
+from pathlib import Path
+from time import perf_counter, sleep
+
+STAGES = ("parse", "upsert", "ingest", "upload")
+
+def count_queries(*engines) -> list[int]:
+    """Count statements executed on `engines` into the returned one-item list."""
+    from sqlalchemy import event
+
+    count = [0]
+    def increment(*args):
+        count[0] += 1
+    for engine in set(engines):
+        event.listen(getattr(engine, "sync_engine", engine), "before_cursor_execute", increment)
+    return count
+
+def division_files(data_dir: Path) -> list[tuple[int, Path, datetime]]:
+    """The tree's CSVs as (division_id, path, date), numbered and ordered as `ingest.py` would load them."""
+    from ingest import get_csv_path_dates
+
+    division_dirs = sorted((dir for dir in data_dir.iterdir() if dir.is_dir() and "division" in dir.name.lower()), key=lambda dir: dir.name)
+    return [(division_id, csv_path, csv_date) for division_id, division_dir in enumerate(division_dirs, start=1) for csv_path, csv_date in get_csv_path_dates(division_dir)]
+
+def run_stage(stage: str, data_dir: Path) -> dict:
+    """Run one stage against a fresh database and return its measurements. Called in a fresh interpreter per stage."""
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench_ingest_suite.db"
+    os.environ.setdefault("CONFIG_PATH", "config.yaml")
+    os.environ.setdefault("SCHEMA_DIR_PATH", "division_schemas")
+
+    from db import engine, read_engine, async_engine, async_read_engine, get_db_context
+    from db_ops import add_employees_from_records
+    from models import Base
+    from parsers import csv_parser
+    from utils import seed_db
+
+    files = division_files(data_dir)
+    rows = sum(sum(1 for _ in open(path)) - 1 for _, path, _ in files)
+    Base.metadata.create_all(bind=engine)
+    with get_db_context() as db:
+        seed_db(db)
+        parsed = [(division_id, csv_parser.parse_csv(path, csv_parser.plans[division_id], db)[0], csv_date) for division_id, path, csv_date in files] if stage == "upsert" else None
+
+    queries = count_queries(engine, read_engine, async_engine, async_read_engine)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = perf_counter()
+    if stage == "parse":
+        with get_db_context() as db:
+            for division_id, path, _ in files:
+                csv_parser.parse_csv(path, csv_parser.plans[division_id], db)
+    elif stage == "upsert":
+        rows = sum(len(records) for _, records, _ in parsed)
+        with get_db_context() as db:
+            for division_id, records, csv_date in parsed:
+                add_employees_from_records(records, division_id, db, csv_date)
+    elif stage == "ingest":
+        from ingest import ingest_directory
+        with redirect_stdout(StringIO()):
+            ingest_directory(data_dir)
+    elif stage == "upload":
+        from fastapi.testclient import TestClient
+        from main import app
+        with TestClient(app) as client:
+            for division_id, path, _ in files:
+                with open(path, "rb") as f:
+                    job = client.post("/upload-csv", files={"file": (path.name, f, "text/csv")}, data={"division_id": division_id}).raise_for_status().json()
+                while job["state"] not in ("succeeded", "failed"):
+                    sleep(0.02)
+                    job = client.get(f"/jobs/{job['id']}").json()
+                assert job["state"] == "succeeded", job["detail"]
+    else:
+        raise ValueError(f"Unknown stage '{stage}'. Use one of {', '.join(STAGES)}.")
+    seconds = perf_counter() - start
+
+    # ru_maxrss is in KiB on Linux
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {"stage": stage, "rows": rows, "seconds": round(seconds, 3), "rows_per_sec": round(rows / seconds), "peak_rss_mb": round(peak_rss / 1024, 1), "rss_growth_mb": round((peak_rss - rss_before) / 1024, 1), "queries": queries[0]}
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_results(results: list[dict], baseline: dict | None = None):
+    """Print a table of stage results, with the change in rows/s against a baseline run when given."""
+    previous = {result["stage"]: result for result in baseline["results"]} if baseline else {}
+    print(f"{'stage':<8} {'rows':>8} {'seconds':>8} {'rows/s':>9} {'peak MiB':>9} {'queries':>8}" + (f" {'vs ' + (baseline['commit'] or 'baseline'):>14}" if baseline else ""))
+    for r in results:
+        line = f"{r['stage']:<8} {r['rows']:>8} {r['seconds']:8.2f} {r['rows_per_sec']:>9} {r['peak_rss_mb']:9.1f} {r['queries']:>8}"
+        if r["stage"] in previous:
+            line += f" {(r['rows_per_sec'] / previous[r['stage']]['rows_per_sec'] - 1) * 100:+13.1f}%"
+        print(line)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20_000, help="Rows per CSV")
+    parser.add_argument("--snapshots", type=int, default=3, help="Dated CSVs per division")
+    parser.add_argument("--duplicate-rate", type=float, default=0.01)
+    parser.add_argument("--invalid-rate", type=float, default=0.02)
+    parser.add_argument("--change-rate", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--output", type=Path, help="Write the results to this JSON file")
+    parser.add_argument("--compare", type=Path, help="JSON results of an earlier run to compare rows/s against")
+    parser.add_argument("--stage", choices=STAGES, help=argparse.SUPPRESS) # Internal: run one stage and print JSON
+    parser.add_argument("--data", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.stage:
+        print(json.dumps(run_stage(args.stage, args.data)))
+        sys.exit()
+
+    from benchmarks.synthetic import write_tree
+
+    params = {key: getattr(args, key) for key in ("rows", "snapshots", "duplicate_rate", "invalid_rate", "change_rate", "seed")}
+    data_dir = Path(tempfile.mkdtemp()) / "data"
+    write_tree(data_dir, args.rows, args.snapshots, duplicate_rate=args.duplicate_rate, invalid_rate=args.invalid_rate, change_rate=args.change_rate, seed=args.seed)
+
+    results = []
+    for stage in args.stages:
+        # Each stage runs in a fresh interpreter so its peak RSS, caches and database are its own
+        output = subprocess.run([sys.executable, "-m", "benchmarks.bench_ingest_suite", "--stage", stage, "--data", str(data_dir)], capture_output=True, text=True, check=True).stdout
+        results.append(json.loads(output.splitlines()[-1]))
+
+    run = {"commit": git_commit(), "timestamp": datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(), "cpus": os.cpu_count(), "params": params, "results": results}
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+    if baseline and baseline["params"] != params:
+        print(f"Warning: {args.compare} was run with different parameters: {baseline['params']}")
+    print_results(results, baseline)
+    if args.output:
+        args.output.write_text(json.dumps(run, indent=2))
+        print(f"Results written to {args.output}")
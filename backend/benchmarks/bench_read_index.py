@@ -0,0 +1,221 @@
+"""
+Benchmark `/employees/` pages and headcount aggregates served from the read index in `read_index.py` against the
+SQLite queries they replace, on a database of `--employees` synthetic employees. List queries follow the cursor for
+`--pages` pages, and the index lookup of a first page is also timed alone, without reading its rows. Every query's
+results are compared between the two, before and after a round of writes, and the index is checked against the
+employees table.
+
+Run from the `backend` directory:
+
+```
+python -m benchmarks.bench_read_index --employees 1000000 --database /tmp/bench_read_index.db --output read_index.json
+```
+
+A `--database` that already has employees is reused as it is.
+"""
+import os, json, asyncio, platform, tempfile
+from datetime import date, datetime
+from pathlib import Path
+from statistics import median
+from time import perf_counter
+
+from benchmarks.bench_ingest_suite import git_commit
+
+SEED_CHUNK_SIZE = 100_000
+LIST_QUERIES = (
+    ("first page", {}, "id"),
+    ("one division", {"division_id": 2}, "id"),
+    ("two filters", {"division_id": 1, "rank_id": 3}, "id"),
+    ("three filters, by rank", {"department_id": 4, "position_id": 7, "salary_band_id": 2}, "-rank_id"),
+    ("by position", {"rank_id": 2}, "position_id"),
+    ("by start date", {"department_id": 9}, "-start_date"),
+    ("date range", {"start_date_from": date(2015, 1, 1), "start_date_to": date(2015, 12, 31), "salary_band_id": 1}, "id"),
+    ("no matches", {"division_id": 1, "rank_id": 99}, "id"),
+)
+AGGREGATE_QUERIES = (
+    ("headcount", [], {}, False),
+    ("by division and rank", ["division_id", "rank_id"], {}, False),
+    ("every dimension", ["division_id", "department_id", "rank_id", "position_id", "salary_band_id"], {}, False),
+    ("start years in a department", ["rank_id"], {"department_id": 3}, True),
+)
+
+def seed(employees: int):
+    """Add `employees` employees across divisions 1 and 2, a chunk at a time."""
+    from benchmarks.bench_upsert import make_records
+    from db import engine, get_db_context
+    from db_ops import add_employees_from_records
+    from models import Base
+    from utils import seed_db
+
+    Base.metadata.create_all(bind=engine)
+    with get_db_context() as db:
+        seed_db(db)
+        records = make_records(employees)
+        for start in range(0, employees, SEED_CHUNK_SIZE):
+            add_employees_from_records(records[start:start + SEED_CHUNK_SIZE], 1 + start // SEED_CHUNK_SIZE % 2, db, datetime(2024, 1, 1))
+        db.commit()
+
+def write(employees: int):
+    """Update, delete and create a few hundred employees, as API routes and ingestion would."""
+    from sqlalchemy import delete, update
+    from benchmarks.bench_upsert import make_records
+    from db import get_db_context
+    from db_ops import add_employees_from_records
+    from models import Employee
+
+    with get_db_context() as db:
+        db.execute(update(Employee).where(Employee.id % 5000 == 1).values(rank_id=Employee.rank_id % 5 + 1, start_date=date(2020, 2, 29)))
+        db.execute(delete(Employee).where(Employee.id % 7000 == 3))
+        records = make_records(employees + 300)[employees:]
+        add_employees_from_records(records, 2, db, datetime(2024, 2, 1))
+        db.commit()
+
+async def time_list(name: str, filters: dict, sort: str, pages: int, limit: int, repeat: int) -> tuple[dict, bool]:
+    """Median time of each path to fetch `pages` pages, and whether both returned the same rows and totals."""
+    from sqlalchemy import select
+    from db import AsyncReadSessionLocal
+    from models import Employee
+    from read_index import employee_index
+    from routers.employees import paginate_employees
+    from schemas import EmployeeFilters, PageParams
+
+    async def fetch() -> list:
+        results, cursor = [], None
+        async with AsyncReadSessionLocal() as db:
+            for _ in range(pages):
+                result = await paginate_employees(select(Employee), EmployeeFilters(**filters), PageParams(sort=sort, limit=limit, cursor=cursor), db)
+                results.append((result["total"], [employee.id for employee in result["items"]]))
+                cursor = result["next_cursor"]
+                if cursor is None:
+                    break
+        return results
+
+    timings, results = {}, {}
+    for path, enabled in (("sqlite", False), ("index", True)):
+        employee_index.enabled = enabled
+        runs = []
+        for _ in range(repeat):
+            start = perf_counter()
+            results[path] = await fetch()
+            runs.append((perf_counter() - start) * 1000)
+        timings[path] = median(runs)
+    return {"query": name, **{f"{path}_ms": round(ms, 3) for path, ms in timings.items()}}, results["sqlite"] == results["index"]
+
+async def time_aggregate(name: str, group_by: list[str], filters: dict, by_start_year: bool, repeat: int) -> tuple[dict, bool]:
+    """Median time of the summary table query and the index to count the groups, and whether they agree."""
+    from db import AsyncReadSessionLocal
+    from read_index import employee_index
+    from routers.aggregates import aggregate_rows
+    from schemas import AggregateFilters
+
+    timings, results = {}, {}
+    for path, enabled in (("sqlite", False), ("index", True)):
+        employee_index.enabled = enabled
+        runs = []
+        for _ in range(repeat):
+            async with AsyncReadSessionLocal() as db:
+                start = perf_counter()
+                results[path] = await aggregate_rows(group_by, AggregateFilters(**filters), db, by_start_year)
+                runs.append((perf_counter() - start) * 1000)
+        timings[path] = median(runs)
+    return {"query": name, **{f"{path}_ms": round(ms, 3) for path, ms in timings.items()}}, results["sqlite"] == results["index"]
+
+def time_lookup(filters: dict, sort: str, limit: int, repeat: int) -> float:
+    """Median time of the index alone to find the IDs and total of a first page, without reading its rows."""
+    from db import get_read_db_context
+    from read_index import employee_index
+    from schemas import EmployeeFilters
+
+    with get_read_db_context() as db:
+        employee_index.sync(db)
+        runs = []
+        for _ in range(repeat):
+            start = perf_counter()
+            employee_index.page(EmployeeFilters(**filters), sort.removeprefix("-"), sort.startswith("-"), None, limit, True, db)
+            runs.append((perf_counter() - start) * 1000)
+    return median(runs)
+
+async def run_queries(pages: int, limit: int, repeat: int) -> tuple[list[dict], list[str]]:
+    from db import async_read_engine
+
+    results, mismatches = [], []
+    for name, filters, sort in LIST_QUERIES:
+        result, same = await time_list(name, filters, sort, pages, limit, repeat)
+        results.append({**result, "lookup_ms": round(time_lookup(filters, sort, limit, repeat), 3)})
+        if not same: mismatches.append(name)
+    for name, group_by, filters, by_start_year in AGGREGATE_QUERIES:
+        result, same = await time_aggregate(name, group_by, filters, by_start_year, repeat)
+        results.append(result)
+        if not same: mismatches.append(name)
+    await async_read_engine.dispose()
+    return results, mismatches
+
+def print_results(results: list[dict], baseline: dict | None = None):
+    """Print a table of query timings, with the change in index time against a baseline run when given."""
+    previous = {result["query"]: result for result in baseline["results"]} if baseline else {}
+    print(f"{'query':<30} {'sqlite ms':>10} {'index ms':>9} {'speedup':>8} {'lookup ms':>10}" + (f" {'vs ' + (baseline['commit'] or 'baseline'):>14}" if baseline else ""))
+    for r in results:
+        lookup = f"{r['lookup_ms']:10.3f}" if "lookup_ms" in r else f"{'':>10}"
+        line = f"{r['query']:<30} {r['sqlite_ms']:10.3f} {r['index_ms']:9.3f} {r['sqlite_ms'] / max(r['index_ms'], 1e-6):7.1f}x {lookup}"
+        if r["query"] in previous:
+            line += f" {(r['index_ms'] / previous[r['query']]['index_ms'] - 1) * 100:+13.1f}%"
+        print(line)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--employees", type=int, default=1_000_000)
+    parser.add_argument("--database", type=Path, help="Database to seed, or reuse if it has employees. Defaults to a temporary file")
+    parser.add_argument("--pages", type=int, default=3, help="Pages fetched per list query, following the cursor")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", type=Path, help="Write the results to this JSON file")
+    parser.add_argument("--compare", type=Path, help="JSON results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{args.database or Path(tempfile.mkdtemp()) / 'bench_read_index.db'}"
+    os.environ.setdefault("CONFIG_PATH", "config.yaml")
+    os.environ["READ_INDEX"] = "1"
+
+    from sqlalchemy import func, select
+    from db import get_db_context
+    from models import Base, Employee
+    from read_index import employee_index
+
+    with get_db_context() as db:
+        Base.metadata.create_all(bind=db.get_bind())
+        employees = db.scalar(select(func.count()).select_from(Employee))
+    if not employees:
+        start = perf_counter()
+        seed(args.employees)
+        print(f"Seeded {args.employees} employees in {perf_counter() - start:.1f}s")
+
+    with get_db_context() as db:
+        start = perf_counter()
+        employee_index.sync(db)
+        load_s = perf_counter() - start
+    status = employee_index.status()
+    print(f"Loaded {status['employees']} employees into the index in {load_s:.2f}s, {status['bytes'] / 2**20:.1f} MiB")
+
+    results, mismatches = asyncio.run(run_queries(args.pages, args.limit, args.repeat))
+    print_results(results, json.loads(args.compare.read_text()) if args.compare else None)
+
+    write(status["employees"])
+    with get_db_context() as db:
+        start = perf_counter()
+        employee_index.enabled = True
+        differences = employee_index.check(db)
+        print(f"Applied writes and checked the index in {perf_counter() - start:.2f}s, {len(differences)} differences")
+    _, mismatches_after_writes = asyncio.run(run_queries(args.pages, args.limit, 1))
+    mismatches += [f"{name} after writes" for name in mismatches_after_writes]
+    print("Index and SQLite results match" if not mismatches else f"Results differ for: {', '.join(mismatches)}")
+
+    run = {
+        "commit": git_commit(), "timestamp": datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(), "cpus": os.cpu_count(),
+        "params": {"employees": status["employees"], "pages": args.pages, "limit": args.limit, "repeat": args.repeat},
+        "load_s": round(load_s, 3), "index_bytes": status["bytes"], "differences": len(differences), "mismatches": mismatches, "results": results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(run, indent=2))
+        print(f"Results written to {args.output}")
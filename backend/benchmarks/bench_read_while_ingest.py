@@ -0,0 +1,118 @@
+"""
+Benchmark dashboard read latency while another process ingests employees, for each SQLite engine profile in `db.py`.
+
+Run from the `backend` directory:
+
+```
+python -m benchmarks.bench_read_while_ingest --employees 50000 --seconds 10
+```
+"""
+import os, sys, json, asyncio, subprocess, tempfile
+from multiprocessing import Event, Process, Value
+from statistics import quantiles
+from time import perf_counter
+
+def write_loop(stop, ready, written, employees: int, chunksize: int):
+    """
+    Write validated employees in committed chunks like the `ingest.py` writer, alternating between two versions of
+    each record so every pass updates every row, until `stop` is set.
+    """
+    from datetime import datetime, timedelta
+    from benchmarks.bench_upsert import make_records
+    from db import engine, read_engine, get_db_context
+    from db_ops import validate_employee_records, upsert_employees
+
+    engine.dispose(close=False)
+    read_engine.dispose(close=False)
+    versions = [make_records(employees, seed) for seed in (1, 2)]
+    ready.set()
+    with get_db_context() as db:
+        snapshot = 1
+        while not stop.is_set():
+            validated, _ = validate_employee_records(versions[snapshot % 2], 1, datetime(2024, 1, 1) + timedelta(days=snapshot))
+            for start in range(0, employees, chunksize):
+                upsert_employees(validated[start:start + chunksize], db)
+                db.commit()
+                written.value += len(validated[start:start + chunksize])
+                if stop.is_set(): break
+            snapshot += 1
+
+async def read_loop(limit: int, seconds: float) -> tuple[list[float], int]:
+    """Request first pages of `/employees/enriched` from the async read pool for `seconds`. Returns timings and errors."""
+    from db import AsyncReadSessionLocal, async_read_engine
+    from routers.employees import enriched_page
+    from schemas import EmployeeFilters, PageParams
+
+    timings = []; errors = 0
+    deadline = perf_counter() + seconds
+    while perf_counter() < deadline:
+        start = perf_counter()
+        try:
+            async with AsyncReadSessionLocal() as db:
+                await enriched_page(EmployeeFilters(), PageParams(limit=limit), "rows", db)
+        except Exception:
+            errors += 1
+        timings.append((perf_counter() - start) * 1000)
+    await async_read_engine.dispose()
+    return timings, errors
+
+def run(profile: str, employees: int, chunksize: int, limit: int, seconds: float) -> dict:
+    """
+    Time first-page `/employees/enriched` queries on the read pool while a writer process ingests. Also reports how
+    many rows the writer committed in that time.
+    """
+    from datetime import datetime
+    from benchmarks.bench_upsert import make_records
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench_read_while_ingest.db"
+    os.environ["DB_PROFILE"] = profile
+    os.environ.setdefault("CONFIG_PATH", "config.yaml")
+
+    from db import engine, get_db_context
+    from db_ops import add_employees_from_records
+    from models import Base
+    from utils import seed_db
+
+    Base.metadata.create_all(bind=engine)
+    with get_db_context() as db:
+        seed_db(db)
+        add_employees_from_records(make_records(employees), 1, db, datetime(2024, 1, 1))
+    engine.dispose()
+
+    stop, ready, written = Event(), Event(), Value("q", 0)
+    writer = Process(target=write_loop, args=(stop, ready, written, employees, chunksize))
+    writer.start()
+    ready.wait()
+
+    timings, errors = asyncio.run(read_loop(limit, seconds))
+    stop.set()
+    rows_written = written.value
+    writer.join()
+
+    percentiles = quantiles(timings, n=100)
+    return {"profile": profile, "reads": len(timings), "errors": errors, "rows_written": rows_written, "p50": percentiles[49], "p95": percentiles[94], "p99": percentiles[98], "max": max(timings)}
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--employees", type=int, default=50_000)
+    parser.add_argument("--chunksize", type=int, default=10_000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--profile", help="Run a single profile and print its results as JSON")
+    args = parser.parse_args()
+
+    if args.profile:
+        print(json.dumps(run(args.profile, args.employees, args.chunksize, args.limit, args.seconds)))
+        sys.exit()
+
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+    from db import DB_PROFILES
+    print(f"{args.employees} employees re-ingested in chunks of {args.chunksize}, page of {args.limit}, {args.seconds:g}s per profile")
+    print(f"{'profile':<10} {'reads':>7} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'rows written':>13}")
+    for profile in DB_PROFILES:
+        # Each profile runs in a fresh interpreter because the engines are configured at import
+        output = subprocess.run([sys.executable, "-m", "benchmarks.bench_read_while_ingest", *sys.argv[1:], "--profile", profile], capture_output=True, text=True, check=True).stdout
+        r = json.loads(output.splitlines()[-1])
+        print(f"{profile:<10} {r['reads']:>7} {r['errors']:>7} {r['p50']:8.1f} {r['p95']:8.1f} {r['p99']:8.1f} {r['max']:8.1f} {r['rows_written']:>13}")
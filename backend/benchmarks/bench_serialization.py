@@ -0,0 +1,114 @@
+"""
+Benchmark serializing lists of employees to a JSON response body: ORM objects through `jsonable_encoder` and
+`json.dumps`, as list routes did before, against row tuples through `cache.row_dicts` and `cache.dump_json`. Fetching
+the rows is timed separately, and both bodies are checked to hold the same employees.
+
+Run from the `backend` directory:
+
+```
+python -m benchmarks.bench_serialization --sizes 10000 100000 --output serialization.json
+python -m benchmarks.bench_serialization --sizes 10000 100000 --compare serialization.json
+```
+"""
+import os, json, platform, tempfile
+from datetime import datetime
+from pathlib import Path
+from statistics import median
+from time import perf_counter
+
+from benchmarks.bench_ingest_suite import git_commit
+
+SEED_CHUNK_SIZE = 100_000
+
+def seed(employees: int):
+    """Add `employees` employees to division 1, a chunk at a time."""
+    from benchmarks.bench_upsert import make_records
+    from db import engine, get_db_context
+    from db_ops import add_employees_from_records
+    from models import Base
+    from utils import seed_db
+
+    Base.metadata.create_all(bind=engine)
+    with get_db_context() as db:
+        seed_db(db)
+        records = make_records(employees)
+        for start in range(0, employees, SEED_CHUNK_SIZE):
+            add_employees_from_records(records[start:start + SEED_CHUNK_SIZE], 1, db, datetime(2024, 1, 1))
+        db.commit()
+
+def timed(fn, repeat: int) -> tuple[float, object]:
+    """Median milliseconds of `repeat` calls, and the last result."""
+    runs = []
+    for _ in range(repeat):
+        start = perf_counter()
+        result = fn()
+        runs.append((perf_counter() - start) * 1000)
+    return median(runs), result
+
+def bench(size: int, repeat: int) -> dict:
+    """Fetch and serialize the first `size` employees both ways."""
+    from fastapi.encoders import jsonable_encoder
+    from sqlalchemy import select
+    from cache import dump_json, row_dicts
+    from db import get_read_db_context
+    from models import Employee
+    from routers.employees import EMPLOYEE_COLUMNS
+
+    with get_read_db_context() as db:
+        orm_fetch_ms, employees = timed(lambda: db.scalars(select(Employee).order_by(Employee.id).limit(size)).all(), repeat)
+        row_fetch_ms, rows = timed(lambda: db.execute(select(*EMPLOYEE_COLUMNS).order_by(Employee.id).limit(size)).all(), repeat)
+        before_ms, before = timed(lambda: json.dumps(jsonable_encoder({"items": employees}), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode(), repeat)
+        after_ms, after = timed(lambda: dump_json({"items": row_dicts(rows)}), repeat)
+
+    same = [{key: value for key, value in item.items() if key != "row_hash"} for item in json.loads(before)["items"]] == json.loads(after)["items"]
+    return {
+        "employees": size, "orm_fetch_ms": round(orm_fetch_ms, 2), "row_fetch_ms": round(row_fetch_ms, 2),
+        "before_ms": round(before_ms, 2), "after_ms": round(after_ms, 2), "after_rows_per_s": round(size / after_ms * 1000), "bytes": len(after), "same": same,
+    }
+
+def print_results(results: list[dict], baseline: dict | None = None):
+    """Print a table of results, with the change in total time to fetch and serialize against a baseline run when given."""
+    previous = {result["employees"]: result for result in baseline["results"]} if baseline else {}
+    print(f"{'employees':>10} {'orm fetch':>10} {'before ms':>10} {'row fetch':>10} {'after ms':>9} {'speedup':>8} {'rows/s':>11} {'MiB':>6} {'same':>5}" + (f" {'vs ' + (baseline['commit'] or 'baseline'):>14}" if baseline else ""))
+    for r in results:
+        line = (
+            f"{r['employees']:>10} {r['orm_fetch_ms']:10.1f} {r['before_ms']:10.1f} {r['row_fetch_ms']:10.1f} {r['after_ms']:9.1f}"
+            f" {(r['orm_fetch_ms'] + r['before_ms']) / (r['row_fetch_ms'] + r['after_ms']):7.1f}x {r['after_rows_per_s']:>11} {r['bytes'] / 2**20:6.1f} {'yes' if r['same'] else 'NO':>5}"
+        )
+        if r["employees"] in previous:
+            total, previous_total = (result["row_fetch_ms"] + result["after_ms"] for result in (r, previous[r["employees"]]))
+            line += f" {(total / previous_total - 1) * 100:+13.1f}%"
+        print(line)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000], help="Employees per response")
+    parser.add_argument("--database", type=Path, help="Database to seed, or reuse if it has enough employees. Defaults to a temporary file")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", type=Path, help="Write the results to this JSON file")
+    parser.add_argument("--compare", type=Path, help="JSON results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{args.database or Path(tempfile.mkdtemp()) / 'bench_serialization.db'}"
+    os.environ.setdefault("CONFIG_PATH", "config.yaml")
+
+    from sqlalchemy import func, select
+    from db import get_db_context
+    from models import Base, Employee
+
+    with get_db_context() as db:
+        Base.metadata.create_all(bind=db.get_bind())
+        employees = db.scalar(select(func.count()).select_from(Employee))
+    if employees < max(args.sizes):
+        if employees:
+            parser.error(f"{args.database} has {employees} employees, fewer than {max(args.sizes)}")
+        seed(max(args.sizes))
+
+    results = [bench(size, args.repeat) for size in args.sizes]
+    print_results(results, json.loads(args.compare.read_text()) if args.compare else None)
+    if args.output:
+        run = {"commit": git_commit(), "timestamp": datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(), "cpus": os.cpu_count(), "params": {"sizes": args.sizes, "repeat": args.repeat}, "results": results}
+        args.output.write_text(json.dumps(run, indent=2))
+        print(f"Results written to {args.output}")
@@ -0,0 +1,99 @@
+"""
+Benchmark API cold start: importing `main`, running its lifespan startup against a new and an already initialised
+database, and the first `/upload-csv`, which loads whatever startup deferred. Each run is a fresh interpreter, with and
+without `FAST_STARTUP`, and the median of `--repeat` runs is reported along with SQL statements at startup.
+
+Run from the `backend` directory:
+
+```
+python -m benchmarks.bench_startup --repeat 5 --output startup.json
+python -m benchmarks.bench_startup --repeat 5 --compare startup.json
+```
+"""
+import os, sys, json, platform, subprocess, tempfile
+from datetime import datetime
+from pathlib import Path
+from statistics import median
+from time import perf_counter
+
+from benchmarks.bench_ingest_suite import count_queries, git_commit
+
+CASES = (("default", "new"), ("default", "existing"), ("fast", "new"), ("fast", "existing"))
+MEASUREMENTS = ("import_s", "startup_s", "first_upload_s")
+
+def run_once(db_path: Path) -> dict:
+    """Import the app, start it and upload one CSV, timing each step. Called in a fresh interpreter per run."""
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.setdefault("CONFIG_PATH", "config.yaml")
+    os.environ.setdefault("SCHEMA_DIR_PATH", "division_schemas")
+
+    start = perf_counter()
+    from main import app
+    import_s = perf_counter() - start
+    pandas_at_import = "pandas" in sys.modules
+
+    from fastapi.testclient import TestClient
+    from db import engine, read_engine, async_engine, async_read_engine
+
+    queries = count_queries(engine, read_engine, async_engine, async_read_engine)
+    client = TestClient(app)
+    start = perf_counter()
+    client.__enter__() # Runs the lifespan startup
+    startup_s = perf_counter() - start
+    startup_queries = queries[0]
+
+    start = perf_counter()
+    client.post("/upload-csv", files={"file": ("employees_20240101.csv", b"", "text/csv")}, data={"division_id": 1}).raise_for_status()
+    first_upload_s = perf_counter() - start
+    client.__exit__(None, None, None)
+    return {"import_s": round(import_s, 3), "startup_s": round(startup_s, 3), "first_upload_s": round(first_upload_s, 3), "startup_queries": startup_queries, "pandas_at_import": pandas_at_import}
+
+def run_case(mode: str, db_state: str, repeat: int) -> dict:
+    """Median measurements of `repeat` fresh interpreters starting the app in `mode` against a `db_state` database."""
+    env = {**os.environ, "FAST_STARTUP": "1" if mode == "fast" else "0"}
+    runs = []
+    for _ in range(repeat):
+        db_path = Path(tempfile.mkdtemp()) / "bench_startup.db"
+        if db_state == "existing": # Initialised by an earlier start in the same mode
+            subprocess.run([sys.executable, "-m", "benchmarks.bench_startup", "--run", str(db_path)], env=env, capture_output=True, check=True)
+        output = subprocess.run([sys.executable, "-m", "benchmarks.bench_startup", "--run", str(db_path)], env=env, capture_output=True, text=True, check=True).stdout
+        runs.append(json.loads(output.splitlines()[-1]))
+    return {
+        "case": f"{mode}/{db_state}",
+        **{key: round(median(run[key] for run in runs), 3) for key in MEASUREMENTS},
+        "startup_queries": runs[-1]["startup_queries"],
+        "pandas_at_import": runs[-1]["pandas_at_import"],
+    }
+
+def print_results(results: list[dict], baseline: dict | None = None):
+    """Print a table of case results, with the change in total time to the first upload against a baseline run when given."""
+    previous = {result["case"]: result for result in baseline["results"]} if baseline else {}
+    print(f"{'case':<18} {'import s':>9} {'startup s':>10} {'upload s':>9} {'queries':>8} {'pandas':>7}" + (f" {'vs ' + (baseline['commit'] or 'baseline'):>14}" if baseline else ""))
+    for r in results:
+        line = f"{r['case']:<18} {r['import_s']:9.3f} {r['startup_s']:10.3f} {r['first_upload_s']:9.3f} {r['startup_queries']:>8} {'yes' if r['pandas_at_import'] else 'no':>7}"
+        if r["case"] in previous:
+            total, previous_total = (sum(result[key] for key in MEASUREMENTS) for result in (r, previous[r["case"]]))
+            line += f" {(total / previous_total - 1) * 100:+13.1f}%"
+        print(line)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per case")
+    parser.add_argument("--output", type=Path, help="Write the results to this JSON file")
+    parser.add_argument("--compare", type=Path, help="JSON results of an earlier run to compare against")
+    parser.add_argument("--run", type=Path, help=argparse.SUPPRESS) # Internal: start once against this database and print JSON
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run_once(args.run)))
+        sys.exit()
+
+    results = [run_case(mode, db_state, args.repeat) for mode, db_state in CASES]
+    run = {"commit": git_commit(), "timestamp": datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(), "cpus": os.cpu_count(), "params": {"repeat": args.repeat}, "results": results}
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+    print_results(results, baseline)
+    if args.output:
+        args.output.write_text(json.dumps(run, indent=2))
+        print(f"Results written to {args.output}")
@@ -0,0 +1,113 @@
+"""
+Load test `GET /employees/{id}` latency while a large CSV is ingested by the same worker. Compares an idle server,
+an `/upload-csv` job run in the background job pool, and the same ingestion run inline on the event loop as the
+route did before it was offloaded.
+
+Run from the `backend` directory:
+
+```
+python -m benchmarks.bench_upload_latency --employees 10000 --upload-rows 50000
+```
+"""
+import os, io, csv, random, asyncio, tempfile
+from statistics import quantiles
+from time import perf_counter
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/bench_upload_latency.db"
+os.environ.setdefault("CONFIG_PATH", "config.yaml")
+os.environ.setdefault("SCHEMA_DIR_PATH", "division_schemas")
+
+import httpx
+import yaml
+
+from benchmarks.bench_upsert import make_records
+from db import engine, async_engine, async_read_engine, get_db_context
+from db_ops import add_employees_from_records
+from jobs import job_queue, spool_upload, run_job
+from main import app
+from models import Base
+from utils import seed_db
+
+def make_csv(rows: int, prefix: str, seed: int = 0) -> bytes:
+    """A division 1 CSV of `rows` employees whose names start with `prefix`."""
+    rng = random.Random(seed)
+    with open(os.environ["CONFIG_PATH"]) as f:
+        config = yaml.safe_load(f)
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(["Name", "Position", "Department", "Salary Band", "Contact Number", "Start Date"])
+    for i in range(rows):
+        writer.writerow([
+            f"{prefix}First{i} {prefix}Surname{i}",
+            f"{rng.choice(config['ranks'])} {rng.choice(config['positions'])}",
+            rng.choice(config["departments"]),
+            rng.choice(config["salary_bands"]),
+            f"+44 7{rng.randint(100, 999)} {rng.randint(100000, 999999)}",
+            f"20{rng.randint(10, 23)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}",
+        ])
+    return output.getvalue().encode()
+
+async def probe(client: httpx.AsyncClient, employees: int, stop: asyncio.Event) -> list[float]:
+    """Request random employees one after another until `stop` is set. Returns latencies in milliseconds."""
+    rng = random.Random(0)
+    timings = []
+    while not stop.is_set():
+        start = perf_counter()
+        response = await client.get(f"/employees/{rng.randint(1, employees)}")
+        response.raise_for_status()
+        timings.append((perf_counter() - start) * 1000)
+    return timings
+
+async def scenario(client: httpx.AsyncClient, mode: str, employees: int, upload: bytes, idle_seconds: float) -> tuple[list[float], float]:
+    """Probe while running `mode`. Returns probe latencies and the duration of the background work in seconds."""
+    stop = asyncio.Event()
+    probing = asyncio.create_task(probe(client, employees, stop))
+    await asyncio.sleep(0.1) # Let the probe start first
+    start = perf_counter()
+    if mode == "idle":
+        await asyncio.sleep(idle_seconds)
+    elif mode == "offloaded":
+        response = await client.post("/upload-csv", files={"file": ("upload.csv", upload, "text/csv")}, data={"division_id": "1"})
+        job = response.raise_for_status().json()
+        while job["state"] not in ("succeeded", "failed"):
+            await asyncio.sleep(0.05)
+            job = (await client.get(f"/jobs/{job['id']}")).json()
+    else:
+        with get_db_context() as db:
+            job = spool_upload(io.BytesIO(upload), 1, "upload.csv", db)
+        run_job(job.id) # Blocks the event loop, as the route did before
+    duration = perf_counter() - start
+    stop.set()
+    return await probing, duration
+
+async def main(employees: int, upload_rows: int):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"{employees} employees, uploads of {upload_rows} rows")
+        print(f"{'mode':<10} {'requests':>9} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>9} {'upload s':>9}")
+        idle_seconds = None
+        for mode in ("offloaded", "inline", "idle"):
+            upload = make_csv(upload_rows, mode.capitalize(), seed=len(mode))
+            timings, duration = await scenario(client, mode, employees, upload, idle_seconds or 0)
+            idle_seconds = idle_seconds or duration # Probe the idle server for as long as an upload took
+            percentiles = quantiles(timings, n=100, method="inclusive") if len(timings) > 1 else timings * 99
+            print(f"{mode:<10} {len(timings):>9} {percentiles[49]:8.1f} {percentiles[98]:8.1f} {max(timings):9.1f} {duration if mode != 'idle' else 0:9.2f}")
+    job_queue.shutdown()
+    await async_engine.dispose()
+    await async_read_engine.dispose()
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--employees", type=int, default=10_000)
+    parser.add_argument("--upload-rows", type=int, default=50_000)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    with get_db_context() as db:
+        seed_db(db)
+        add_employees_from_records(make_records(args.employees), 1, db)
+
+    asyncio.run(main(args.employees, args.upload_rows))
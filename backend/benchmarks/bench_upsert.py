@@ -0,0 +1,64 @@
+"""
+Benchmark `add_employees_from_records` throughput.
+
+Run from the `backend` directory:
+
+```
+python -m benchmarks.bench_upsert --sizes 1000 10000 100000
+```
+"""
+import os, random, tempfile
+from datetime import date, datetime, timedelta
+from time import perf_counter
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/bench_upsert.db"
+os.environ.setdefault("CONFIG_PATH", "config.yaml")
+
+from db import engine, get_db_context
+from db_ops import add_employees_from_records
+from models import Base
+from utils import seed_db
+
+def make_records(n: int, seed: int = 0) -> list[dict]:
+    """Generate `n` already-parsed employee records with unique names."""
+    rng = random.Random(seed)
+    return [
+        {
+            "first_name": f"First{i}",
+            "surname": f"Surname{i}",
+            "rank_id": rng.randint(1, 5),
+            "position_id": rng.randint(1, 31),
+            "department_id": rng.randint(1, 15),
+            "salary_band_id": rng.randint(1, 5),
+            "contact_number": f"+447{rng.randint(100000000, 999999999)}",
+            "start_date": date(2010, 1, 1) + timedelta(days=rng.randint(0, 5000)),
+        }
+        for i in range(n)
+    ]
+
+def bench(n: int) -> dict:
+    """Time a create pass followed by an update pass of `n` records on a fresh database."""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    results = {"rows": n}
+    with get_db_context() as db:
+        seed_db(db)
+        for phase, seed, dt in (("create", 0, datetime(2024, 1, 1)), ("update", 1, datetime(2024, 2, 1))):
+            records = make_records(n, seed)
+            start = perf_counter()
+            created, updated, errors = add_employees_from_records(records, 1, db, dt)
+            elapsed = perf_counter() - start
+            results[phase] = {"seconds": round(elapsed, 3), "rows_per_sec": round(n / elapsed), "created": created, "updated": updated}
+    return results
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    args = parser.parse_args()
+
+    for n in args.sizes:
+        r = bench(n)
+        print(f"{n:>7} rows | create {r['create']['rows_per_sec']:>8} rows/s ({r['create']['seconds']}s) | update {r['update']['rows_per_sec']:>8} rows/s ({r['update']['seconds']}s)")
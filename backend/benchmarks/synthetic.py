@@ -0,0 +1,166 @@
+"""
+Generate synthetic division CSVs shaped by the YAML schemas in `division_schemas/`, as a tree `ingest.py` can load:
+one directory per division holding one dated CSV per snapshot, or with `--format parquet` one Parquet file.
+
+Run from the `backend` directory:
+
+```
+python -m benchmarks.synthetic /tmp/divisions --rows 10000 --snapshots 3 --duplicate-rate 0.01 --invalid-rate 0.02
+python -m benchmarks.synthetic /tmp/divisions-parquet --rows 10000 --format parquet
+```
+"""
+import csv, random, yaml
+from datetime import date, timedelta
+from pathlib import Path
+
+FIRST_NAMES = [
+    "Oliver", "Amelia", "George", "Isla", "Harry", "Ava", "Noah", "Mia", "Jack", "Ivy", "Leo", "Lily", "Arthur", "Grace",
+    "Muhammad", "Freya", "Oscar", "Emily", "Charlie", "Sophia", "Thomas", "Ella", "Henry", "Poppy", "Theo", "Chloe",
+]
+SURNAMES = [
+    "Smith", "Jones", "Taylor", "Brown", "Williams", "Wilson", "Johnson", "Davies", "Patel", "Robinson", "Wright",
+    "Thompson", "Evans", "Walker", "White", "Roberts", "Green", "Hall", "Wood", "Jackson", "Clarke", "Khan", "Lewis",
+]
+CONTACT_NUMBER_FORMATS = ["+44 7{} {}", "07{} {}", "07{}-{}", " +447{}{} "]
+SNAPSHOT_INTERVAL = timedelta(days=30)
+
+def make_employee(division_id: int, n: int, config: dict, rng: random.Random) -> dict:
+    """A valid employee with every field any schema header can be drawn from. Names are unique per `n` and division."""
+    return {
+        "first_name": rng.choice(FIRST_NAMES),
+        "middle_name": rng.choice(FIRST_NAMES) if rng.random() < 0.2 else None,
+        "surname": f"{rng.choice(SURNAMES)}{division_id}x{n}",
+        "rank": rng.choice(config["ranks"]),
+        "position": rng.choice(config["positions"]),
+        "department": rng.choice(config["departments"]),
+        "salary_band": rng.choice(config["salary_bands"]),
+        "contact_number": rng.choice(CONTACT_NUMBER_FORMATS).format(rng.randint(100, 999), rng.randint(100000, 999999)),
+        "start_date": date(2010, 1, 1) + timedelta(days=rng.randint(0, 5000)),
+    }
+
+def change_employee(employee: dict, config: dict, rng: random.Random) -> dict:
+    """The same employee after a promotion, transfer or new number."""
+    field = rng.choice(["rank", "department", "salary_band", "contact_number"])
+    changed = make_employee(0, 0, config, rng)
+    return {**employee, field: changed[field]}
+
+def invalidate(row: dict, rng: random.Random) -> dict:
+    """Break one field of a CSV row in a way the parser or validation rejects without failing the whole file."""
+    breakers = {
+        "position": lambda value: f"Wizard {value.split(' ', 1)[-1]}", # Unknown rank
+        "department": lambda value: "Astrology",
+        "contact_number": lambda value: rng.choice(["n/a", "ext. 1234", ""]),
+        "name": lambda value: value.split()[0], # A single name does not match the name regex
+    }
+    field = rng.choice([field for field in breakers if field in row])
+    return {**row, field: breakers[field](row[field])}
+
+def to_row(employee: dict, headers: dict[str, str]) -> dict:
+    """Render an employee as the values of a schema's headers."""
+    values = {
+        "name": " ".join(filter(None, (employee["first_name"], employee["middle_name"], employee["surname"]))),
+        "position": f"{employee['rank']} {employee['position']}",
+        "start_date": employee["start_date"].isoformat(),
+    }
+    row = {}
+    for header, typ in headers.items():
+        if header in values:
+            row[header] = values[header]
+        elif header in employee:
+            row[header] = employee[header]
+        else:
+            raise ValueError(f"Cannot generate values for header '{header}' of type '{typ}'")
+    return row
+
+def write_division(division_dir: Path, division_schema: dict, config: dict, rows: int, snapshots: int, duplicate_rate: float = 0.0, invalid_rate: float = 0.0, change_rate: float = 0.1, start: date = date(2024, 1, 1), seed: int = 0) -> list[Path]:
+    """
+    Write `snapshots` dated CSVs of `rows` rows for one division. Each snapshot after the first changes `change_rate` of
+    the employees. `duplicate_rate` of rows repeat an earlier employee's name with other details, and `invalid_rate`
+    of rows have one field broken. Returns the CSV paths, oldest first.
+    """
+    division_id = division_schema["division_id"]
+    headers: dict[str, str] = division_schema["headers"]
+    rng = random.Random(f"{seed}-{division_id}")
+    employees = [make_employee(division_id, n, config, rng) for n in range(rows)]
+
+    division_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for snapshot in range(snapshots):
+        if snapshot:
+            employees = [change_employee(employee, config, rng) if rng.random() < change_rate else employee for employee in employees]
+        path = division_dir / f"employees_{(start + snapshot * SNAPSHOT_INTERVAL):%Y%m%d}.csv"
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(headers))
+            writer.writerow({header: header.replace("_", " ").title() for header in headers})
+            for i, employee in enumerate(employees):
+                if i and rng.random() < duplicate_rate:
+                    earlier = employees[rng.randrange(i)]
+                    employee = {**make_employee(division_id, 0, config, rng), **{key: earlier[key] for key in ("first_name", "middle_name", "surname")}}
+                row = to_row(employee, headers)
+                writer.writerow(invalidate(row, rng) if rng.random() < invalid_rate else row)
+        paths.append(path)
+    return paths
+
+def to_parquet(csv_path: Path, headers: dict[str, str]) -> Path:
+    """
+    Convert a generated CSV to a Parquet file beside it, with columns named by the schema's headers, and delete the CSV.
+    Integer and boolean headers are stored typed and the rest as strings, so dates keep the schema's format.
+    """
+    import pyarrow as pa
+    from pyarrow import csv as arrow_csv, parquet
+
+    types = {"integer": pa.int64(), "boolean": pa.bool_()}
+    table = arrow_csv.read_csv(
+        csv_path,
+        read_options=arrow_csv.ReadOptions(column_names=list(headers), skip_rows=1),
+        convert_options=arrow_csv.ConvertOptions(column_types={header: types.get(typ, pa.string()) for header, typ in headers.items()}, strings_can_be_null=True),
+    )
+    path = csv_path.with_suffix(".parquet")
+    parquet.write_table(table, path)
+    csv_path.unlink()
+    return path
+
+def write_tree(root: Path, rows: int, snapshots: int, divisions: list[int] | None = None, schema_dir: Path = Path("division_schemas"), config_path: Path = Path("config.yaml"), file_format: str = "csv", **options) -> dict[int, list[Path]]:
+    """
+    Write `write_division` output for each division schema in `schema_dir`, or only `divisions`. Directories are named
+    so that `ingest.py`, which numbers divisions by sorted directory name, maps each to its schema. Returns the CSV
+    paths by division ID, or the Parquet paths with `file_format="parquet"`.
+    """
+    with open(config_path) as f:
+        config = yaml.safe_load(f)
+    schemas = {}
+    for path in schema_dir.glob("*.yaml"):
+        with open(path) as f:
+            schema = yaml.safe_load(f)
+        schemas[schema["division_id"]] = schema
+
+    divisions = sorted(divisions or schemas)
+    if divisions != list(range(1, len(divisions) + 1)):
+        raise ValueError("Divisions must be numbered 1 to n to load with ingest.py")
+    width = len(str(divisions[-1]))
+    tree = {
+        division_id: write_division(root / f"division_{division_id:0{width}d}", schemas[division_id], config, rows, snapshots, **options)
+        for division_id in divisions
+    }
+    if file_format == "parquet":
+        tree = {division_id: [to_parquet(path, schemas[division_id]["headers"]) for path in paths] for division_id, paths in tree.items()}
+    return tree
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory", type=Path)
+    parser.add_argument("--rows", type=int, default=10_000, help="Rows per CSV")
+    parser.add_argument("--snapshots", type=int, default=3, help="Dated CSVs per division")
+    parser.add_argument("--divisions", type=int, nargs="+", help="Division IDs to generate, by default every schema")
+    parser.add_argument("--duplicate-rate", type=float, default=0.0)
+    parser.add_argument("--invalid-rate", type=float, default=0.0)
+    parser.add_argument("--change-rate", type=float, default=0.1, help="Employees changed between snapshots")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv", help="File format of the snapshots")
+    args = parser.parse_args()
+
+    tree = write_tree(args.directory, args.rows, args.snapshots, args.divisions, file_format=args.format, duplicate_rate=args.duplicate_rate, invalid_rate=args.invalid_rate, change_rate=args.change_rate, seed=args.seed)
+    for division_id, paths in tree.items():
+        print(f"Division {division_id}: {', '.join(str(path) for path in paths)}")
@@ -0,0 +1,160 @@
+import os
+from collections import OrderedDict
+from hashlib import sha1
+from threading import Lock
+from typing import Any, Awaitable, Callable, NamedTuple, Sequence
+import orjson
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from sqlalchemy import Row, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from models import Division, Rank, Position, Department, SalaryBand, TableVersion
+
+REFERENCE_MODELS = (Division, Rank, Position, Department, SalaryBand)
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+class LookupCache:
+    """
+    Process-wide cache of reference tables mapping each row's lookup key to its ID. Named tables are keyed on
+    `name`, ID-only tables (divisions, salary bands) on `id`. Tables are loaded on first use and reloaded when their
+    version in `table_versions` changes, so writes by other workers and `ingest.py` are seen too.
+    """
+    def __init__(self, models: tuple = REFERENCE_MODELS):
+        self.models = models
+        self._tables: dict[type, tuple[int, dict]] = {} # Model -> (table version, {key: id})
+        self._lock = Lock()
+
+    def get_table(self, model_class, db: Session) -> dict:
+        """
+        Returns the lookup table for a model, loading it with a single query if not cached or its version has changed.
+        The version is read once per transaction of `db`, so per-row lookups do not each query it.
+        """
+        version = self._version(model_class, db)
+        cached = self._tables.get(model_class)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        key_column = getattr(model_class, "name", model_class.id)
+        table = {key: id for key, id in db.query(key_column, model_class.id)}
+        with self._lock:
+            self._tables[model_class] = (version, table)
+        return table
+
+    def _version(self, model_class, db: Session) -> int:
+        """The stored version of a model's table as first read in the current transaction of `db`."""
+        transaction, versions = db.info.get("lookup_versions", (None, {}))
+        if transaction is None or transaction is not db.get_transaction():
+            versions = {}
+        if model_class not in versions:
+            versions[model_class] = get_table_versions(db, model_class)[0]
+            db.info["lookup_versions"] = (db.get_transaction(), versions)
+        return versions[model_class]
+
+    def invalidate(self, *model_classes):
+        """Drops the cached tables for the given models, or every table if none are given."""
+        with self._lock:
+            for model_class in model_classes or self.models:
+                self._tables.pop(model_class, None)
+
+lookup_cache = LookupCache()
+
+
+def bump_table_versions(db: Session, *model_classes):
+    """
+    Increments the stored version of each model's table. Call before committing any write to those tables so cached
+    responses built from them are rebuilt. Versions live in the database so every process sees the bump.
+    """
+    for model_class in model_classes:
+        stmt = insert(TableVersion).values(name=model_class.__tablename__, version=1)
+        db.execute(stmt.on_conflict_do_update(index_elements=[TableVersion.name], set_={"version": TableVersion.version + 1}))
+
+def get_table_versions(db: Session, *model_classes) -> tuple[int, ...]:
+    """Returns the stored version of each model's table, 0 for tables that have never been written."""
+    names = [model_class.__tablename__ for model_class in model_classes]
+    versions = dict(db.execute(select(TableVersion.name, TableVersion.version).where(TableVersion.name.in_(names))).all())
+    return tuple(versions.get(name, 0) for name in names)
+
+class CachedResponse(NamedTuple):
+    versions: tuple[int, ...]
+    etag: str
+    body: bytes
+
+class ResponseCache:
+    """In-process LRU of serialized JSON response bodies, evicting the least recently used past `max_bytes`."""
+    def __init__(self, max_bytes: int = RESPONSE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: OrderedDict[str, CachedResponse] = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: str) -> CachedResponse | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, entry: CachedResponse):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old.body)
+            if len(entry.body) > self.max_bytes:
+                return
+            self._entries[key] = entry
+            self.size += len(entry.body)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted.body)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+response_cache = ResponseCache()
+
+def encode_json(value: Any) -> Any:
+    """
+    orjson's fallback for types it does not serialize itself. Rows are zipped with their column names, skipping the
+    reflection `jsonable_encoder` does on ORM objects.
+    """
+    if isinstance(value, Row):
+        return dict(zip(value._fields, value))
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    return jsonable_encoder(value)
+
+def row_dicts(rows: Sequence[Row]) -> list[dict]:
+    """
+    Rows as dicts keyed by column name, zipping the names once for the whole list. For large lists this serializes
+    about twice as fast as leaving orjson to call `encode_json` on each row.
+    """
+    fields = rows[0]._fields if rows else ()
+    return [dict(zip(fields, row)) for row in rows]
+
+def dump_json(content: Any) -> bytes:
+    """Serialize a response body with orjson, which writes dates and datetimes in ISO format like `jsonable_encoder`."""
+    return orjson.dumps(content, default=encode_json, option=orjson.OPT_NON_STR_KEYS)
+
+async def cached_json_response(request: Request, db: AsyncSession, model_classes: tuple, build: Callable[[], Awaitable[Any]]) -> Response:
+    """
+    Serves the JSON for `await build()` from the response cache while the versions of the tables it reads are
+    unchanged. Responses carry a strong ETag of the body, and a matching `If-None-Match` is answered with 304 Not Modified.
+    """
+    versions = await db.run_sync(get_table_versions, *model_classes)
+    key = f"{request.url.path}?{'&'.join(sorted(f'{k}={v}' for k, v in request.query_params.multi_items()))}"
+
+    entry = response_cache.get(key)
+    if entry is None or entry.versions != versions:
+        body = dump_json(await build())
+        entry = CachedResponse(versions, f'"{sha1(body).hexdigest()}"', body)
+        response_cache.put(key, entry)
+
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if entry.etag in (tag.strip() for tag in request.headers.get("if-none-match", "").split(",")):
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
\ No newline at end of file
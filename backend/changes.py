@@ -0,0 +1,106 @@
+import os
+from sqlalchemy import Connection, event, func, select, text
+from sqlalchemy.orm import Session
+
+from db import Base
+from models import Employee, EmployeeChange
+
+# Triggers on `employees` append a row to `employee_changes` for every write, whatever the writer, in the same
+# transaction. A client that has cached employees asks for the changes after the last sequence number it saw, and gets
+# the current row of each employee upserted since then and the IDs of those deleted.
+CHANGE_LOG_RETENTION_DAYS = float(os.getenv("CHANGE_LOG_RETENTION_DAYS", 7)) # Changes older than this are compacted away
+CHANGE_LOG_COMPACT_EVERY = 1000 # Compact on every this many changes logged
+
+# Columns served by the API. Updates that only touch `row_hash` are not changes a client can see.
+EMPLOYEE_COLUMNS = tuple(column.key for column in Employee.__table__.columns if column.key not in ("id", "row_hash"))
+
+CHANGE_LOG_DDL = (
+    """
+    CREATE TRIGGER IF NOT EXISTS employee_changes_insert AFTER INSERT ON employees BEGIN
+        INSERT INTO employee_changes (employee_id, op) VALUES (new.id, 'upsert');
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS employee_changes_update AFTER UPDATE ON employees
+    WHEN {" OR ".join(f"new.{column} IS NOT old.{column}" for column in ("id", *EMPLOYEE_COLUMNS))}
+    BEGIN
+        INSERT INTO employee_changes (employee_id, op) SELECT old.id, 'delete' WHERE new.id IS NOT old.id;
+        INSERT INTO employee_changes (employee_id, op) VALUES (new.id, 'upsert');
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS employee_changes_delete AFTER DELETE ON employees BEGIN
+        INSERT INTO employee_changes (employee_id, op) VALUES (old.id, 'delete');
+    END
+    """,
+)
+
+CHANGE_LOG_COMPACT_DDL = f"""
+    CREATE TRIGGER employee_changes_compact AFTER INSERT ON employee_changes
+    WHEN new.seq % {CHANGE_LOG_COMPACT_EVERY} = 0
+    BEGIN
+        DELETE FROM employee_changes WHERE changed_at < datetime('now', '-{CHANGE_LOG_RETENTION_DAYS} days');
+    END
+"""
+Base.metadata.info.setdefault("ddl", []).extend((*CHANGE_LOG_DDL, CHANGE_LOG_COMPACT_DDL)) # See utils.schema_fingerprint
+
+class ChangeLogExpired(Exception):
+    """The changes after a sequence number have been compacted away, or it was never issued by this database."""
+
+@event.listens_for(Base.metadata, "after_create")
+def create_change_log_triggers(target, connection: Connection, **kw):
+    """
+    Create the change log triggers after `Base.metadata.create_all`. The compaction trigger is recreated every time, so
+    a new `CHANGE_LOG_RETENTION_DAYS` takes effect on the next start.
+    """
+    if connection.dialect.name != "sqlite":
+        return
+    for statement in CHANGE_LOG_DDL:
+        connection.exec_driver_sql(statement)
+    connection.exec_driver_sql("DROP TRIGGER IF EXISTS employee_changes_compact")
+    connection.exec_driver_sql(CHANGE_LOG_COMPACT_DDL)
+
+def latest_seq(db: Session) -> int:
+    """The last sequence number issued, 0 if nothing has been logged. Compaction never lowers it."""
+    return db.scalar(text("SELECT seq FROM sqlite_sequence WHERE name = 'employee_changes'")) or 0
+
+def check_since(since: int, db: Session) -> int:
+    """The last sequence number issued. Raises `ChangeLogExpired` if changes after `since` are not all logged."""
+    latest = latest_seq(db)
+    first = db.scalar(select(func.min(EmployeeChange.seq))) or latest + 1
+    if since < first - 1 or since > latest:
+        raise ChangeLogExpired(f"Changes since {since} are no longer available, fetch every employee again")
+    return latest
+
+def get_changes(since: int, limit: int, db: Session) -> dict:
+    """
+    Employees changed after sequence number `since`, at most `limit` of them, each once however often it changed. Pass
+    the returned `seq` as the next `since`; `more` is true if there are further changes to fetch straight away. Raises
+    `ChangeLogExpired` if changes after `since` are no longer logged, when the client has to fetch every employee again.
+    """
+    latest = check_since(since, db)
+
+    # Only the latest change to each employee matters, and its op says whether the employee still exists
+    last_change = (
+        select(EmployeeChange.employee_id, func.max(EmployeeChange.seq).label("seq"))
+        .where(EmployeeChange.seq > since)
+        .group_by(EmployeeChange.employee_id)
+        .subquery()
+    )
+    columns = ("id", *EMPLOYEE_COLUMNS)
+    stmt = (
+        select(last_change.c.seq, EmployeeChange.op, last_change.c.employee_id, *(getattr(Employee, column) for column in columns))
+        .join(EmployeeChange, EmployeeChange.seq == last_change.c.seq)
+        .outerjoin(Employee, (Employee.id == last_change.c.employee_id) & (EmployeeChange.op == "upsert"))
+        .order_by(last_change.c.seq)
+        .limit(limit + 1)
+    )
+    rows = db.execute(stmt).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "seq": rows[-1].seq if more else latest,
+        "more": more,
+        "upserts": [dict(zip(columns, row[3:])) for row in rows if row.op == "upsert"],
+        "deletes": [row.employee_id for row in rows if row.op == "delete"],
+    }
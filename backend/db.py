@@ -1,11 +1,89 @@
 import os
 from contextlib import contextmanager
-from sqlalchemy import create_engine
+from sqlalchemy import Engine, create_engine, event, make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, declarative_base
 
+from metrics import instrument_engine
+
 DB_URL = os.getenv("DATABASE_URL")
-engine = create_engine(DB_URL, connect_args={"check_same_thread": False}) # Allows SQLite to run in a non-threaded environment
+# Pragmas applied to every new SQLite connection. `default` leaves SQLite's own defaults in place. Any pragma can be
+# overridden with an env var named after it, e.g. SQLITE_SYNCHRONOUS=FULL, and an empty value skips it.
+DB_PROFILES = {
+    "default": {},
+    "tuned": {
+        "journal_mode": "WAL", # Readers no longer block on a writer, or a writer on readers
+        "synchronous": "NORMAL", # Safe with WAL; only the last commits may be lost on power failure
+        "cache_size": "-65536", # 64 MiB page cache per connection
+        "mmap_size": "268435456", # 256 MiB of the file memory-mapped
+        "temp_store": "MEMORY",
+        "busy_timeout": "5000", # Milliseconds to wait on a lock before raising 'database is locked'
+    },
+}
+DB_PROFILE = os.getenv("DB_PROFILE", "tuned")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5)) # Per process, so each Uvicorn worker holds its own pool
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+
+def get_pragmas(profile: str = DB_PROFILE) -> dict[str, str]:
+    """Returns the pragmas of an engine profile with any env var overrides applied."""
+    if profile not in DB_PROFILES:
+        raise ValueError(f"Unknown DB_PROFILE '{profile}'. Use one of {', '.join(DB_PROFILES)}.")
+    pragmas = {**DB_PROFILES[profile]}
+    for pragma in ("journal_mode", "synchronous", "cache_size", "mmap_size", "temp_store", "busy_timeout"):
+        value = os.getenv(f"SQLITE_{pragma.upper()}")
+        if value is not None:
+            pragmas[pragma] = value
+    return {pragma: value for pragma, value in pragmas.items() if value}
+
+def is_memory(url: str) -> bool:
+    """Returns True for in-memory SQLite URLs, whose database is private to a single connection."""
+    return make_url(url).get_backend_name() == "sqlite" and make_url(url).database in (None, "", ":memory:")
+
+def add_pragma_listener(engine: Engine, read_only: bool = False):
+    """Apply the pragmas of the configured profile to each new connection of `engine`, plus `query_only` if `read_only`."""
+    pragmas = get_pragmas() | ({"query_only": "ON"} if read_only else {})
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma, value in pragmas.items():
+            cursor.execute(f"PRAGMA {pragma}={value}")
+        cursor.close()
+
+def make_engine(url: str, read_only: bool = False):
+    """
+    Create an engine for `url` whose statements are counted and timed by `metrics`. SQLite connections get the pragmas
+    of the configured profile as they are opened and, when `read_only`, also refuse writes with `query_only`.
+    """
+    pool_args = {} if is_memory(url) else {"pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW}
+    if make_url(url).get_backend_name() != "sqlite":
+        engine = create_engine(url, **pool_args)
+    else:
+        engine = create_engine(url, connect_args={"check_same_thread": False}, **pool_args) # Allows SQLite to run in a non-threaded environment
+        add_pragma_listener(engine, read_only)
+    instrument_engine(engine)
+    return engine
+
+def make_async_engine(url: str, read_only: bool = False):
+    """Async counterpart of `make_engine`. SQLite URLs are switched to the `aiosqlite` driver."""
+    pool_args = {} if is_memory(url) else {"pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW}
+    if make_url(url).get_backend_name() != "sqlite":
+        async_engine = create_async_engine(url, **pool_args)
+    else:
+        async_engine = create_async_engine(make_url(url).set(drivername="sqlite+aiosqlite"), **pool_args)
+        add_pragma_listener(async_engine.sync_engine, read_only)
+    instrument_engine(async_engine.sync_engine)
+    return async_engine
+
+engine = make_engine(DB_URL)
+read_engine = engine if is_memory(DB_URL) else make_engine(DB_URL, read_only=True)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+ReadSessionLocal = sessionmaker(bind=read_engine, autoflush=False, autocommit=False, info={"read_only": True})
+# Objects stay loaded after commit, since an expired attribute cannot be lazily refreshed outside an await
+async_engine = make_async_engine(DB_URL)
+async_read_engine = async_engine if is_memory(DB_URL) else make_async_engine(DB_URL, read_only=True)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+AsyncReadSessionLocal = async_sessionmaker(bind=async_read_engine, autoflush=False, expire_on_commit=False, info={"read_only": True})
 Base = declarative_base()
 
 def get_db():
@@ -16,6 +94,24 @@ def get_db():
     finally:
         db.close()
 
+def get_read_db():
+    "Returns a read-only database session in a generator. For FastAPI dependency injection on GET routes."
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db():
+    "Returns an async database session in a generator. For FastAPI dependency injection."
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_async_read_db():
+    "Returns a read-only async database session in a generator. For FastAPI dependency injection on GET routes."
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
 @contextmanager
 def get_db_context():
     "Returns the current database session wrapped in a context manager. For external usage."
@@ -23,4 +119,13 @@ def get_db_context():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+@contextmanager
+def get_read_db_context():
+    "Returns a read-only database session wrapped in a context manager. For external usage."
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -1,18 +1,210 @@
+from sqlalchemy import Select, select, insert, update, delete
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from pydantic import ValidationError
+from pydantic import Field, TypeAdapter, ValidationError
 from datetime import datetime
+from hashlib import blake2b
+from typing import Annotated, Any, Callable, Iterable, Union
 from models import Employee
-from schemas import CreateEmployee
-from utils import summarize_errors
+from cache import lookup_cache, bump_table_versions
+from metrics import stage_timer
+from search import name_match
+from schemas import BulkEmployeeOperation, EmployeeFilters, EmployeeRow
+from utils import summarize_errors, merge_error_summaries
+
+EMPLOYEE_KEY_CHUNK_SIZE = 500 # Keeps (first_name, surname) IN lookups well under SQLite's bound parameter limit
+EMPLOYEE_ROW_ADAPTER = TypeAdapter(EmployeeRow)
+# Rows that fail `EmployeeRow` fall through to `Any` and come back as the same dict object, so a whole batch validates in
+# one call without stopping at the first invalid row
+EMPLOYEE_ROWS_ADAPTER = TypeAdapter(list[Annotated[Union[EmployeeRow, Any], Field(union_mode="left_to_right")]])
 
 def resolve_fk(model_class, name: str, db: Session):
-    "Resolve foreign key from name. Raises ValueError if not found."
-    instance = db.query(model_class).filter_by(name=name).first()
-    if not instance:
+    "Resolve foreign key from name using the lookup cache. Raises ValueError if not found."
+    id = lookup_cache.get_table(model_class, db).get(name)
+    if id is None:
         raise ValueError(f"{model_class.__name__} '{name}' not found in DB")
-    return instance.id
+    return id
+
+def apply_employee_filters(stmt: Select, filters: EmployeeFilters) -> Select:
+    """Adds a WHERE clause to an employee query for each filter that is set."""
+    for field, value in filters.model_dump(exclude_none=True, exclude={"q", "start_date_from", "start_date_to"}).items():
+        stmt = stmt.where(getattr(Employee, field) == value)
+    if filters.start_date_from:
+        stmt = stmt.where(Employee.start_date >= filters.start_date_from)
+    if filters.start_date_to:
+        stmt = stmt.where(Employee.start_date <= filters.start_date_to)
+    if filters.q:
+        stmt = stmt.where(name_match(filters.q))
+    return stmt
+
+def get_employees_by_name(keys: set[tuple[str, str]], db: Session) -> dict[tuple[str, str], dict]:
+    """Fetch existing employees as plain dicts keyed by (first_name, surname), in chunked queries."""
+    ordered_keys = list(keys)
+    existing = {}
+    for start in range(0, len(ordered_keys), EMPLOYEE_KEY_CHUNK_SIZE):
+        chunk = ordered_keys[start:start + EMPLOYEE_KEY_CHUNK_SIZE]
+        # Probing on first_name alone uses the leading column of uq_employee_name; surnames are matched below
+        stmt = select(Employee.__table__).where(Employee.first_name.in_({first_name for first_name, _ in chunk}))
+        for row in db.execute(stmt).mappings():
+            key = (row["first_name"], row["surname"])
+            if key in keys:
+                existing[key] = dict(row)
+    return existing
+
+def hash_record(record: dict, division_id: int) -> str:
+    """Content hash of a parsed CSV record, stored as `Employee.row_hash` to recognise rows that have not changed."""
+    return blake2b(repr((division_id, sorted(record.items()))).encode(), digest_size=16).hexdigest()
+
+def get_row_hashes(division_id: int, db: Session) -> dict[tuple[str, str], str]:
+    """Fetch the row hash of every employee in a division that was last written by ingestion, keyed by (first_name, surname)."""
+    stmt = select(Employee.first_name, Employee.surname, Employee.row_hash).where(Employee.division_id == division_id, Employee.row_hash.is_not(None))
+    return {(first_name, surname): row_hash for first_name, surname, row_hash in db.execute(stmt)}
+
+def is_unchanged(known_hashes: dict[tuple[str, str], str], key: tuple[str, str], row_hash: str) -> bool:
+    """
+    True if `row_hash` is the hash last ingested for the employee `key`. Otherwise forgets the employee's hash, since the
+    row is about to be written, so any later row for them in the same run is compared in full.
+    """
+    if known_hashes.get(key) == row_hash:
+        return True
+    known_hashes.pop(key, None)
+    return False
 
-def add_employees_from_records(records: list[dict], division_id: int, db: Session, dt: datetime = datetime.now()) -> tuple[int, int, list[dict]]:
+@stage_timer("validation")
+def validate_employee_records(
+    records: list[dict],
+    division_id: int,
+    dt: datetime,
+    row_offset: int = 0,
+    known_hashes: dict[tuple[str, str], str] | None = None
+) -> tuple[list[dict], list[dict]]:
+    """
+    Validate records against the constraints of `CreateEmployee` in a single batch, without building a model per row.
+    Returns the rows as dicts, each with its `row_hash`, and the errors in the shape `summarize_errors` expects. Records
+    matching `known_hashes` (see `get_row_hashes`) are unchanged and left out.
+    """
+    rows = []
+    for idx, record in enumerate(records):
+        row_hash = hash_record(record, division_id)
+        if known_hashes is not None and is_unchanged(known_hashes, (record.get("first_name"), record.get("surname")), row_hash):
+            continue
+        rows.append((idx, row_hash, {**record, "division_id": division_id, "last_updated": dt}))
+
+    validated = []
+    errors = []
+    results = EMPLOYEE_ROWS_ADAPTER.validate_python([row for _, _, row in rows])
+    for (idx, row_hash, row), result in zip(rows, results):
+        if result is not row:
+            result["row_hash"] = row_hash
+            validated.append(result)
+            continue
+        try:
+            EMPLOYEE_ROW_ADAPTER.validate_python(row) # Only invalid rows get here, to collect their errors
+        except ValidationError as ve:
+            errors.extend([{"row": row_offset + idx,"field": err["loc"][0],"error": err["msg"],"type": err["type"]} for err in ve.errors()])
+    return validated, errors
+
+def merge_employee_rows(validated: list[dict], existing: dict[tuple[str, str], dict], creates: dict[tuple[str, str], dict], updates: dict[tuple[str, str], dict]) -> tuple[int, int]:
+    """
+    Apply validated rows in order to `existing` employees and those already in `creates`, all keyed by (first_name,
+    surname), in memory. A row replaces the current version of its employee unless that was updated later. New
+    employees are added to `creates` and changed existing ones to `updates`. Returns the created and updated counts.
+    """
+    created_count = 0
+    updated_count = 0
+    for data in validated:
+        key = (data["first_name"], data["surname"])
+        current = creates.get(key) or existing.get(key)
+        if current is None:
+            creates[key] = data
+            created_count += 1
+        elif current["last_updated"] <= data["last_updated"]:
+            updated = any(current[field] != value for field, value in data.items() if field not in ("last_updated", "row_hash"))
+            if updated:
+                current.update(data)
+                if key in existing:
+                    updates[key] = current
+                updated_count += 1
+            elif current.get("row_hash") != data.get("row_hash"):
+                current["row_hash"] = data.get("row_hash") # Remember the row without counting an update
+                if key in existing:
+                    updates[key] = current
+    return created_count, updated_count
+
+@stage_timer("upsert")
+def upsert_employees(validated: list[dict], db: Session) -> tuple[int, int]:
+    """
+    Create or update validated employee rows. Existing employees are fetched for the whole batch up front, compared in
+    memory and written back with a single bulk insert and a single bulk update. Bumps the employees table version if
+    anything was written. Does not commit.
+    """
+    existing = get_employees_by_name({(data["first_name"], data["surname"]) for data in validated}, db)
+    creates = {}
+    updates = {}
+    created_count, updated_count = merge_employee_rows(validated, existing, creates, updates)
+
+    if creates:
+        db.execute(insert(Employee), list(creates.values()))
+    if updates:
+        db.execute(update(Employee), list(updates.values()))
+    if creates or updates:
+        bump_table_versions(db, Employee)
+    return created_count, updated_count
+
+class CollapsedEmployees:
+    """
+    The newest version of each employee across every snapshot of an ingest run, folded in memory by the rules of
+    `upsert_employees` and written to the database in one pass by `write`. Only employees named in the snapshots are
+    held, so memory is bounded by the number of employees rather than rows.
+    """
+    def __init__(self):
+        self.existing: dict[tuple[str, str], dict] = {} # Employees in the database named so far, as updated by the run
+        self.creates: dict[tuple[str, str], dict] = {}
+        self.updates: dict[tuple[str, str], dict] = {}
+        self.row_hashes: dict[tuple[str, str], str | None] = {} # Hash of the current version of each employee folded
+
+    def known_hashes(self, division_id: int, db: Session, stored: bool = True) -> dict[tuple[str, str], str | None]:
+        """
+        Row hashes to skip a division's unchanged rows with, as `known_hashes`: the current version of every employee
+        folded so far and, if `stored`, the hashes in the database of the division's other employees. A row that
+        repeats an earlier snapshot of the run is skipped like one that repeats the database.
+        """
+        if stored:
+            self.row_hashes.update({key: row_hash for key, row_hash in get_row_hashes(division_id, db).items() if key not in self.existing and key not in self.creates})
+        return self.row_hashes
+
+    @stage_timer("upsert")
+    def add(self, validated: list[dict], db: Session) -> tuple[int, int]:
+        """Fold validated rows into the current versions without writing them. Returns the created and updated counts."""
+        keys = {(data["first_name"], data["surname"]) for data in validated}
+        self.existing.update(get_employees_by_name(keys - self.existing.keys() - self.creates.keys(), db))
+        counts = merge_employee_rows(validated, self.existing, self.creates, self.updates)
+        for key in keys:
+            self.row_hashes[key] = (self.creates.get(key) or self.existing[key]).get("row_hash")
+        return counts
+
+    @stage_timer("upsert")
+    def write(self, db: Session, chunksize: int) -> tuple[int, int]:
+        """Insert the new employees and update the changed ones, `chunksize` rows to a statement. Does not commit."""
+        creates = list(self.creates.values())
+        updates = list(self.updates.values())
+        for start in range(0, len(creates), chunksize):
+            db.execute(insert(Employee), creates[start:start + chunksize])
+        for start in range(0, len(updates), chunksize):
+            db.execute(update(Employee), updates[start:start + chunksize])
+        if creates or updates:
+            bump_table_versions(db, Employee)
+        return len(creates), len(updates)
+
+def add_employees_from_records(
+    records: list[dict],
+    division_id: int,
+    db: Session,
+    dt: datetime | None = None,
+    row_offset: int = 0,
+    known_hashes: dict[tuple[str, str], str] | None = None,
+    collapsed: CollapsedEmployees | None = None
+) -> tuple[int, int, list[dict]]:
     """
     Add employees from records.
     
@@ -25,6 +217,12 @@ def add_employees_from_records(records: list[dict], division_id: int, db: Sessio
         Database session.
     dt :datetime
         Datetime of CSV file ingestion. Defaults to current datetime.
+    row_offset :int
+        Added to each record's index when reporting errors, for records that are one chunk of a larger file.
+    known_hashes :dict[tuple[str, str], str]
+        Row hashes from `get_row_hashes`. Records that match are skipped without validation or a database lookup.
+    collapsed :CollapsedEmployees
+        Fold the records into these current versions instead of writing and committing them.
 
     # Returns
     created_count : int
@@ -34,37 +232,137 @@ def add_employees_from_records(records: list[dict], division_id: int, db: Sessio
     errors : list[dict]
         List of errors.
     """
-    objects = []
-    errors = []
+    dt = dt or datetime.now()
+    validated, errors = validate_employee_records(records, division_id, dt, row_offset, known_hashes)
+    if collapsed is not None:
+        created_count, updated_count = collapsed.add(validated, db)
+        return created_count, updated_count, summarize_errors(errors)
+    created_count, updated_count = upsert_employees(validated, db)
+    with stage_timer("commit"):
+        db.commit()
+    return created_count, updated_count, summarize_errors(errors)
+
+def add_employees_from_chunks(
+    chunks: Iterable[list[dict]],
+    division_id: int,
+    db: Session,
+    dt: datetime | None = None,
+    on_chunk: Callable[[int, int, int, list[dict]], None] | None = None,
+    known_hashes: dict[tuple[str, str], str] | None = None,
+    collapsed: CollapsedEmployees | None = None
+) -> tuple[int, int, list[dict]]:
+    """
+    Add employees from an iterable of record chunks, such as those yielded by `DivisionCSVParser.iter_csv`. Each chunk is
+    upserted and committed before the next is read, so only one chunk is held in memory at a time.
+
+    # Parameters
+    chunks :Iterable[list[dict]]
+        Chunks of employee records.
+    division_id :int
+        Division ID.
+    db :Session
+        Database session.
+    dt :datetime
+        Datetime of CSV file ingestion. Defaults to current datetime.
+    on_chunk :Callable[[int, int, int, list[dict]], None]
+        Called after each chunk is committed with its record, created and updated counts and summarized errors.
+    known_hashes :dict[tuple[str, str], str]
+        Row hashes from `get_row_hashes`, passed to `add_employees_from_records` for every chunk.
+    collapsed :CollapsedEmployees
+        Fold every chunk into these current versions instead of writing and committing it.
+
+    # Returns
+    created_count : int
+        Number of employees created across all chunks.
+    updated_count : int
+        Number of employees updated across all chunks.
+    errors : list[dict]
+        Summarized errors across all chunks, with rows numbered from the first record of the first chunk.
+    """
+    dt = dt or datetime.now()
     created_count = 0
     updated_count = 0
+    summaries = []
+    row_offset = 0
 
-    for idx, record in enumerate(records):
-        try:
-            employee = CreateEmployee(**record, division_id=division_id, last_updated=dt)
-            data = employee.model_dump()
-            existing = db.query(Employee).filter_by(
-                first_name=employee.first_name,
-                surname=employee.surname
-            ).first()
-            
-            if existing:
-                if existing.last_updated <= employee.last_updated:
-                    updated = any(getattr(existing, field) != value for field, value in data.items() if field != "last_updated")
-                    if updated:
-                        for field, value in data.items():
-                            setattr(existing, field, value)
-                        updated_count += 1
-            else:
-                new_employee = Employee(**data)
-                objects.append(new_employee)
-                created_count += 1
+    for records in chunks:
+        created, updated, errors = add_employees_from_records(records, division_id, db, dt, row_offset, known_hashes, collapsed)
+        created_count += created
+        updated_count += updated
+        summaries.append(errors)
+        row_offset += len(records)
+        if on_chunk: on_chunk(len(records), created, updated, errors)
 
-        except ValidationError as ve:
-            errors.extend([{"row": idx,"field": err["loc"][0],"error": err["msg"],"type": err["type"]} for err in ve.errors()])
+    return created_count, updated_count, merge_error_summaries(summaries)
+
+def apply_employee_operations(operations: list[tuple[int, BulkEmployeeOperation]], db: Session) -> list[dict]:
+    """
+    Apply a batch of `(index, operation)` pairs from `POST /employees/bulk` in one transaction and commit it. Returns a
+    result per operation in the shape of `BulkEmployeeResult`.
+
+    Operations are checked in order against the employees they touch, fetched up front, so a missing ID or a name that
+    is already taken fails only that operation. Writes are then issued as one bulk delete, update and insert. Should the
+    batch still break a constraint, it is rolled back and retried one operation per transaction.
+    """
+    try:
+        results = check_employee_operations(operations, db)
+        db.commit()
+        return results
+    except IntegrityError as e:
+        db.rollback()
+        if len(operations) > 1:
+            return [result for operation in operations for result in apply_employee_operations([operation], db)]
+        return [{"index": operations[0][0], "status": "failed", "error": f"Conflicts with another employee. {e.orig}"}]
+
+def check_employee_operations(operations: list[tuple[int, BulkEmployeeOperation]], db: Session) -> list[dict]:
+    """Checks and writes a batch for `apply_employee_operations`, without committing."""
+    ids = {operation.id for _, operation in operations if operation.id is not None}
+    current = {row.id: (row.first_name, row.surname) for row in db.execute(select(Employee.id, Employee.first_name, Employee.surname).where(Employee.id.in_(ids)))}
+    keys = {(operation.employee.first_name, operation.employee.surname) for _, operation in operations if operation.employee}
+    owners = {key: row["id"] for key, row in get_employees_by_name(keys, db).items()} # Name -> ID, or None for a pending create
+    owners.update({key: id for id, key in current.items()})
+
+    results = []
+    creates = {}; updates = {}; deletes = set()
+    for index, operation in operations:
+        if operation.op != "create" and operation.id not in current:
+            results.append({"index": index, "status": "failed", "id": operation.id, "error": "Employee not found"})
+            continue
+        key = (operation.employee.first_name, operation.employee.surname) if operation.employee else current[operation.id]
+        if operation.op != "delete" and key in owners and owners[key] != operation.id:
+            results.append({"index": index, "status": "failed", "id": operation.id, "error": f"An employee named {' '.join(key)} already exists"})
+            continue
 
-    if objects:
-        db.add_all(objects)
+        if operation.op == "create":
+            owners[key] = None
+            creates[index] = operation.employee.model_dump()
+            results.append({"index": index, "status": "created"})
+        elif operation.op == "update":
+            owners.pop(current[operation.id], None)
+            owners[key] = operation.id
+            current[operation.id] = key
+            updates[operation.id] = {**operation.employee.model_dump(), "id": operation.id, "row_hash": None}
+            results.append({"index": index, "status": "updated", "id": operation.id})
+        else:
+            owners.pop(key, None)
+            del current[operation.id]
+            updates.pop(operation.id, None)
+            deletes.add(operation.id)
+            results.append({"index": index, "status": "deleted", "id": operation.id})
 
-    db.commit()
-    return created_count, updated_count, summarize_errors(errors)
\ No newline at end of file
+    # Deletes and renames first, so names they free up can be taken by later creates
+    if deletes:
+        db.execute(delete(Employee).where(Employee.id.in_(deletes)))
+    if updates:
+        db.execute(update(Employee), list(updates.values()))
+    if creates:
+        # Read back by name, which is unique, since SQLite would run an ordered INSERT ... RETURNING one row at a time
+        db.execute(insert(Employee), list(creates.values()))
+        created = get_employees_by_name({(employee["first_name"], employee["surname"]) for employee in creates.values()}, db)
+        for result in results:
+            if result["status"] == "created":
+                employee = creates[result["index"]]
+                result["id"] = created[(employee["first_name"], employee["surname"])]["id"]
+    if creates or updates or deletes:
+        bump_table_versions(db, Employee)
+    return results
@@ -1,62 +1,240 @@
 from pathlib import Path
+from hashlib import sha256
 from dotenv import load_dotenv
 from re import search, Match
 from datetime import datetime
+from collections import deque
+from itertools import islice
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Iterator
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from time import perf_counter
 
 load_dotenv(override=False)
 
-from db import engine, get_db_context
-from db_ops import add_employees_from_records
-from models import Base
-from utils import seed_db
-from parsers import csv_parser
+from db import engine, read_engine, get_db_context, get_read_db_context
+from db_ops import CollapsedEmployees, add_employees_from_chunks, validate_employee_records, upsert_employees, get_row_hashes, is_unchanged
+from models import IngestedFile
+from utils import init_db, summarize_errors
+from parsers import csv_parser, CSV_CHUNK_SIZE
+from metrics import INGEST_STAGES, QueryStats, query_stats, stage_timer, stage_totals
+import aggregates, changes # Register the summary table's and change log's triggers with create_all
 
 def get_date_from_path(path: Path) -> datetime | None:
-    """Returns the datetime from the filename if it matches the regex '_(\\d{8})\\.csv$', otherwise None."""
-    match = search(r'_(\d{8})\.csv$', path.name)
+    """Returns the datetime from the filename if it matches the regex '_(\\d{8})\\.(csv|parquet)$', otherwise None."""
+    match = search(r'_(\d{8})\.(csv|parquet)$', path.name)
     if not isinstance(match, Match):
         return None
     else:
         return datetime.strptime(match.group(1), "%Y%m%d")
 
-if __name__ == "__main__":
-    import argparse
+def get_csv_path_dates(division_dir: Path) -> list[tuple[Path, datetime]]:
+    """Returns the dated CSV and Parquet files in a division directory, oldest first."""
+    all_csv_path_dates = [(csv_path, get_date_from_path(csv_path)) for csv_path in (*division_dir.glob("*.csv"), *division_dir.glob("*.parquet"))]
+    return sorted(filter(lambda csv_path_date: csv_path_date[1] is not None, all_csv_path_dates), key=lambda csv_path_date: csv_path_date[1])
 
-    parser = argparse.ArgumentParser()
-    parser.add_argument("directory", type=Path)
-    args = parser.parse_args()
+def hash_file(path: Path) -> str:
+    """SHA-256 of a file's contents, read in 1 MiB blocks."""
+    digest = sha256()
+    with open(path, "rb") as f:
+        while block := f.read(1 << 20):
+            digest.update(block)
+    return digest.hexdigest()
+
+def check_manifest(csv_path: Path, division_id: int, csv_date: datetime, db: Session, force: bool = False) -> IngestedFile | None:
+    """
+    Returns None if the file was already applied for this division and date, otherwise a manifest entry to save with
+    `db.merge` once it has been ingested. A file whose size or mtime changed is hashed, and only counts as new if its
+    contents did too; otherwise its stored size and mtime are refreshed. `force` always returns an entry.
+    """
+    path = str(csv_path.resolve())
+    stat = csv_path.stat()
+    applied = None if force else db.get(IngestedFile, path)
+    if applied and (applied.division_id, applied.file_date) == (division_id, csv_date):
+        if (applied.size, applied.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+            return None
+        if applied.content_hash == hash_file(csv_path):
+            applied.size, applied.mtime_ns = stat.st_size, stat.st_mtime_ns
+            db.commit()
+            return None
+    return IngestedFile(path=path, division_id=division_id, file_date=csv_date, size=stat.st_size, mtime_ns=stat.st_mtime_ns, content_hash=hash_file(csv_path))
+
+def init_worker():
+    """Process pool initializer. Drops database connections inherited from the parent process."""
+    engine.dispose(close=False)
+    read_engine.dispose(close=False)
+
+def parse_and_validate(csv_path: Path, division_id: int, csv_date: datetime, chunksize: int) -> tuple[list[dict], list[dict], dict[str, tuple[float, int]]]:
+    """
+    Parse and validate a division CSV without writing to the database. Returns validated rows, summarized errors and
+    the stage timings of this call, since a worker's own metrics never reach the parent process.
+    """
+    before = stage_totals()
+    validated = []; errors = []; row_offset = 0
+    with get_read_db_context() as db:
+        for records, _ in csv_parser.iter_csv(csv_path, csv_parser.plans[division_id], db, chunksize):
+            chunk_validated, chunk_errors = validate_employee_records(records, division_id, csv_date, row_offset)
+            validated.extend(chunk_validated)
+            errors.extend(chunk_errors)
+            row_offset += len(records)
+    timings = {stage: (seconds - before.get(stage, (0, 0))[0], count - before.get(stage, (0, 0))[1]) for stage, (seconds, count) in stage_totals().items()}
+    return validated, summarize_errors(errors), timings
 
-    root_dir: Path = args.directory
-    division_dirs = filter(lambda dir: dir.is_dir() and "division" in dir.name.lower(), root_dir.iterdir())
-    
-    employees = []
+def merge_timings(*timings: dict[str, tuple[float, int]]) -> dict[str, tuple[float, int]]:
+    """Adds up stage timings from `stage_totals` or `parse_and_validate`."""
+    merged = {}
+    for stage_timings in timings:
+        for stage, (seconds, count) in stage_timings.items():
+            merged_seconds, merged_count = merged.get(stage, (0.0, 0))
+            merged[stage] = (merged_seconds + seconds, merged_count + count)
+    return merged
+
+def print_profile(timings: dict[str, tuple[float, int]], queries: QueryStats, elapsed: float):
+    """Print the time spent in each ingest stage against the wall-clock time of the run."""
+    print(f"{'stage':<14} {'seconds':>8} {'share':>7} {'blocks':>7}")
+    for stage in INGEST_STAGES:
+        seconds, count = timings.get(stage, (0.0, 0))
+        print(f"{stage:<14} {seconds:8.2f} {seconds / elapsed:7.1%} {count:>7}")
+    print(f"{'total':<14} {elapsed:8.2f}")
+    print(f"{queries.count} SQL statements in this process, {queries.seconds:.2f}s executing")
+
+def iter_parsed(jobs: list[tuple[Path, int, datetime]], workers: int, chunksize: int) -> Iterator[Future]:
+    """Parses jobs in a process pool, yielding futures in job order with at most two per worker in flight."""
+    with ProcessPoolExecutor(workers, initializer=init_worker) as executor:
+        jobs = iter(jobs)
+        pending = deque(executor.submit(parse_and_validate, *job, chunksize) for job in islice(jobs, workers * 2))
+        while pending:
+            future = pending.popleft()
+            pending.extend(executor.submit(parse_and_validate, *job, chunksize) for job in islice(jobs, 1))
+            yield future
+
+def ingest_directory(root_dir: Path, chunksize: int = CSV_CHUNK_SIZE, workers: int = 1, force: bool = False, collapse: bool = False):
+    """
+    Ingest every dated CSV in the division directories of `root_dir`.
+
+    Files recorded in the `ingested_files` manifest with the same contents are skipped. In files that did change, rows
+    whose hash matches the one stored on their employee are skipped before validation. `force` re-ingests everything.
+
+    With more than one worker, files are parsed and validated in a process pool while this process remains the only
+    database writer. Results are applied in the same division and date order as a serial run, so the `last_updated`
+    precedence and the printed output are unchanged.
+
+    With `collapse`, every file is parsed and folded into the newest version of each employee in memory, in the same
+    order, and those are written with a single upsert pass and commit at the end. An employee that appears in many
+    snapshots is written once, and rows repeating an earlier snapshot are skipped before validation. The database ends
+    up as after a serial run, and each file's counts are those a serial run would print.
+
+    Returns the seconds spent and blocks timed in each ingest stage, by this process and its workers combined.
+    """
+    division_dirs = sorted(filter(lambda dir: dir.is_dir() and "division" in dir.name.lower(), root_dir.iterdir()), key=lambda dir: dir.name)
+    plan = [(division_id, division_dir, get_csv_path_dates(division_dir)) for division_id, division_dir in enumerate(division_dirs, start=1)]
 
-    Base.metadata.create_all(bind=engine) # Create tables
     with get_db_context() as db:
-        seed_db(db) # Seed database with primitives
+        init_db(db) # Create tables and seed database with primitives
+
+        pending = {} # Manifest entries of the files to ingest, saved as each one succeeds
+        for division_id, _, csv_path_dates in plan:
+            if division_id not in csv_parser.plans:
+                continue
+            for csv_path, csv_date in csv_path_dates:
+                entry = check_manifest(csv_path, division_id, csv_date, db, force)
+                if entry:
+                    pending[csv_path] = entry
 
-        for division_id, division_dir in enumerate(division_dirs, start=1):
+        collapsed = CollapsedEmployees() if collapse else None
+        applied = [] # Manifest entries saved with the collapsed employees
+        worker_timings = {}
+        jobs = [(csv_path, division_id, csv_date) for division_id, _, csv_path_dates in plan if division_id in csv_parser.plans for csv_path, csv_date in csv_path_dates if csv_path in pending]
+        parsed = iter_parsed(jobs, workers, chunksize) if workers > 1 else None
+
+        for division_id, division_dir, csv_path_dates in plan:
             print(f"Processing division {division_id}: {division_dir.name}")
 
-            division_schema = csv_parser.schemas.get(division_id)
+            division_schema = csv_parser.plans.get(division_id)
             if not division_schema:
                 print(f"No schema exists for division {division_id}. Please ensure there is YAML file for this division.")
                 continue
-            
-            all_csv_path_dates = [(csv_path, get_date_from_path(csv_path)) for csv_path in division_dir.glob("*.csv")]
-            csv_path_dates: list[tuple[Path, datetime]] = sorted(filter(lambda csv_path_date: csv_path_date[1] is not None, all_csv_path_dates), key=lambda csv_path_date: csv_path_date[1])
-            
+
+            if collapsed is not None:
+                known_hashes = collapsed.known_hashes(division_id, db, stored=not force)
+            else:
+                known_hashes = None if force else get_row_hashes(division_id, db)
             for csv_path, csv_date in csv_path_dates:
+                if csv_path not in pending:
+                    print(f"Skipping {csv_path.name}, unchanged since it was ingested")
+                    continue
                 print(f"Processing {csv_path.name}")
 
                 try:
-                    records, errors = csv_parser.parse_csv(csv_path, division_schema, db)
+                    if parsed:
+                        validated, errors, timings = next(parsed).result()
+                        worker_timings = merge_timings(worker_timings, timings)
+                        if known_hashes is not None:
+                            validated = [row for row in validated if not is_unchanged(known_hashes, (row["first_name"], row["surname"]), row["row_hash"])]
+                        if collapsed is not None:
+                            success_count, updated_count = collapsed.add(validated, db)
+                        else:
+                            success_count = updated_count = 0
+                            for start in range(0, len(validated), chunksize):
+                                created, updated = upsert_employees(validated[start:start + chunksize], db)
+                                with stage_timer("commit"):
+                                    db.commit()
+                                success_count += created
+                                updated_count += updated
+                    else:
+                        chunks = (records for records, _ in csv_parser.iter_csv(csv_path, division_schema, db, chunksize))
+                        success_count, updated_count, errors = add_employees_from_chunks(chunks, division_id, db, csv_date, known_hashes=known_hashes, collapsed=collapsed)
+                except SQLAlchemyError:
+                    raise
                 except Exception as e:
-                    print(e)
+                    print(e) # Chunks before the failing one remain committed
                     continue
 
-                success_count, updated_count, errors = add_employees_from_records(records, division_id, db, csv_date)
+                if collapsed is not None:
+                    applied.append(pending[csv_path])
+                else:
+                    db.merge(pending[csv_path])
+                    db.commit()
                 print(f"Created {success_count} employees with division {division_id}.")
                 print(f"Updated {updated_count} employees with division {division_id}.")
                 if errors: print(errors)
-                
\ No newline at end of file
+
+        if parsed:
+            parsed.close() # Shuts down the process pool
+
+        if collapsed is not None:
+            created_count, updated_count = collapsed.write(db, chunksize)
+            for entry in applied:
+                db.merge(entry)
+            with stage_timer("commit"):
+                db.commit()
+            print(f"Wrote {created_count} new and {updated_count} changed employees from {len(applied)} files in one pass.")
+    return merge_timings(stage_totals(), worker_timings)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory", type=Path)
+    parser.add_argument("--chunksize", type=int, default=CSV_CHUNK_SIZE, help="Rows parsed and committed per batch")
+    parser.add_argument("--workers", type=int, default=1, help="Processes used to parse and validate CSVs in parallel")
+    parser.add_argument("--force", action="store_true", help="Re-ingest files and rows that are unchanged since they were last ingested")
+    parser.add_argument("--collapse", action="store_true", help="Keep only the newest version of each employee across every file in memory and write them in one pass")
+    parser.add_argument("--profile", action="store_true", help="Print the time spent in each ingest stage and the SQL statements executed")
+    parser.add_argument("--cprofile", type=Path, help="Write cProfile stats of the run to this file, for `python -m pstats` or snakeviz")
+    args = parser.parse_args()
+
+    queries = QueryStats()
+    query_stats.set(queries)
+    start = perf_counter()
+    if args.cprofile:
+        import cProfile
+        with cProfile.Profile() as profiler:
+            timings = ingest_directory(args.directory, args.chunksize, args.workers, args.force, args.collapse)
+        profiler.dump_stats(args.cprofile)
+    else:
+        timings = ingest_directory(args.directory, args.chunksize, args.workers, args.force, args.collapse)
+    if args.profile:
+        # Stages run by workers are summed across processes, so their shares can add up to more than the total
+        print_profile(timings, queries, perf_counter() - start)
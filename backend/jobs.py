@@ -0,0 +1,132 @@
+import os, tempfile
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from threading import Lock
+from typing import BinaryIO
+from uuid import uuid4
+from shutil import copyfileobj
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from db import get_db_context
+from db_ops import add_employees_from_chunks, get_row_hashes
+from models import IngestJob
+from utils import merge_error_summaries
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", Path(tempfile.gettempdir()) / "employee_uploads"))
+
+def spool_upload(file: BinaryIO, division_id: int, filename: str, db: Session) -> IngestJob:
+    """Copy an uploaded CSV to `UPLOAD_DIR` and record a queued job for it. Blocking."""
+    job = IngestJob(id=uuid4().hex, division_id=division_id, filename=filename or "upload.csv")
+    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    with open(UPLOAD_DIR / f"{job.id}.csv", "wb") as f:
+        copyfileobj(file, f)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+def run_job(job_id: str):
+    """
+    Parse and write a spooled upload in chunks, committing the job's progress after each chunk. Failures are recorded
+    on the job rather than raised. The spooled file is deleted afterwards.
+    """
+    from parsers import csv_parser # Imported on first use, as it loads pandas
+
+    path = UPLOAD_DIR / f"{job_id}.csv"
+    with get_db_context() as db:
+        job = db.get(IngestJob, job_id)
+        job.state = "running"
+        job.started_at = datetime.now()
+        db.commit()
+
+        def on_chunk(rows: int, created: int, updated: int, errors: list[dict]):
+            job.rows_parsed += rows
+            job.created += created
+            job.updated += updated
+            job.errors = merge_error_summaries([job.errors, errors])
+            db.commit()
+
+        try:
+            chunks = (records for records, _ in csv_parser.iter_csv(path, csv_parser.plans[job.division_id], db))
+            add_employees_from_chunks(chunks, job.division_id, db, on_chunk=on_chunk, known_hashes=get_row_hashes(job.division_id, db))
+            job.state = "succeeded"
+        except SQLAlchemyError as e:
+            print(e)
+            db.rollback()
+            job.state, job.detail = "failed", "Database error while writing employees."
+        except Exception as e:
+            print(e)
+            db.rollback()
+            job.state, job.detail = "failed", f"Failed to parse CSV. {e}" # Chunks before the failing one remain committed
+        finally:
+            job.finished_at = datetime.now()
+            db.commit()
+            path.unlink(missing_ok=True)
+
+def recover_jobs(db: Session) -> list[tuple[str, int]]:
+    """
+    Settle the jobs a previous run left unfinished, since the queue does not outlive the process. Returns the ID and
+    division of each job still queued with its spooled file in place, oldest first, to submit again. Jobs that were
+    running, or whose file is gone, are marked failed and their file deleted; chunks a running job committed remain.
+    """
+    queued = []
+    for job in db.scalars(select(IngestJob).where(IngestJob.state.in_(("queued", "running"))).order_by(IngestJob.submitted_at)):
+        path = UPLOAD_DIR / f"{job.id}.csv"
+        if job.state == "queued" and path.exists():
+            queued.append((job.id, job.division_id))
+            continue
+        job.detail = "Interrupted by a restart. Rows from chunks already written remain, upload the file again to finish it." if job.state == "running" else "The uploaded file was lost in a restart, upload it again."
+        job.state, job.finished_at = "failed", datetime.now()
+        path.unlink(missing_ok=True)
+    db.commit()
+    return queued
+
+class JobQueue:
+    """
+    Runs ingestion jobs in a thread pool. Jobs for the same division run one at a time in submission order so they do
+    not contend for the SQLite write lock, while jobs for different divisions may run side by side.
+    """
+    def __init__(self, workers: int = JOB_WORKERS):
+        self.workers = workers
+        self._executor = None
+        self._pending: dict[int, deque[str]] = defaultdict(deque)
+        self._running: set[int] = set()
+        self._lock = Lock()
+
+    def submit(self, job_id: str, division_id: int):
+        with self._lock:
+            self._pending[division_id].append(job_id)
+            if division_id not in self._running:
+                self._start_next(division_id)
+
+    def _start_next(self, division_id: int):
+        """Start the division's next pending job, if any. Must hold `_lock`."""
+        if not self._pending[division_id]:
+            self._running.discard(division_id)
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="ingest")
+        self._running.add(division_id)
+        self._executor.submit(self._run, self._pending[division_id].popleft(), division_id)
+
+    def _run(self, job_id: str, division_id: int):
+        try:
+            run_job(job_id)
+        finally:
+            with self._lock:
+                self._start_next(division_id)
+
+    def shutdown(self):
+        """Wait for running jobs. Jobs still pending are left queued, for `recover_jobs` to submit again on the next start."""
+        with self._lock:
+            self._pending.clear()
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=True)
+
+job_queue = JobQueue()
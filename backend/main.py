@@ -1,37 +1,53 @@
 from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
+from typing import BinaryIO
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from io import BytesIO
 from dotenv import load_dotenv
 
 load_dotenv(override=False)
 
-from db import engine, get_db, get_db_context
-from db_ops import add_employees_from_records
-from models import Base, Division
-from parsers import csv_parser
-from routers import employees, divisions, ranks, positions, departments, bands
-from utils import seed_db
+from db import async_engine, async_read_engine, get_async_read_db, get_db, get_db_context
+from cache import lookup_cache
+from jobs import job_queue, recover_jobs, spool_upload
+from metrics import MetricsMiddleware, render_metrics
+from models import Division
+from read_index import employee_index
+from schemas import IngestJobStatus
+from routers import employees, divisions, ranks, positions, departments, bands, jobs, aggregates
+from utils import FAST_STARTUP, init_db
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    Base.metadata.create_all(bind=engine) # Create tables
     with get_db_context() as db:
-        seed_db(db) # Seed database with primitives
+        init_db(db) # Create tables and seed database with primitives
+        for job_id, division_id in recover_jobs(db): # Uploads queued when the last run stopped
+            job_queue.submit(job_id, division_id)
+        if employee_index.enabled and not FAST_STARTUP:
+            employee_index.sync(db) # Otherwise loaded by the first read it serves
+    if not FAST_STARTUP:
+        import parsers # Loads pandas and checks every division schema, otherwise left to the first upload
 
     yield  # Runtime
 
     # Cleanup
+    await run_in_threadpool(job_queue.shutdown) # Waits for running ingestion jobs
+    await async_engine.dispose()
+    await async_read_engine.dispose()
 
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
+app.add_middleware(MetricsMiddleware) # Added first so it runs inside CORS, which answers preflights on its own
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000"], # This may not work for development outside docker-compose
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
 app.include_router(employees.router)
@@ -40,31 +56,44 @@ app.include_router(ranks.router)
 app.include_router(positions.router)
 app.include_router(departments.router)
 app.include_router(bands.router)
+app.include_router(jobs.router)
+app.include_router(aggregates.router)
 
 @app.get("/health")
 async def health():
     return {'status': 'ok'}
 
-@app.post("/upload-csv")
-async def upload_csv(file: UploadFile = File(...), division_id: int = Form(...), db: Session = Depends(get_db)):
-    
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Request latencies, per-request SQL statement counts and ingest stage timings of this worker process, in the Prometheus text format."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/read-index", include_in_schema=False)
+async def read_index(check: bool = False, db: AsyncSession = Depends(get_async_read_db)):
+    """Size and change log position of this worker process's employee read index. With `check`, also every difference from the employees table."""
+    if not employee_index.enabled:
+        return employee_index.status()
+    differences = await db.run_sync(employee_index.check) if check else None
+    return {**employee_index.status(), "differences": differences}
+
+def queue_upload(file: BinaryIO, filename: str, division_id: int, db: Session) -> IngestJobStatus:
+    """Spool an uploaded division CSV to disk and queue it for ingestion. Blocking, so the route runs it in a thread."""
     # Check division exists
-    division = db.query(Division).filter(Division.id == division_id).first()
-    if not division:
+    if division_id not in lookup_cache.get_table(Division, db):
         raise HTTPException(404, f"Division {division_id} not found.")
     # Check division schema exists
-    division_schema = csv_parser.schemas.get(division_id)
-    if not division_schema:
+    from parsers import csv_parser
+    if not csv_parser.plans.get(division_id):
         raise HTTPException(400, f"No schema exists for division {division_id}. Please ensure there is YAML file for this division.")
 
-    contents = await file.read()
-    buffer = BytesIO(contents) 
+    job = IngestJobStatus.model_validate(spool_upload(file, division_id, filename, db))
+    job_queue.submit(job.id, division_id)
+    return job
 
-    try:
-        records, errors = csv_parser.parse_csv(buffer, division_schema, db)
-    except Exception as e:
-        print(e)
-        raise HTTPException(400, "Failed to parse CSV.")
-
-    success_count, updated_count, errors = add_employees_from_records(records, division_id, db)
-    return {"message": f"Created {success_count} employees with division {division_id}.\nUpdated {updated_count} employees with division {division_id}.", "errors": errors} 
\ No newline at end of file
+@app.post("/upload-csv", status_code=202, response_model=IngestJobStatus)
+async def upload_csv(file: UploadFile = File(...), division_id: int = Form(...), db: Session = Depends(get_db)):
+    """
+    Queue a division CSV for ingestion and return its job straight away. Follow progress at `/jobs/{id}`, or as
+    server-sent events at `/jobs/{id}/events`.
+    """
+    return await run_in_threadpool(queue_upload, file.file, file.filename, division_id, db)
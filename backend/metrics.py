@@ -0,0 +1,153 @@
+import os
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from time import perf_counter
+from sqlalchemy import Engine, event
+
+SERVER_TIMING_HEADER = os.getenv("SERVER_TIMING_HEADER", "1") == "1" # Adds a `Server-Timing` header with query counts to responses
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 1000, 10000)
+INGEST_STAGES = ("read_csv", "transforms", "fk_resolution", "validation", "upsert", "commit")
+
+class Histogram:
+    """A Prometheus histogram with labels. Thread-safe."""
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series: dict[tuple, list] = {} # Label values -> [bucket counts..., sum, count]
+        self._lock = Lock()
+
+    def observe(self, value: float, *label_values: str):
+        """Record one observation for the given label values, in the order of `labels`."""
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            index = bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def totals(self) -> dict[tuple, tuple[float, int]]:
+        """The sum and count of observations for each set of label values."""
+        with self._lock:
+            return {label_values: (series[-2], series[-1]) for label_values, series in self._series.items()}
+
+    def render(self) -> list[str]:
+        """The histogram in the Prometheus text exposition format."""
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {label_values: list(values) for label_values, values in self._series.items()}
+        for label_values, values in sorted(series.items()):
+            labels = [f'{label}="{escape(value)}"' for label, value in zip(self.labels, label_values)]
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), (*values[:-2], 0)):
+                cumulative += count
+                bucket_labels = ",".join([*labels, f'le="{bound}"'])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {values[-1] if bound == '+Inf' else cumulative}")
+            suffix = f"{{{','.join(labels)}}}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {values[-2]}")
+            lines.append(f"{self.name}_count{suffix} {values[-1]}")
+        return lines
+
+def escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+request_duration = Histogram("http_request_duration_seconds", "Time to the response headers by route.", ("method", "route", "status"))
+request_queries = Histogram("http_request_queries", "SQL statements executed per request by route.", ("method", "route"), QUERY_COUNT_BUCKETS)
+query_duration = Histogram("db_query_duration_seconds", "SQL statement execution time.")
+ingest_stage_duration = Histogram("ingest_stage_duration_seconds", "Time spent in each stage of CSV ingestion, per chunk.", ("stage",))
+HISTOGRAMS = (request_duration, request_queries, query_duration, ingest_stage_duration)
+
+class QueryStats:
+    """Statements executed and time spent executing them, for one request or one profiled run."""
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+# Set per request by `MetricsMiddleware`. Holds a mutable QueryStats so tasks and threads started from a copy of the
+# request's context still add to the same totals.
+query_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+def instrument_engine(engine: Engine):
+    """Time every statement `engine` executes, adding it to `query_duration` and to the current `query_stats`."""
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_query(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def end_query(conn, cursor, statement, parameters, context, executemany):
+        elapsed = perf_counter() - conn.info["query_start"].pop()
+        query_duration.observe(elapsed)
+        stats = query_stats.get()
+        if stats is not None:
+            stats.count += 1
+            stats.seconds += elapsed
+
+@contextmanager
+def stage_timer(stage: str):
+    """Add the time spent in the block to `ingest_stage_duration` under `stage`, one of `INGEST_STAGES`."""
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        ingest_stage_duration.observe(perf_counter() - start, stage)
+
+def stage_totals() -> dict[str, tuple[float, int]]:
+    """Seconds and timed blocks so far for each ingest stage in this process."""
+    return {label_values[0]: totals for label_values, totals in ingest_stage_duration.totals().items()}
+
+def render_metrics() -> str:
+    """Every metric of this process in the Prometheus text exposition format."""
+    return "\n".join(line for histogram in HISTOGRAMS for line in histogram.render()) + "\n"
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording the latency and SQL statement count of each request against its route template, so
+    `/employees/{id}` is one series rather than one per ID. Optionally reports the request's statements in a
+    `Server-Timing` header.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = QueryStats()
+        token = query_stats.set(stats)
+        start = perf_counter()
+        started = False
+
+        def record(status: int) -> float:
+            elapsed = perf_counter() - start
+            route = getattr(scope.get("route"), "path", "unmatched")
+            request_duration.observe(elapsed, scope["method"], route, str(status))
+            request_queries.observe(stats.count, scope["method"], route)
+            return elapsed
+
+        async def send_with_timing(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+                elapsed = record(message["status"])
+                if SERVER_TIMING_HEADER:
+                    timing = f'db;desc="{stats.count} queries";dur={stats.seconds * 1000:.1f}, app;dur={elapsed * 1000:.1f}'
+                    message["headers"] = [*message.get("headers", []), (b"server-timing", timing.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        except Exception:
+            if not started:
+                record(500) # Answered by the server error handler outside this middleware
+            raise
+        finally:
+            query_stats.reset(token)
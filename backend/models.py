@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, Integer, BigInteger, String, Date, DateTime, JSON, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -56,6 +56,7 @@ class Employee(Base):
     contact_number = Column(String, nullable=False)
     start_date = Column(Date, nullable=False)
     last_updated = Column(DateTime, nullable=False, default=func.now())
+    row_hash = Column(String) # Hash of the CSV row last ingested for this employee, cleared by edits through the API
 
     division = relationship("Division", back_populates="employees")
     rank = relationship("Rank", back_populates="employees")
@@ -65,4 +66,77 @@ class Employee(Base):
 
     __table_args__ = (
         UniqueConstraint('first_name', 'surname', name='uq_employee_name'),
-    )
\ No newline at end of file
+        # Back the dashboard filters and sorts. SQLite appends the rowid (id) to every index, which serves the keyset tiebreak
+        Index('ix_employee_division_department', 'division_id', 'department_id'),
+        Index('ix_employee_rank_position', 'rank_id', 'position_id'),
+        Index('ix_employee_position', 'position_id'),
+        Index('ix_employee_department', 'department_id'),
+        Index('ix_employee_salary_band', 'salary_band_id'),
+        Index('ix_employee_surname', 'surname'),
+        Index('ix_employee_start_date', 'start_date'),
+    )
+
+class EmployeeAggregate(Base):
+    __tablename__ = "employee_aggregates"
+
+    # Headcount of every combination of these attributes, kept up to date by triggers on `employees` (see aggregates.py)
+    division_id = Column(Integer, primary_key=True, autoincrement=False)
+    department_id = Column(Integer, primary_key=True, autoincrement=False)
+    rank_id = Column(Integer, primary_key=True, autoincrement=False)
+    position_id = Column(Integer, primary_key=True, autoincrement=False)
+    salary_band_id = Column(Integer, primary_key=True, autoincrement=False)
+    start_year = Column(Integer, primary_key=True, autoincrement=False)
+    headcount = Column(Integer, nullable=False, default=0)
+
+class EmployeeChange(Base):
+    __tablename__ = "employee_changes"
+
+    # Append-only log of employee writes, filled by triggers on `employees` (see changes.py)
+    seq = Column(Integer, primary_key=True) # AUTOINCREMENT, so sequence numbers are never reused after compaction
+    employee_id = Column(Integer, nullable=False)
+    op = Column(String, nullable=False) # upsert or delete
+    changed_at = Column(DateTime, nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index('ix_employee_change_changed_at', 'changed_at'), # Compaction deletes by age
+        {"sqlite_autoincrement": True},
+    )
+
+class TableVersion(Base):
+    __tablename__ = "table_versions"
+
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+class SchemaFingerprint(Base):
+    __tablename__ = "schema_fingerprint"
+
+    id = Column(Integer, primary_key=True) # Single row
+    fingerprint = Column(String, nullable=False) # See utils.schema_fingerprint
+
+class IngestJob(Base):
+    __tablename__ = "ingest_jobs"
+
+    id = Column(String, primary_key=True)
+    division_id = Column(Integer, ForeignKey("divisions.id"), nullable=False)
+    filename = Column(String, nullable=False)
+    state = Column(String, nullable=False, default="queued") # queued, running, succeeded or failed
+    rows_parsed = Column(Integer, nullable=False, default=0)
+    created = Column(Integer, nullable=False, default=0)
+    updated = Column(Integer, nullable=False, default=0)
+    errors = Column(JSON, nullable=False, default=list) # Summarized validation errors so far
+    detail = Column(String) # Why the job failed
+    submitted_at = Column(DateTime, nullable=False, default=func.now())
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+class IngestedFile(Base):
+    __tablename__ = "ingested_files"
+
+    path = Column(String, primary_key=True) # Resolved absolute path
+    division_id = Column(Integer, ForeignKey("divisions.id"), nullable=False)
+    file_date = Column(DateTime, nullable=False) # From the filename's YYYYMMDD suffix
+    size = Column(BigInteger, nullable=False)
+    mtime_ns = Column(BigInteger, nullable=False)
+    content_hash = Column(String, nullable=False)
+    applied_at = Column(DateTime, nullable=False, default=func.now())
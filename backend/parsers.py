@@ -1,16 +1,29 @@
-import os, yaml
+import os, yaml, warnings
 from io import StringIO,BytesIO
 from pathlib import Path
-from typing import Callable
-from re import Match, match
+from threading import Lock
+from time import perf_counter
+from itertools import islice
+from typing import Callable, BinaryIO, Iterator, NamedTuple
+from re import Match, Pattern, compile as compile_regex, error as RegexError
 from sqlalchemy.orm import Session
-from pandas import read_csv
+from numpy import nan
+from pandas import read_csv, to_datetime, DataFrame, RangeIndex, Series, StringDtype
+from pandas.errors import ParserWarning
+from pandas.arrays import ArrowStringArray
+import pyarrow as pa
+import pyarrow.compute as pc
+from pyarrow import csv as arrow_csv, parquet
 
 from models import Rank, Position, Department, SalaryBand
 from db_ops import resolve_fk
-from utils import clean_contact_number
+from cache import lookup_cache
+from metrics import stage_timer, ingest_stage_duration
+from utils import clean_contact_number, clean_contact_number_series
 
 DIVISION_SCHEMAS_DIR = os.getenv("SCHEMA_DIR_PATH")
+CSV_CHUNK_SIZE = int(os.getenv("CSV_CHUNK_SIZE", 10_000)) # Rows per chunk when streaming CSVs
+CSV_ENGINE = os.getenv("CSV_ENGINE", "pandas") # `pandas` for its C parser, or `pyarrow`. Parquet is always read with pyarrow
 MODEL_REG = {
     'rank':        (Rank, 'rank_id', 'name'),
     'position':    (Position, 'position_id', 'name'),
@@ -19,60 +32,398 @@ MODEL_REG = {
 }
 TYPE_FUNCTION_REG = {'boolean': bool, 'string': str, 'integer': int, 'date': str}
 TRANSFORM_FUNCTION_REG = {'clean_contact_number': clean_contact_number}
+VECTORIZED_TRANSFORM_FUNCTION_REG = {'clean_contact_number': clean_contact_number_series}
+ARROW_TYPES = {bool: pa.bool_(), str: pa.string(), int: pa.int64()}
+# Arrow strings are handed to the transforms as pandas strings over the same buffers, so they never become Python
+# objects, with NaN for missing values as `read_csv` gives. Numbers and booleans convert to the NumPy dtypes it gives them
+PANDAS_DTYPES = {pa.string(): StringDtype("pyarrow", na_value=nan)}
+# The values `read_csv` reads as missing by default, two more than Arrow's defaults
+CSV_NULL_VALUES = [*arrow_csv.ConvertOptions().null_values, "<NA>", "None"]
+# `read_options` passes `index_col=False`, so the fields of a row longer than the headers are dropped, as intended. pandas
+# warns on every read of such a file; filtered once here rather than with `catch_warnings`, which is not thread-safe
+warnings.filterwarnings("ignore", "Length of header or names does not match length of data", ParserWarning)
+# RE2, which Arrow matches with, agrees with `re` on these characters; others, where `\w`, `\s` and `\d` differ, fall back
+PRINTABLE_ASCII = r"^[\x20-\x7e]*$"
+
+class SchemaError(ValueError):
+    """A division schema that cannot be compiled into a `SchemaPlan`."""
+
+class TransformPlan(NamedTuple):
+    """A compiled entry of a schema's `transforms`, with its regex precompiled or its function looked up."""
+    header: str
+    type: str
+    pattern: str | None = None
+    regex: Pattern | None = None
+    groups: tuple[tuple[int | str, str], ...] = () # (group, output column) pairs
+    action: str | None = None
+    func: Callable | None = None
+    vectorized_func: Callable | None = None
+    arrow_pattern: str | None = None # `pattern` anchored and with every group named, if Arrow's RE2 supports it
+    arrow_fields: tuple[str, ...] = () # The group of `arrow_pattern` for each of `groups`
+
+    @property
+    def outputs(self) -> tuple[str, ...]:
+        return tuple(name for _, name in self.groups) if self.type == "regex" else (self.header,)
+
+    def apply(self, val) -> dict:
+        """Applies the transform to a single value."""
+        if self.type == "func":
+            return {self.header: self.func(val)}
+        match_result = self.regex.match(val)
+        if not isinstance(match_result, Match):
+            raise ValueError(f"Regex pattern '{self.pattern}' did not match '{val}'")
+        return {name: match_result.group(key) for key, name in self.groups}
+
+    def apply_series(self, series: Series) -> tuple[dict[str, Series], Series]:
+        """
+        Column-wise equivalent of `apply`. Returns the output columns and a Series of error messages that is null for
+        rows that transformed successfully. Values the vectorized path cannot handle (nulls, or any value for a function
+        without a vectorized variant) fall back to `apply` so errors read exactly the same.
+        """
+        columns: dict[str, Series] = {}
+        errors = Series(None, index=series.index, dtype=object)
+        fallback = series.isna()
+
+        if self.type == "func":
+            if not self.vectorized_func:
+                fallback[:] = True
+            else:
+                columns[self.header] = self.vectorized_func(series)
+        elif self.arrow_pattern and isinstance(series.array, ArrowStringArray):
+            # Matched by Arrow without converting the strings to Python objects. A struct is null where it did not match
+            values = pa.array(series.array)
+            fallback |= ~pc.fill_null(pc.match_substring_regex(values, PRINTABLE_ASCII), False).to_numpy(zero_copy_only=False)
+            extracted = pc.extract_regex(values, self.arrow_pattern)
+            for (_, name), field in zip(self.groups, self.arrow_fields):
+                columns[name] = Series(ArrowStringArray(pc.struct_field(extracted, field)), index=series.index)
+            unmatched = extracted.is_null().to_numpy(zero_copy_only=False) & ~fallback
+            errors[unmatched] = f"Regex pattern '{self.pattern}' did not match '" + series[unmatched] + "'"
+        else:
+            # Anchored to mirror `re.match`, with a trailing empty group that is only null when the pattern did not match
+            extracted = series.str.extract(f"^(?:{self.pattern})()", expand=True)
+            for key, name in self.groups:
+                columns[name] = extracted.iloc[:, key - 1] if isinstance(key, int) else extracted[key]
+            unmatched = extracted.iloc[:, -1].isna() & ~fallback
+            errors[unmatched] = f"Regex pattern '{self.pattern}' did not match '" + series[unmatched] + "'"
+
+        for idx, val in series[fallback].items():
+            try:
+                for name, value in self.apply(val).items():
+                    if name not in columns:
+                        columns[name] = Series(None, index=series.index, dtype=object)
+                    columns[name].at[idx] = value
+            except Exception as e:
+                errors.at[idx] = str(e)
+        return columns, errors
+
+def arrow_regex(pattern: str, regex: Pattern, keys: tuple[int | str, ...]) -> tuple[str | None, tuple[str, ...]]:
+    """
+    Rewrites a regex for Arrow's `extract_regex`, which only returns named groups: anchored like `re.match` and with
+    numbered groups named `_1`, `_2` and so on. Returns the pattern and the group of each of `keys`, or None and ()
+    if the rewrite does not match `regex` group for group or RE2 cannot compile it.
+    """
+    rewritten = []; group = 0; in_class = False; i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            rewritten.append(pattern[i:i + 2]); i += 2
+            continue
+        if in_class:
+            in_class = char != "]"
+        elif char == "[":
+            end = i + 1 + (pattern[i + 1:i + 2] == "^")
+            end += pattern[end:end + 1] == "]" # A leading ] is a literal
+            rewritten.append(pattern[i:end]); i = end; in_class = True
+            continue
+        elif char == "(" and (pattern[i + 1:i + 2] != "?" or pattern[i + 1:i + 4] == "?P<"):
+            group += 1
+            if pattern[i + 1:i + 2] != "?":
+                rewritten.append(f"(?P<_{group}>"); i += 1
+                continue
+        rewritten.append(char); i += 1
+    arrow_pattern = f"^(?:{''.join(rewritten)})"
+
+    expected = {**{index: f"_{index}" for index in range(1, regex.groups + 1)}, **{index: name for name, index in regex.groupindex.items()}}
+    try:
+        names = {index: name for name, index in compile_regex(arrow_pattern).groupindex.items()}
+        pc.extract_regex(pa.array([], pa.string()), arrow_pattern)
+    except (RegexError, pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return None, ()
+    if names != expected:
+        return None, ()
+    return arrow_pattern, tuple(names[key] if isinstance(key, int) else key for key in keys)
+
+def use_arrow(file: Path | StringIO | BytesIO | BinaryIO) -> bool:
+    """Whether to read `file` with pyarrow: Parquet files always, CSVs unless `CSV_ENGINE` is `pandas`."""
+    return CSV_ENGINE == "pyarrow" or isinstance(file, Path) and file.suffix == ".parquet"
+
+def rebatch(reader: pa.RecordBatchReader, rows: int) -> Iterator[pa.Table]:
+    """Regroup a reader's record batches, sized by bytes for CSV, into tables of `rows` rows; the last may be shorter."""
+    pending, pending_rows = [], 0
+    for batch in reader:
+        while batch.num_rows:
+            taken = batch.slice(0, rows - pending_rows)
+            pending.append(taken); pending_rows += taken.num_rows
+            batch = batch.slice(taken.num_rows)
+            if pending_rows == rows:
+                yield pa.Table.from_batches(pending, reader.schema)
+                pending, pending_rows = [], 0
+    if pending_rows:
+        yield pa.Table.from_batches(pending, reader.schema)
+
+class SchemaPlan(NamedTuple):
+    """
+    A division schema compiled once into everything parsing needs: pandas read options, one step per header (a
+    `TransformPlan` or None to copy the value) and the output columns that are resolved to foreign keys.
+    """
+    division_id: int
+    headers: tuple[str, ...]
+    dtype: tuple[tuple[str, Callable], ...]
+    parse_dates: tuple[str, ...]
+    steps: tuple[tuple[str, TransformPlan | None], ...]
+    fk_columns: tuple[tuple[str, type, str, str], ...] # (column, model, id column, match_on) in output column order
+    source: Path | None = None
+    mtime_ns: int | None = None
+
+    def read_options(self) -> dict:
+        """
+        The pandas `read_csv` options for this schema. Rows are always numbered from 0: a first row with more fields than
+        headers would otherwise make its first field the index.
+        """
+        return {"names": list(self.headers), "skiprows": 1, "index_col": False, "dtype": dict(self.dtype), "parse_dates": list(self.parse_dates)}
+
+    def arrow_types(self) -> dict[str, pa.DataType]:
+        """The Arrow type of each header. Dates are read as strings and parsed afterwards, as pandas does."""
+        return {**{header: pa.string() for header in self.parse_dates}, **{header: ARROW_TYPES[typ] for header, typ in self.dtype}}
+
+    def open_arrow(self, file: Path | StringIO | BytesIO | BinaryIO, invalid_rows: list | None = None) -> pa.RecordBatchReader:
+        """
+        Stream a CSV or `.parquet` file as Arrow record batches of the schema's headers. Paths are memory-mapped. CSV
+        columns are named by position after the header row, as with `read_options`; Parquet columns are selected by name.
+        CSV rows with too few or too many fields raise ArrowInvalid, or are skipped and appended to `invalid_rows` if given.
+        """
+        source = pa.memory_map(str(file)) if isinstance(file, Path) else BytesIO(file.getvalue().encode()) if isinstance(file, StringIO) else file
+        if isinstance(file, Path) and file.suffix == ".parquet":
+            parquet_file = parquet.ParquetFile(source)
+            missing = [header for header in self.headers if header not in parquet_file.schema_arrow.names]
+            if missing:
+                raise ValueError(f"Parquet file has no column {', '.join(missing)}")
+            schema = pa.schema([parquet_file.schema_arrow.field(header) for header in self.headers])
+            return pa.RecordBatchReader.from_batches(schema, parquet_file.iter_batches(columns=list(self.headers)))
+        read_options = arrow_csv.ReadOptions(column_names=list(self.headers), skip_rows=1)
+        convert_options = arrow_csv.ConvertOptions(column_types=self.arrow_types(), null_values=CSV_NULL_VALUES, strings_can_be_null=True)
+        parse_options = arrow_csv.ParseOptions(invalid_row_handler=None if invalid_rows is None else lambda row: invalid_rows.append(row) or "skip")
+        try:
+            return arrow_csv.open_csv(source, read_options=read_options, parse_options=parse_options, convert_options=convert_options)
+        except pa.ArrowInvalid:
+            if source.size() if isinstance(source, pa.NativeFile) else source.seek(0, 2):
+                raise
+            types = self.arrow_types() # An empty file has no rows, as with `read_csv` given column names
+            return pa.RecordBatchReader.from_batches(pa.schema([(header, types[header]) for header in self.headers]), [])
+
+    def arrow_frame(self, table: pa.Table, start: int = 0) -> DataFrame:
+        """
+        A DataFrame over an Arrow table from `open_arrow`, shaped like one read with `read_options`: columns cast to the
+        schema's types, dates parsed and rows numbered from `start`.
+        """
+        types = self.arrow_types()
+        columns = {}
+        for header in self.headers:
+            column = table[header]
+            if header in self.parse_dates:
+                try:
+                    column = column.cast(pa.timestamp("ns")) # ISO 8601, or already a date in Parquet
+                except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                    column = column.cast(pa.string()) # Left for pandas to infer the format below
+            elif column.type != types[header]:
+                column = column.cast(types[header])
+            columns[header] = column
+        df = pa.table(columns).to_pandas(types_mapper=PANDAS_DTYPES.get)
+        df.index = RangeIndex(start, start + len(df))
+        for header in self.parse_dates:
+            if not df[header].dtype.kind == "M":
+                try:
+                    df[header] = to_datetime(df[header])
+                except (ValueError, TypeError):
+                    pass # Kept as strings for validation to parse, as `read_csv` does
+        return df
+
+    def read_frames(self, file: Path | StringIO | BytesIO | BinaryIO, chunksize: int | None = None) -> Iterator[DataFrame]:
+        """
+        Read `file` into DataFrames shaped like `read_options` gives them: the whole file as one, or chunks of `chunksize`
+        rows numbered from the start of the file. CSVs read with pyarrow switch to `read_csv` from the first chunk it would
+        read differently, so both engines give the same records and errors: one with a row of too few or too many fields,
+        which `read_csv` pads or rejects, an empty integer or boolean cell, which it rejects, or a value Arrow cannot convert.
+        """
+        start = 0
+        if use_arrow(file):
+            is_csv = not (isinstance(file, Path) and file.suffix == ".parquet")
+            invalid_rows = []
+            strict = [header for header, typ in self.dtype if typ in (int, bool)]
+            try:
+                reader = self.open_arrow(file, invalid_rows if is_csv else None)
+                for table in rebatch(reader, chunksize) if chunksize else [reader.read_all()]:
+                    if is_csv and (invalid_rows or any(table[header].null_count for header in strict)):
+                        break
+                    df = self.arrow_frame(table, start)
+                    start += len(df)
+                    yield df
+                else:
+                    if not invalid_rows: # Otherwise every row from `start` on was skipped
+                        return
+            except pa.ArrowInvalid:
+                if not is_csv:
+                    raise
+            if not isinstance(file, Path):
+                file.seek(0)
+
+        if chunksize is None:
+            yield read_csv(file, **self.read_options())
+            return
+        with read_csv(file, chunksize=chunksize, **self.read_options()) as reader:
+            yield from islice(reader, start // chunksize, None) # Chunks before `start` were read with pyarrow
 
 class DivisionCSVParser:
-    def __init__(self, schemas: dict[int, dict], model_registry: dict[str, tuple], type_registry: dict[str, Callable], transform_registry: dict[str, dict]):
-        self.schemas = schemas
+    def __init__(self, schemas: dict[int, dict], model_registry: dict[str, tuple], type_registry: dict[str, Callable], transform_registry: dict[str, dict], vectorized_transform_registry: dict[str, Callable] | None = None):
         self.model_registry = model_registry
         self.type_registry = type_registry
         self.transform_registry = transform_registry
-    
+        self.vectorized_transform_registry = vectorized_transform_registry or {}
+        self.schema_dir: Path | None = None
+        self._plans: dict[int, SchemaPlan] = {division_id: self.compile(schema) for division_id, schema in schemas.items()}
+        self._files: dict[Path, tuple[int, int | None]] = {} # Schema file -> (mtime_ns, division_id) as last loaded
+        self._lock = Lock()
+
     @classmethod
-    def from_schema_dir(cls, schema_dir: str, model_registry: dict[str, tuple], type_registry: dict[str, Callable],transform_registry: dict[str, dict]):
-        """Creates a DivisionCSVParser from a directory of YAML schemas."""
-        schema_dir_path = Path(schema_dir)
-        schemas = {}
-        for path in schema_dir_path.glob("*.yaml"):
-            with path.open("r") as f:
-                config = yaml.safe_load(f)
-                division_id = config.get("division_id")
-                if division_id:
-                    schemas[division_id] = config
-                else:
-                    print(f"Missing division_id in {path.name}")
-        return cls(schemas, model_registry, type_registry, transform_registry)
-    
-    def apply_transform(self, header, val, transform: dict) -> dict:
-        """Applies a transform onto a header and value using transform function."""
-        transform_type = transform.get('type')
+    def from_schema_dir(cls, schema_dir: str, model_registry: dict[str, tuple], type_registry: dict[str, Callable],transform_registry: dict[str, dict], vectorized_transform_registry: dict[str, Callable] | None = None):
+        """
+        Creates a DivisionCSVParser from a directory of YAML schemas. Raises SchemaError if any schema is invalid.
+        Schemas are reloaded when their files change, see `plans`.
+        """
+        parser = cls({}, model_registry, type_registry, transform_registry, vectorized_transform_registry)
+        parser.schema_dir = Path(schema_dir)
+        parser.reload(strict=True)
+        return parser
+
+    @property
+    def plans(self) -> dict[int, SchemaPlan]:
+        """Compiled plans by division ID, reloading any schema file added, edited or removed since it was last read."""
+        if self.schema_dir is not None:
+            self.reload()
+        return self._plans
+
+    def reload(self, strict: bool = False):
+        """
+        Recompiles schema files whose mtime changed and drops plans whose file was removed. An invalid file raises
+        SchemaError when `strict`; otherwise the error is printed and the last good plan for it is kept.
+        """
+        with self._lock:
+            paths = {path: path.stat().st_mtime_ns for path in self.schema_dir.glob("*.yaml")}
+            if all(self._files.get(path, (None,))[0] == mtime_ns for path, mtime_ns in paths.items()) and paths.keys() == self._files.keys():
+                return
+
+            plans = dict(self._plans)
+            for path in self._files.keys() - paths.keys():
+                division_id = self._files.pop(path)[1]
+                plans.pop(division_id, None)
+            for path, mtime_ns in sorted(paths.items()):
+                if self._files.get(path, (None,))[0] == mtime_ns:
+                    continue
+                previous_division_id = self._files.get(path, (None, None))[1]
+                self._files[path] = (mtime_ns, previous_division_id)
+                try:
+                    with path.open("r") as f:
+                        config = yaml.safe_load(f)
+                    division_id = config.get("division_id") if isinstance(config, dict) else None
+                    if not division_id:
+                        print(f"Missing division_id in {path.name}")
+                        continue
+                    owner = next((other.name for other, (_, other_id) in self._files.items() if other != path and other_id == division_id), None)
+                    if owner:
+                        raise SchemaError(f"division_id {division_id} is already defined in {owner}")
+                    plan = self.compile(config, path, mtime_ns)
+                except (SchemaError, yaml.YAMLError) as e:
+                    if strict:
+                        raise SchemaError(f"{path.name}: {e}") from e
+                    print(f"Failed to reload {path.name}, keeping the previous schema: {e}")
+                    continue
+                if previous_division_id is not None and previous_division_id != division_id:
+                    plans.pop(previous_division_id, None)
+                self._files[path] = (mtime_ns, division_id)
+                plans[division_id] = plan
+            self._plans = plans # Swapped whole so readers never see a half-reloaded mapping
+
+    def compile(self, division_schema: dict, source: Path | None = None, mtime_ns: int | None = None) -> SchemaPlan:
+        """Compiles a division schema into a `SchemaPlan`. Raises SchemaError if it is invalid."""
+        headers = division_schema.get("headers")
+        if not isinstance(headers, dict) or not headers:
+            raise SchemaError("'headers' must map each CSV column to a type")
+        transforms = division_schema.get("transforms") or {}
+        if not isinstance(transforms, dict):
+            raise SchemaError("'transforms' must map CSV columns to transforms")
+
+        dtype = []; parse_dates = []
+        for col, typ in headers.items():
+            if typ == "date":
+                parse_dates.append(col)
+            elif typ in self.type_registry:
+                dtype.append((col, self.type_registry[typ]))
+            else:
+                raise SchemaError(f"Unknown type '{typ}' for header '{col}'. Use one of {', '.join(self.type_registry)}.")
+
+        for header in transforms:
+            if header not in headers:
+                raise SchemaError(f"Transform for '{header}', which is not one of the headers")
+        steps = tuple((header, self.compile_transform(header, transforms[header]) if header in transforms else None) for header in headers)
+
+        outputs = [name for header, transform in steps for name in (transform.outputs if transform else (header,))]
+        fk_columns = tuple((name, *self.model_registry[name]) for name in dict.fromkeys(outputs) if name in self.model_registry)
+        return SchemaPlan(division_schema.get("division_id"), tuple(headers), tuple(dtype), tuple(parse_dates), steps, fk_columns, source, mtime_ns)
+
+    def compile_transform(self, header: str, transform: dict) -> TransformPlan:
+        """Compiles one entry of a schema's `transforms`. Raises SchemaError if it is invalid."""
+        transform_type = transform.get('type') if isinstance(transform, dict) else None
         if transform_type == "func":
             action = transform.get('action')
             func = self.transform_registry.get(action)
             if not func:
-                raise ValueError(f"No function named '{func}' registered")
-            else:
-                return {header: func(val)}
+                raise SchemaError(f"No function named '{action}' registered for '{header}'")
+            return TransformPlan(header, "func", action=action, func=func, vectorized_func=self.vectorized_transform_registry.get(action))
         elif transform_type == "regex":
             pattern = transform.get('pattern')
             groups = transform.get('groups')
-            match_result = match(transform['pattern'], val)
-            if not isinstance(match_result, Match):
-                raise ValueError(f"Regex pattern '{pattern}' did not match '{val}'")
-            return {groups[key]: match_result.group(key) for key in groups.keys()}
+            try:
+                regex = compile_regex(pattern)
+            except (TypeError, RegexError) as e:
+                raise SchemaError(f"Invalid regex pattern '{pattern}' for '{header}': {e}") from e
+            if not isinstance(groups, dict) or not groups:
+                raise SchemaError(f"Regex transform for '{header}' needs 'groups' mapping group numbers or names to columns")
+            for key in groups:
+                if not (isinstance(key, int) and 1 <= key <= regex.groups) and key not in regex.groupindex:
+                    raise SchemaError(f"Regex pattern '{pattern}' for '{header}' has no group {key}")
+            arrow_pattern, arrow_fields = arrow_regex(pattern, regex, tuple(groups))
+            return TransformPlan(header, "regex", pattern=pattern, regex=regex, groups=tuple(groups.items()), arrow_pattern=arrow_pattern, arrow_fields=arrow_fields)
         else:
-            raise ValueError(f"Unknown transform type of '{transform_type}'")
+            raise SchemaError(f"Unknown transform type of '{transform_type}' for '{header}'")
+
+    def get_plan(self, division_schema: dict | SchemaPlan) -> SchemaPlan:
+        """Returns a plan as is, or compiles a raw schema dict."""
+        return division_schema if isinstance(division_schema, SchemaPlan) else self.compile(division_schema)
 
-    def parse_csv(self, file: Path | StringIO |BytesIO, division_schema: dict, db: Session):
+    def parse_csv(self, file: Path | StringIO |BytesIO, division_schema: SchemaPlan | dict, db: Session, vectorized: bool = True):
         """
-        Parse a CSV file for employee ingestion by division.
+        Parse a CSV or `.parquet` file for employee ingestion by division.
         
         # Parameters
         file : Path or StringIO or BytesIO
-            Path to CSV file.
-        division_schema : dict
-            Division schema as defined by one of the YAML files in the `./division_schemas/` directory.
+            Path to CSV or Parquet file, or CSV contents.
+        division_schema : SchemaPlan or dict
+            Compiled plan from `plans`, or a division schema as defined by one of the YAML files in the
+            `./division_schemas/` directory, which is compiled for this call only.
         db :S ession
             Database session.
+        vectorized : bool
+            Run transforms and foreign key resolution column-wise over the whole DataFrame. Defaults to True.
 
         # Returns
         records : list[dict]
@@ -80,44 +431,100 @@ class DivisionCSVParser:
         errors : list[dict]
             List of errors.
         """
-        headers: dict[str, str] = division_schema.get("headers")
-        transforms: dict[str, dict] = division_schema.get("transforms")
-        
-        dtypes = {}; parse_dates = []
-        for col, typ in headers.items():
-            if typ == "date":
-                parse_dates.append(col)
-            elif typ in self.type_registry:
-                dtypes[col] = self.type_registry[typ]
+        plan = self.get_plan(division_schema)
+        with stage_timer("read_csv"):
+            df = next(plan.read_frames(file))
+        return self._parse_frame(df, plan, db, vectorized)
+
+    def iter_csv(self, file: Path | BinaryIO, division_schema: SchemaPlan | dict, db: Session, chunksize: int = CSV_CHUNK_SIZE, vectorized: bool = True) -> Iterator[tuple[list[dict], list[dict]]]:
+        """
+        Parse a CSV or `.parquet` file in chunks of `chunksize` rows so memory stays bounded by the chunk rather than the file.
+        Yields `(records, errors)` per chunk as `parse_csv` would return them. Error rows are numbered from the start of
+        the file, not the chunk.
+        """
+        plan = self.get_plan(division_schema)
+        frames = plan.read_frames(file, chunksize)
+        while True:
+            with stage_timer("read_csv"):
+                df = next(frames, None)
+            if df is None:
+                break
+            yield self._parse_frame(df, plan, db, vectorized)
+
+    def _parse_frame(self, df: DataFrame, plan: SchemaPlan, db: Session, vectorized: bool):
+        """Parses a DataFrame read with the plan's `read_options` into records and errors."""
+        if vectorized:
+            return self._parse_columns(df, plan, db)
+        return self._parse_rows(df, plan, db)
 
-        df = read_csv(file, names=headers, skiprows=1, dtype=dtypes, parse_dates=parse_dates)
+    def _parse_rows(self, df: DataFrame, plan: SchemaPlan, db: Session):
+        """Row-wise parse, applying each transform and foreign key resolution one cell at a time."""
         records = []; errors = []
+        start = perf_counter(); fk_seconds = 0.0
         for row in df.itertuples():
             record = {}
             try:
-                for header in headers:
+                for header, transform in plan.steps:
                     val = getattr(row, header)
-                    transform = transforms.get(header)
                     if transform:
-                        record.update(self.apply_transform(header, val, transform))
+                        record.update(transform.apply(val))
                     else:
                         record[header] = val
                 # Mutate headers to match database ids
-                for header in list(record.keys()):
-                    model_info = self.model_registry.get(header)
-                    if model_info:
-                        model, new_header, match_on = model_info
-                        value = record[header]
-
-                        if match_on == "id":
-                            record[new_header] = value
-                        else:
-                            record[new_header] = resolve_fk(model, value, db)
-
-                        del record[header]
+                fk_start = perf_counter()
+                try:
+                    for header, model, new_header, match_on in plan.fk_columns:
+                        value = record.pop(header)
+                        record[new_header] = value if match_on == "id" else resolve_fk(model, value, db)
+                finally:
+                    fk_seconds += perf_counter() - fk_start
                 records.append(record)
             except Exception as e:
                 errors.append({"row": row.Index, "error": str(e)})
+        ingest_stage_duration.observe(perf_counter() - start - fk_seconds, "transforms")
+        ingest_stage_duration.observe(fk_seconds, "fk_resolution")
+        return records, errors
+
+    def _parse_columns(self, df: DataFrame, plan: SchemaPlan, db: Session):
+        """Column-wise parse. Produces the same records and errors as `_parse_rows`, reporting each row's first error."""
+        columns: dict[str, Series] = {}
+        row_errors = Series(None, index=df.index, dtype=object)
+
+        def collect(errors: Series):
+            nonlocal row_errors
+            row_errors = row_errors.where(row_errors.notna(), errors)
+
+        with stage_timer("transforms"):
+            for header, transform in plan.steps:
+                if transform:
+                    transformed, errors = transform.apply_series(df[header])
+                    columns.update(transformed)
+                    collect(errors)
+                else:
+                    columns[header] = df[header]
+
+        # Mutate headers to match database ids, appended after the plain columns as `_parse_rows` does
+        resolved: dict[str, Series] = {}
+        fk_headers = []
+        with stage_timer("fk_resolution"):
+            for header, model, new_header, match_on in plan.fk_columns:
+                values = columns.pop(header)
+                if match_on == "id":
+                    resolved[new_header] = values
+                else:
+                    ids = values.map(lookup_cache.get_table(model, db))
+                    missing = ids.isna()
+                    collect(Series(f"{model.__name__} '", index=df.index).where(missing) + values.astype(str) + "' not found in DB")
+                    resolved[new_header] = ids
+                    fk_headers.append(new_header)
+
+        with stage_timer("transforms"): # Shaping the surviving rows into records
+            ok = row_errors.isna()
+            out = DataFrame({**columns, **resolved})[ok].astype({header: "int64" for header in fk_headers})
+
+            names = list(out.columns)
+            records = [dict(zip(names, values)) for values in zip(*(out[name].tolist() for name in names))]
+            errors = [{"row": int(idx), "error": error} for idx, error in row_errors[~ok].items()]
         return records, errors
 
-csv_parser = DivisionCSVParser.from_schema_dir(DIVISION_SCHEMAS_DIR, MODEL_REG, TYPE_FUNCTION_REG, TRANSFORM_FUNCTION_REG)
\ No newline at end of file
+csv_parser = DivisionCSVParser.from_schema_dir(DIVISION_SCHEMAS_DIR, MODEL_REG, TYPE_FUNCTION_REG, TRANSFORM_FUNCTION_REG, VECTORIZED_TRANSFORM_FUNCTION_REG)
\ No newline at end of file
@@ -0,0 +1,378 @@
+"""
+Optional in-memory columnar index of employees for list and aggregate reads, enabled with `READ_INDEX=1`. It holds the
+ID, foreign keys and start date of every employee as NumPy arrays, in ID order, and a bitmap of the rows having each
+foreign key value. The dashboard's filters are then a few bitwise ANDs over the bitmaps, counts are popcounts, and a
+list request only reads its page of rows from the database, by ID.
+
+The index is loaded at startup and kept current from the `employee_changes` log (see `changes.py`), which triggers
+fill for every writer: API routes, upload jobs and `ingest.py` in another process alike. Each read first applies the
+changes logged since the last one, so a read always sees every committed write. Each worker process holds its own.
+"""
+import os
+from datetime import date
+from itertools import chain
+from math import prod
+from threading import Lock
+import numpy as np
+from sqlalchemy import Integer, Select, cast, distinct, func, select
+from sqlalchemy.orm import Session
+
+from aggregates import DIMENSIONS
+from changes import ChangeLogExpired, check_since, latest_seq
+from models import Employee, EmployeeChange
+
+READ_INDEX = os.getenv("READ_INDEX", "0") == "1" # Serve employee lists and aggregates from the in-memory index
+READ_INDEX_RELOAD_FRACTION = 0.25 # Reload rather than apply changes to more than this share of the employees
+FETCH_BATCH_SIZE = 100_000 # Rows fetched at a time when loading
+SCAN_WORDS = 1024 # Bitmap words, of 64 rows each, unpacked at a time when collecting a page in ID order
+BINCOUNT_MAX_GROUPS = 1 << 24 # Count groups with `np.bincount` while there are at most this many possible
+EPOCH = date(1970, 1, 1)
+ONE = np.uint64(1)
+
+INDEX_SORTS = ("id", *DIMENSIONS, "start_date")
+INDEX_COLUMNS = (
+    Employee.id,
+    *(getattr(Employee, dimension) for dimension in DIMENSIONS),
+    cast(func.julianday(Employee.start_date) - 2440587.5, Integer).label("start_date"), # Days since 1970-01-01
+)
+
+def to_days(value: date) -> int:
+    return (value - EPOCH).days
+
+def resized(values: np.ndarray, length: int) -> np.ndarray:
+    """A zero-padded copy of `values` with `length` elements."""
+    out = np.zeros(length, values.dtype)
+    out[:min(length, len(values))] = values[:length]
+    return out
+
+def bitmap(positions: np.ndarray, capacity: int) -> np.ndarray:
+    """Words of 64 bits with the bit of each row position set, `capacity` rows long."""
+    bits = np.zeros(capacity, bool)
+    bits[positions] = True
+    return np.packbits(bits, bitorder="little").view(np.uint64)
+
+def bit_positions(words: np.ndarray, first_word: int = 0) -> np.ndarray:
+    """Row positions of the set bits, in order, for words starting at `first_word`."""
+    return np.flatnonzero(np.unpackbits(words.view(np.uint8), bitorder="little")) + first_word * 64
+
+def bit_masks(positions: np.ndarray) -> np.ndarray:
+    return np.left_shift(ONE, (positions & 63).astype(np.uint64))
+
+def set_bits(words: np.ndarray, positions: np.ndarray):
+    np.bitwise_or.at(words, positions >> 6, bit_masks(positions))
+
+def clear_bits(words: np.ndarray, positions: np.ndarray):
+    np.bitwise_and.at(words, positions >> 6, ~bit_masks(positions))
+
+def fetch_columns(stmt: Select, db: Session) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+    """Runs a select of `INDEX_COLUMNS` into an ID array and the indexed columns, including each start year."""
+    result = db.connection().execute(stmt.execution_options(yield_per=FETCH_BATCH_SIZE))
+    batches = [np.fromiter(chain.from_iterable(rows), np.int64, len(rows) * len(INDEX_COLUMNS)).reshape(-1, len(INDEX_COLUMNS)) for rows in result.partitions()]
+    data = np.concatenate(batches) if batches else np.zeros((0, len(INDEX_COLUMNS)), np.int64)
+    columns = {dimension: data[:, i + 1].astype(np.int32) for i, dimension in enumerate(DIMENSIONS)}
+    columns["start_date"] = data[:, -1].astype(np.int32)
+    columns["start_year"] = (columns["start_date"].astype("datetime64[D]").astype("datetime64[Y]").astype(np.int32) + 1970).astype(np.int16)
+    return data[:, 0].copy(), columns
+
+class EmployeeIndex:
+    """
+    Employees as columns at row positions in ID order, with room to append. Deleted employees stay in place with their
+    bits cleared until deletions make up half the rows, when the rows are compacted. New employees are appended, since
+    IDs only grow; anything else the change log brings, such as a reused lower ID, reloads the index.
+    """
+    def __init__(self, enabled: bool = READ_INDEX):
+        self.enabled = enabled
+        self.seq: int | None = None # Last change log sequence number applied, None until loaded
+        self.size = 0 # Row positions in use, including deleted employees
+        self.deleted = 0
+        self.ids = np.zeros(0, np.int64)
+        self.columns: dict[str, np.ndarray] = {}
+        self.live = np.zeros(0, np.uint64) # Bitmap of the positions holding a current employee
+        self.bitmaps: dict[str, dict[int, np.ndarray]] = {}
+        self._lock = Lock()
+
+    @property
+    def words(self) -> int:
+        """Bitmap words covering the positions in use."""
+        return (self.size + 63) // 64
+
+    def serves(self, filters, sort: str) -> bool:
+        """Whether an `EmployeeFilters` query sorted by `sort` can be answered from the index."""
+        return self.enabled and filters.q is None and filters.id is None and sort in INDEX_SORTS
+
+    def sync(self, db: Session):
+        """Load the index, or apply the changes logged since it was last brought up to date."""
+        with self._lock:
+            self._sync(db)
+
+    def page(self, filters, sort: str, descending: bool, after: tuple | None, limit: int, count: bool, db: Session) -> tuple[list[int], int | None]:
+        """
+        IDs of the employees matching `filters` on the page after `after`, the (sort value, ID) of the previous page's
+        last row, ordered like `paginate_employees`, plus one more if there is a next page. Also returns the number of
+        matching employees if `count`.
+        """
+        with self._lock:
+            self._sync(db)
+            words = self._match(filters)
+            date_range = self._date_range(filters)
+            if sort == "id":
+                positions = self._scan(words, *self._id_bounds(after and after[1], descending), descending, limit + 1, date_range)
+            elif sort == "start_date":
+                positions = self._page_by_date(words, after, descending, limit + 1, date_range)
+            else:
+                positions = self._page_by_value(sort, words, after, descending, limit + 1, date_range)
+            total = self._count(words, date_range) if count else None
+            return self.ids[positions].tolist(), total
+
+    def aggregate(self, group_by: list[str], filters, by_start_year: bool, db: Session) -> list[dict]:
+        """Headcounts of the employees matching `AggregateFilters`, shaped and ordered like the rows of `aggregate_query`."""
+        with self._lock:
+            self._sync(db)
+            words = self._match(filters)
+            names = [*dict.fromkeys(group_by), *(["start_year"] if by_start_year else [])]
+            if not names:
+                return [{"headcount": self._count(words, None)}]
+            positions = self._positions(words, 0, self.words)
+            if not len(positions):
+                return []
+
+            values = [self.columns[name][positions].astype(np.int64) for name in names]
+            lows = [int(column.min()) for column in values]
+            spans = [int(column.max()) - low + 1 for column, low in zip(values, lows)]
+            if prod(spans) > BINCOUNT_MAX_GROUPS:
+                groups, counts = np.unique(np.column_stack(values), axis=0, return_counts=True)
+                columns = [groups[:, i] for i in range(len(names))]
+            else:
+                keys = np.zeros(len(positions), np.int64)
+                for column, low, span in zip(values, lows, spans):
+                    keys = keys * span + (column - low)
+                counts = np.bincount(keys)
+                keys = np.flatnonzero(counts)
+                counts = counts[keys]
+                columns = []
+                for low, span in zip(reversed(lows), reversed(spans)):
+                    columns.insert(0, keys % span + low)
+                    keys = keys // span
+            return [dict(zip((*names, "headcount"), row)) for row in zip(*(column.tolist() for column in columns), counts.tolist())]
+
+    def check(self, db: Session) -> list[dict]:
+        """
+        Differences between the index, once brought up to date, and the employees table: employees missing from
+        either, indexed values that differ, and bitmaps that do not match their column.
+        """
+        with self._lock:
+            self._sync(db)
+            ids, columns = fetch_columns(select(*INDEX_COLUMNS).order_by(Employee.id), db)
+            positions = bit_positions(self.live[:self.words])
+            indexed_ids = self.ids[positions]
+            differences = []
+            if np.any(np.diff(self.ids[:self.size]) <= 0):
+                differences.append({"column": "id", "error": "IDs are not in ascending order"})
+            differences += [{"id": id, "column": "id", "indexed": None, "stored": id} for id in np.setdiff1d(ids, indexed_ids).tolist()]
+            differences += [{"id": id, "column": "id", "indexed": id, "stored": None} for id in np.setdiff1d(indexed_ids, ids).tolist()]
+
+            common, stored_at, indexed_at = np.intersect1d(ids, indexed_ids, assume_unique=True, return_indices=True)
+            for name, stored in columns.items():
+                indexed, stored = self.columns[name][positions[indexed_at]], stored[stored_at]
+                differences += [
+                    {"id": int(common[i]), "column": name, "indexed": int(indexed[i]), "stored": int(stored[i])}
+                    for i in np.flatnonzero(indexed != stored)
+                ]
+            for dimension in DIMENSIONS:
+                values = self.columns[dimension][positions]
+                for value in sorted(set(np.unique(values).tolist()) | self.bitmaps[dimension].keys()):
+                    expected = positions[values == value]
+                    actual = bit_positions(self.bitmaps[dimension][value][:self.words]) if value in self.bitmaps[dimension] else np.zeros(0, np.int64)
+                    if not np.array_equal(actual, expected):
+                        differences.append({"column": dimension, "value": value, "error": f"Bitmap has {len(actual)} rows, column has {len(expected)}"})
+            return differences
+
+    def status(self) -> dict:
+        arrays = [self.ids, self.live, *self.columns.values(), *(words for bitmaps in self.bitmaps.values() for words in bitmaps.values())]
+        return {"enabled": self.enabled, "seq": self.seq, "employees": self.size - self.deleted, "deleted": self.deleted, "bytes": sum(array.nbytes for array in arrays)}
+
+    def _sync(self, db: Session):
+        if self.seq is None:
+            return self._load(db)
+        if latest_seq(db) <= self.seq:
+            return # Nothing new, or a transaction older than the last sync
+        try:
+            latest = check_since(self.seq, db)
+        except ChangeLogExpired:
+            return self._load(db) # Compacted away, or a different database
+
+        changed = select(EmployeeChange.employee_id).where(EmployeeChange.seq > self.seq)
+        changed_ids = np.array(db.scalars(select(distinct(EmployeeChange.employee_id)).where(EmployeeChange.seq > self.seq)).all(), np.int64)
+        if len(changed_ids) > READ_INDEX_RELOAD_FRACTION * max(self.size - self.deleted, 1):
+            return self._load(db)
+        ids, columns = fetch_columns(select(*INDEX_COLUMNS).where(Employee.id.in_(changed)), db)
+        if not self._apply(ids, columns, np.setdiff1d(changed_ids, ids)):
+            return self._load(db)
+        self.seq = latest
+
+    def _load(self, db: Session):
+        seq = latest_seq(db)
+        self._build(*fetch_columns(select(*INDEX_COLUMNS).order_by(Employee.id), db))
+        self.seq = seq
+
+    def _build(self, ids: np.ndarray, columns: dict[str, np.ndarray]):
+        capacity = (len(ids) * 5 // 4 // 64 + 1) * 64 # A quarter to spare for new employees
+        self.size = len(ids)
+        self.deleted = 0
+        self.ids = resized(ids, capacity)
+        self.columns = {name: resized(values, capacity) for name, values in columns.items()}
+        self.live = bitmap(np.arange(self.size), capacity)
+        self.bitmaps = {
+            dimension: {value: bitmap(np.flatnonzero(columns[dimension] == value), capacity) for value in np.unique(columns[dimension]).tolist()}
+            for dimension in DIMENSIONS
+        }
+
+    def _grow(self, size: int):
+        capacity = max(len(self.ids) * 2, (size // 64 + 1) * 64)
+        self.ids = resized(self.ids, capacity)
+        self.columns = {name: resized(values, capacity) for name, values in self.columns.items()}
+        self.live = resized(self.live, capacity // 64)
+        self.bitmaps = {dimension: {value: resized(words, capacity // 64) for value, words in bitmaps.items()} for dimension, bitmaps in self.bitmaps.items()}
+
+    def _find(self, ids: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """The row position of each ID and whether it is indexed, current or deleted."""
+        positions = np.searchsorted(self.ids[:self.size], ids)
+        found = positions < self.size
+        found[found] = self.ids[positions[found]] == ids[found]
+        return positions, found
+
+    def _is_live(self, positions: np.ndarray) -> np.ndarray:
+        return (self.live[positions >> 6] >> (positions & 63).astype(np.uint64) & ONE).astype(bool)
+
+    def _unset(self, positions: np.ndarray):
+        """Clear the bits of the employees at `positions`."""
+        for dimension, bitmaps in self.bitmaps.items():
+            values = self.columns[dimension][positions]
+            for value in np.unique(values).tolist():
+                clear_bits(bitmaps[value], positions[values == value])
+        clear_bits(self.live, positions)
+
+    def _set(self, positions: np.ndarray):
+        """Set the bits of the employees at `positions` from their columns."""
+        for dimension, bitmaps in self.bitmaps.items():
+            values = self.columns[dimension][positions]
+            for value in np.unique(values).tolist():
+                words = bitmaps.get(value)
+                if words is None:
+                    words = bitmaps[value] = np.zeros(len(self.live), np.uint64)
+                set_bits(words, positions[values == value])
+        set_bits(self.live, positions)
+
+    def _apply(self, ids: np.ndarray, columns: dict[str, np.ndarray], deleted_ids: np.ndarray) -> bool:
+        """Apply the current rows of changed employees and the IDs of deleted ones. False if they cannot be applied in place."""
+        positions, found = self._find(ids)
+        new = np.flatnonzero(~found)
+        if len(new) and self.size and ids[new].min() < self.ids[self.size - 1]:
+            return False
+
+        deleted, deleted_found = self._find(deleted_ids)
+        deleted = deleted[deleted_found]
+        deleted = deleted[self._is_live(deleted)]
+        self._unset(deleted)
+        self.deleted += len(deleted)
+
+        existing = positions[found]
+        live = self._is_live(existing)
+        self._unset(existing[live])
+        self.deleted -= int((~live).sum()) # Deleted employees written again
+
+        if self.size + len(new) > len(self.ids):
+            self._grow(self.size + len(new))
+        positions[new[np.argsort(ids[new])]] = np.arange(self.size, self.size + len(new))
+        self.size += len(new)
+        self.ids[positions] = ids
+        for name, values in columns.items():
+            self.columns[name][positions] = values
+        self._set(positions)
+
+        if self.deleted > max(self.size // 2, 1024):
+            live = bit_positions(self.live[:self.words])
+            self._build(self.ids[live], {name: values[live] for name, values in self.columns.items()})
+        return True
+
+    def _match(self, filters) -> np.ndarray:
+        """Bitmap of the current employees with every foreign key in `filters`."""
+        words = self.live[:self.words].copy()
+        for dimension in DIMENSIONS:
+            value = getattr(filters, dimension, None)
+            if value is not None:
+                if value not in self.bitmaps[dimension]:
+                    return np.zeros_like(words)
+                words &= self.bitmaps[dimension][value][:self.words]
+        return words
+
+    def _date_range(self, filters) -> tuple[int, int] | None:
+        start_from, start_to = getattr(filters, "start_date_from", None), getattr(filters, "start_date_to", None)
+        if start_from is None and start_to is None:
+            return None
+        return (to_days(start_from) if start_from else np.iinfo(np.int32).min, to_days(start_to) if start_to else np.iinfo(np.int32).max)
+
+    def _positions(self, words: np.ndarray, first_word: int, last_word: int, date_range: tuple[int, int] | None = None) -> np.ndarray:
+        """Positions of the set bits in a range of words, in order, that also start within `date_range`."""
+        positions = bit_positions(words[first_word:last_word], first_word)
+        if date_range:
+            days = self.columns["start_date"][positions]
+            positions = positions[(days >= date_range[0]) & (days <= date_range[1])]
+        return positions
+
+    def _count(self, words: np.ndarray, date_range: tuple[int, int] | None) -> int:
+        if date_range is None:
+            return int(np.bitwise_count(words).sum())
+        return len(self._positions(words, 0, self.words, date_range))
+
+    def _id_bounds(self, after_id: int | None, descending: bool) -> tuple[int, int]:
+        """The positions, as [start, stop), of the IDs after `after_id` in sort order."""
+        if after_id is None:
+            return 0, self.size
+        if descending:
+            return 0, int(np.searchsorted(self.ids[:self.size], after_id, "left"))
+        return int(np.searchsorted(self.ids[:self.size], after_id, "right")), self.size
+
+    def _scan(self, words: np.ndarray, start: int, stop: int, descending: bool, want: int, date_range: tuple[int, int] | None) -> np.ndarray:
+        """Up to `want` positions of set bits between `start` and `stop`, in ID order, unpacking `SCAN_WORDS` at a time."""
+        found = []; count = 0
+        windows = range(start // 64, (stop + 63) // 64, SCAN_WORDS)
+        for first_word in reversed(windows) if descending else windows:
+            positions = self._positions(words, first_word, min(first_word + SCAN_WORDS, (stop + 63) // 64), date_range)
+            positions = positions[(positions >= start) & (positions < stop)]
+            found.append((positions[::-1] if descending else positions)[:want - count])
+            count += len(found[-1])
+            if count >= want:
+                break
+        return np.concatenate(found) if found else np.zeros(0, np.int64)
+
+    def _page_by_value(self, dimension: str, words: np.ndarray, after: tuple | None, descending: bool, want: int, date_range: tuple[int, int] | None) -> np.ndarray:
+        """A page sorted by a foreign key, taking each value's employees in ID order from its bitmap."""
+        values = sorted(self.bitmaps[dimension], reverse=descending)
+        if after:
+            values = [value for value in values if (value <= after[0] if descending else value >= after[0])]
+        found = []; count = 0
+        for value in values:
+            bounds = self._id_bounds(after[1] if after and value == after[0] else None, descending)
+            found.append(self._scan(words & self.bitmaps[dimension][value][:self.words], *bounds, descending, want - count, date_range))
+            count += len(found[-1])
+            if count >= want:
+                break
+        return np.concatenate(found) if found else np.zeros(0, np.int64)
+
+    def _page_by_date(self, words: np.ndarray, after: tuple | None, descending: bool, want: int, date_range: tuple[int, int] | None) -> np.ndarray:
+        """A page sorted by start date, the smallest (start date, ID) keys of every match found with a partial sort."""
+        positions = self._positions(words, 0, self.words, date_range)
+        days = self.columns["start_date"][positions].astype(np.int64)
+        ids = self.ids[positions]
+        if after:
+            last_day, last_id = to_days(after[0]), after[1]
+            later = (days < last_day) | ((days == last_day) & (ids < last_id)) if descending else (days > last_day) | ((days == last_day) & (ids > last_id))
+            positions, days, ids = positions[later], days[later], ids[later]
+        keys = (days + (1 << 30)) << 32 | ids # IDs fit in 32 bits
+        if descending:
+            keys = -keys
+        top = np.argpartition(keys, want - 1)[:want] if len(keys) > want else np.arange(len(keys))
+        return positions[top[np.argsort(keys[top])]]
+
+employee_index = EmployeeIndex()
@@ -0,0 +1,44 @@
+from fastapi import APIRouter, Depends, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db import get_async_read_db
+from cache import cached_json_response
+from aggregates import aggregate_query
+from models import Employee
+from read_index import employee_index
+from schemas import AggregateDimension, AggregateFilters
+
+router = APIRouter(
+    prefix="/aggregates",
+    tags=["aggregates"],
+)
+
+GROUP_BY = Query([], description="Attributes to group by, repeated for several. Leave out for one group of every employee.")
+
+async def aggregate_rows(group_by: list[AggregateDimension], filters: AggregateFilters, db: AsyncSession, by_start_year: bool = False) -> list[dict]:
+    """Headcount rows of `aggregate_query` as dicts, counted by the read index when it is enabled."""
+    if employee_index.enabled:
+        return await db.run_sync(lambda session: employee_index.aggregate(group_by, filters, by_start_year, session))
+    return [row._asdict() for row in await db.execute(aggregate_query(group_by, filters, by_start_year))]
+
+@router.get("/headcount")
+async def get_headcount(request: Request, group_by: list[AggregateDimension] = GROUP_BY, filters: AggregateFilters = Depends(), db: AsyncSession = Depends(get_async_read_db)):
+    """Number of employees matching the filters in each group."""
+    async def build():
+        groups = await aggregate_rows(group_by, filters, db)
+        return {"groups": groups, "total": sum(group["headcount"] for group in groups)}
+    return await cached_json_response(request, db, (Employee,), build)
+
+@router.get("/start-dates")
+async def get_start_dates(request: Request, group_by: list[AggregateDimension] = GROUP_BY, filters: AggregateFilters = Depends(), db: AsyncSession = Depends(get_async_read_db)):
+    """Number of employees matching the filters in each group by the year they started, as `{year: headcount}`."""
+    async def build():
+        groups = {}
+        for row in await aggregate_rows(group_by, filters, db, by_start_year=True):
+            start_year, headcount = row.pop("start_year"), row.pop("headcount")
+            group = groups.setdefault(tuple(row.values()), {**row, "headcount": 0, "start_years": {}})
+            group["headcount"] += headcount
+            group["start_years"][start_year] = headcount
+        groups = list(groups.values())
+        return {"groups": groups, "total": sum(group["headcount"] for group in groups)}
+    return await cached_json_response(request, db, (Employee,), build)
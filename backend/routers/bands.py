@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from db import get_db
+from db import get_async_db, get_async_read_db
+from cache import lookup_cache, bump_table_versions, cached_json_response
 from models import SalaryBand
-from schemas import CreateSalaryBand
+from schemas import CreateSalaryBand, SalaryBandRead
 
 router = APIRouter(
     prefix="/bands",
@@ -11,21 +13,24 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
-@router.get("/")
-async def get_bands(db: Session = Depends(get_db)):
-    bands = db.query(SalaryBand).all()
-    return bands
+@router.get("/", response_model=list[SalaryBandRead])
+async def get_bands(request: Request, db: AsyncSession = Depends(get_async_read_db)):
+    async def build():
+        return (await db.execute(select(SalaryBand.__table__))).all()
+    return await cached_json_response(request, db, (SalaryBand,), build)
 
-@router.get("/{id}")
-async def get_band(id: int, db: Session = Depends(get_db)):
-    band = db.query(SalaryBand).filter(SalaryBand.id == id).first()
+@router.get("/{id}", response_model=SalaryBandRead)
+async def get_band(id: int, db: AsyncSession = Depends(get_async_read_db)):
+    band = await db.get(SalaryBand, id)
     if not band:
         raise HTTPException(status_code=404, detail="Band not found")
     return band
 
 @router.post("/")
-async def create_band(band: CreateSalaryBand, db: Session = Depends(get_db)):
-    db_band = CreateSalaryBand(**band.model_dump())
+async def create_band(band: CreateSalaryBand, db: AsyncSession = Depends(get_async_db)):
+    db_band = SalaryBand(**band.model_dump())
     db.add(db_band)
-    db.commit()
+    await db.run_sync(bump_table_versions, SalaryBand)
+    await db.commit()
+    lookup_cache.invalidate(SalaryBand)
     return band
\ No newline at end of file
@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from db import get_db
+from db import get_async_db, get_async_read_db
+from cache import lookup_cache, bump_table_versions, cached_json_response
 from models import Department
-from schemas import CreateDepartment
+from schemas import CreateDepartment, DepartmentRead
 
 router = APIRouter(
     prefix="/departments",
@@ -11,21 +13,24 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
-@router.get("/")
-async def get_departments(db: Session = Depends(get_db)):
-    departments = db.query(Department).all()
-    return departments
+@router.get("/", response_model=list[DepartmentRead])
+async def get_departments(request: Request, db: AsyncSession = Depends(get_async_read_db)):
+    async def build():
+        return (await db.execute(select(Department.__table__))).all()
+    return await cached_json_response(request, db, (Department,), build)
 
-@router.get("/{id}")
-async def get_department(id: int, db: Session = Depends(get_db)):
-    department = db.query(Department).filter(Department.id == id).first()
+@router.get("/{id}", response_model=DepartmentRead)
+async def get_department(id: int, db: AsyncSession = Depends(get_async_read_db)):
+    department = await db.get(Department, id)
     if not department:
         raise HTTPException(status_code=404, detail="Department not found")
     return department
 
 @router.post("/")
-async def create_department(department: CreateDepartment, db: Session = Depends(get_db)):
+async def create_department(department: CreateDepartment, db: AsyncSession = Depends(get_async_db)):
     db_department = Department(**department.model_dump())
     db.add(db_department)
-    db.commit()
+    await db.run_sync(bump_table_versions, Department)
+    await db.commit()
+    lookup_cache.invalidate(Department)
     return department
\ No newline at end of file
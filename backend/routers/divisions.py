@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from db import get_db
+from db import get_async_db, get_async_read_db
+from cache import lookup_cache, bump_table_versions, cached_json_response
 from models import Division
-from schemas import CreateDivision
+from schemas import CreateDivision, DivisionRead
 
 router = APIRouter(
     prefix="/divisions",
@@ -11,21 +13,24 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
-@router.get("/")
-async def get_divisions(db: Session = Depends(get_db)):
-    divisions = db.query(Division).all()
-    return divisions
+@router.get("/", response_model=list[DivisionRead])
+async def get_divisions(request: Request, db: AsyncSession = Depends(get_async_read_db)):
+    async def build():
+        return (await db.execute(select(Division.__table__))).all()
+    return await cached_json_response(request, db, (Division,), build)
 
-@router.get("/{id}")
-async def get_division(id: int, db: Session = Depends(get_db)):
-    division = db.query(Division).filter(Division.id == id).first()
+@router.get("/{id}", response_model=DivisionRead)
+async def get_division(id: int, db: AsyncSession = Depends(get_async_read_db)):
+    division = await db.get(Division, id)
     if not division:
         raise HTTPException(status_code=404, detail="Division not found")
     return division
 
 @router.post("/")
-async def create_division(division: CreateDivision, db: Session = Depends(get_db)):
+async def create_division(division: CreateDivision, db: AsyncSession = Depends(get_async_db)):
     db_division = Division(**division.model_dump())
     db.add(db_division)
-    db.commit()
+    await db.run_sync(bump_table_versions, Division)
+    await db.commit()
+    lookup_cache.invalidate(Division)
     return division
\ No newline at end of file
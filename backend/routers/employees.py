@@ -1,9 +1,195 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+import csv, json
+from io import StringIO
+from typing import Any, AsyncIterator, Literal
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import Select, select, func, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from db import get_db
-from models import Employee
-from schemas import CreateEmployee
+from db import AsyncReadSessionLocal, get_async_db, get_async_read_db
+from changes import ChangeLogExpired, get_changes, latest_seq
+from cache import bump_table_versions, cached_json_response, row_dicts
+from db_ops import apply_employee_filters, apply_employee_operations
+from models import Employee, Rank, Position, Department
+from read_index import employee_index
+from schemas import BulkEmployeeOperation, BulkEmployeeSummary, ChangeParams, CreateEmployee, EmployeeChanges, EmployeeFilters, EmployeePage, EmployeeRead, PageParams, SearchParams
+from search import SEARCH_ENABLED, search_employees
+from utils import encode_cursor, decode_cursor
+
+SORT_COLUMNS = {
+    "id": Employee.id,
+    "first_name": Employee.first_name,
+    "surname": Employee.surname,
+    "start_date": Employee.start_date,
+    "division_id": Employee.division_id,
+    "rank_id": Employee.rank_id,
+    "position_id": Employee.position_id,
+    "department_id": Employee.department_id,
+    "salary_band_id": Employee.salary_band_id,
+}
+EMPLOYEE_COLUMNS = (
+    Employee.id,
+    Employee.first_name,
+    Employee.surname,
+    Employee.division_id,
+    Employee.rank_id,
+    Employee.position_id,
+    Employee.department_id,
+    Employee.salary_band_id,
+    Employee.contact_number,
+    Employee.start_date,
+    Employee.last_updated,
+)
+ENRICHED_COLUMNS = (
+    Employee.id,
+    Employee.first_name,
+    Employee.surname,
+    Employee.division_id,
+    Employee.rank_id,
+    Rank.name.label("rank"),
+    Employee.position_id,
+    Position.name.label("position"),
+    Employee.department_id,
+    Department.name.label("department"),
+    Employee.salary_band_id,
+    Employee.contact_number,
+    Employee.start_date,
+)
+
+async def paginate_employees(stmt: Select, filters: EmployeeFilters, page: PageParams, db: AsyncSession, scalars: bool = True) -> dict:
+    """
+    Runs an employee query a page at a time using keyset pagination, ordered by `page.sort` then ID. Rows must expose
+    every sortable column as an attribute. `total` counts every matching employee and is only computed for the first
+    page, when no cursor is given. With `READ_INDEX=1`, pages the index can answer are found in `read_index.py`.
+    """
+    descending = page.sort.startswith("-")
+    sort_column = SORT_COLUMNS.get(page.sort.removeprefix("-"))
+    if sort_column is None:
+        raise HTTPException(status_code=422, detail=f"Cannot sort by '{page.sort}'. Use one of {', '.join(SORT_COLUMNS)}.")
+
+    if page.cursor:
+        try:
+            last_value, last_id = decode_cursor(page.cursor)
+            python_type = sort_column.type.python_type # Values of the wrong type or shape raise TypeError
+            last_value, last_id = python_type.fromisoformat(last_value) if sort_column is Employee.start_date else python_type(last_value), int(last_id)
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=400, detail=f"Invalid cursor '{page.cursor}'")
+
+    if employee_index.serves(filters, sort_column.key):
+        after = (last_value, last_id) if page.cursor else None
+        # The index finds the page's IDs, so only its rows are read from the database. The filters are left out, as
+        # SQLite would otherwise scan the index of a filtered column rather than look up each ID.
+        ids, total = await db.run_sync(lambda session: employee_index.page(filters, sort_column.key, descending, after, page.limit, not page.cursor, session))
+        stmt = stmt.where(Employee.id.in_(ids))
+        by_id = {row.id: row for row in (await db.scalars(stmt) if scalars else await db.execute(stmt)).all()}
+        rows = [by_id[id] for id in ids if id in by_id]
+    else:
+        stmt = apply_employee_filters(stmt, filters)
+        total = None if page.cursor else await db.scalar(apply_employee_filters(select(func.count()).select_from(Employee), filters))
+        if page.cursor:
+            # Row value comparison seeks straight to the next page instead of counting past an OFFSET
+            key, last_key = (Employee.id, last_id) if sort_column is Employee.id else (tuple_(sort_column, Employee.id), (last_value, last_id))
+            stmt = stmt.where(key < last_key if descending else key > last_key)
+
+        order = (sort_column.desc(), Employee.id.desc()) if descending else (sort_column, Employee.id)
+        stmt = stmt.order_by(*order).limit(page.limit + 1)
+        rows = (await db.scalars(stmt) if scalars else await db.execute(stmt)).all()
+
+    next_cursor = None
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, sort_column.key), last.id)
+    return {"items": rows, "total": total, "next_cursor": next_cursor}
+
+async def enriched_page(filters: EmployeeFilters, page: PageParams, format: str, db: AsyncSession) -> dict:
+    """Runs one `/employees/enriched` page, shaped as rows or columns."""
+    stmt = (
+        select(*ENRICHED_COLUMNS)
+        .join(Rank, Employee.rank_id == Rank.id)
+        .join(Position, Employee.position_id == Position.id)
+        .join(Department, Employee.department_id == Department.id)
+    )
+    result = await paginate_employees(stmt, filters, page, db, scalars=False)
+    if format == "columnar":
+        rows = result.pop("items")
+        fields = [column.key for column in ENRICHED_COLUMNS]
+        result["columns"] = {field: [row[i] for row in rows] for i, field in enumerate(fields)}
+    else:
+        result["items"] = row_dicts(result["items"])
+    return result
+
+BULK_BATCH_SIZE = 1000 # Operations per transaction in `POST /employees/bulk`
+EXPORT_BATCH_SIZE = 1000 # Rows fetched from the cursor per chunk of `GET /employees/export`
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+OPERATION_ADAPTER = TypeAdapter(BulkEmployeeOperation)
+
+async def read_operations(request: Request) -> AsyncIterator[tuple[int, BulkEmployeeOperation | ValidationError]]:
+    """
+    Yields each operation of a bulk request body with its index, or the ValidationError it failed with. NDJSON bodies
+    are parsed line by line as they stream in; JSON arrays are read whole.
+    """
+    if request.headers.get("content-type", "").split(";")[0].strip() in NDJSON_TYPES:
+        async def lines():
+            buffer = b""
+            async for chunk in request.stream():
+                *complete, buffer = (buffer + chunk).split(b"\n")
+                for line in complete:
+                    yield line
+            yield buffer
+
+        index = 0
+        async for line in lines():
+            if line.strip():
+                try:
+                    yield index, OPERATION_ADAPTER.validate_json(line)
+                except ValidationError as e:
+                    yield index, e
+                index += 1
+        return
+
+    try:
+        items = json.loads(await request.body())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON. {e}")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=422, detail="Expected a JSON array of operations, or NDJSON with one operation per line.")
+    for index, item in enumerate(items):
+        try:
+            yield index, OPERATION_ADAPTER.validate_python(item)
+        except ValidationError as e:
+            yield index, e
+
+def format_validation_error(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, err['loc'])) or 'body'}: {err['msg']}" for err in e.errors())
+
+def encode_value(value: Any) -> Any:
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+async def export_rows(filters: EmployeeFilters, format: str) -> AsyncIterator[str]:
+    """
+    Streams employees ordered by ID as NDJSON lines or CSV, one chunk per `EXPORT_BATCH_SIZE` rows fetched from the
+    cursor. Opens its own session, since the response outlives the request's dependencies.
+    """
+    keys = [column.key for column in EMPLOYEE_COLUMNS]
+    stmt = apply_employee_filters(select(*EMPLOYEE_COLUMNS), filters).order_by(Employee.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+    async with AsyncReadSessionLocal() as db:
+        result = await db.stream(stmt)
+        if format == "csv":
+            output = StringIO()
+            writer = csv.writer(output)
+            writer.writerow(keys)
+            async for rows in result.partitions():
+                writer.writerows([encode_value(value) for value in row] for row in rows)
+                yield output.getvalue()
+                output.seek(0); output.truncate()
+            if output.tell():
+                yield output.getvalue() # The header alone when nothing matched
+        else:
+            async for rows in result.partitions():
+                yield b"".join(orjson.dumps(dict(zip(keys, row))) + b"\n" for row in rows)
 
 router = APIRouter(
     prefix="/employees",
@@ -12,39 +198,134 @@ router = APIRouter(
 )
 
 @router.post("/")
-async def create_employee(employee: CreateEmployee, db: Session = Depends(get_db)):
+async def create_employee(employee: CreateEmployee, db: AsyncSession = Depends(get_async_db)):
     db_employee = Employee(**employee.model_dump())
     db.add(db_employee)
-    db.commit()
+    await db.run_sync(bump_table_versions, Employee)
+    await db.commit()
     return employee
 
-@router.get("/")
-async def get_employees(db: Session = Depends(get_db)):
-    employee = db.query(Employee).all()
-    return employee
+@router.post("/bulk", response_model=BulkEmployeeSummary)
+async def bulk_employees(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """
+    Create, update and delete employees from a JSON array of operations, or from NDJSON with one operation per line
+    (`Content-Type: application/x-ndjson`), which is applied as it streams in. An operation looks like
+    `{"op": "update", "id": 4, "employee": {...}}`; `op` defaults to `create`.
+
+    Operations are applied in order, `BULK_BATCH_SIZE` to a transaction, and each gets a result so an invalid or
+    conflicting operation fails alone.
+    """
+    results = []; batch = []
+    async def flush():
+        results.extend(await db.run_sync(lambda session: apply_employee_operations(batch, session)))
+        batch.clear()
+
+    async for index, operation in read_operations(request):
+        if isinstance(operation, ValidationError):
+            results.append({"index": index, "status": "failed", "error": format_validation_error(operation)})
+            continue
+        batch.append((index, operation))
+        if len(batch) >= BULK_BATCH_SIZE:
+            await flush()
+    if batch:
+        await flush()
+
+    results.sort(key=lambda result: result["index"])
+    counts = {status: 0 for status in ("created", "updated", "deleted", "failed")}
+    for result in results:
+        counts[result["status"]] += 1
+    return {**counts, "results": results}
+
+@router.get("/export")
+async def export_employees(filters: EmployeeFilters = Depends(), format: Literal["ndjson", "csv"] = Query("ndjson")):
+    """
+    Stream every employee matching the filters, ordered by ID, as NDJSON or CSV. Rows are read from the database
+    cursor a batch at a time, so neither the table nor the response is held in memory.
+    """
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    headers = {"Content-Disposition": f'attachment; filename="employees.{format}"'}
+    return StreamingResponse(export_rows(filters, format), media_type=media_type, headers=headers)
+
+@router.get("/", response_model=EmployeePage)
+async def get_employees(request: Request, filters: EmployeeFilters = Depends(), page: PageParams = Depends(), db: AsyncSession = Depends(get_async_read_db)):
+    async def build():
+        result = await paginate_employees(select(*EMPLOYEE_COLUMNS), filters, page, db, scalars=False)
+        return {**result, "items": row_dicts(result["items"])}
+    return await cached_json_response(request, db, (Employee,), build)
+
+@router.get("/enriched")
+async def get_enriched_employees(
+    request: Request,
+    filters: EmployeeFilters = Depends(),
+    page: PageParams = Depends(),
+    format: Literal["rows", "columnar"] = Query("rows", description="`columnar` returns one array per field instead of one object per employee."),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    List employees with rank, position and department names joined in, from a single query projected straight into
+    row tuples rather than ORM objects. Paginated like `GET /employees/`.
+    """
+    return await cached_json_response(request, db, (Employee, Rank, Position, Department), lambda: enriched_page(filters, page, format, db))
+
+@router.get("/search")
+async def search(request: Request, params: SearchParams = Depends(), db: AsyncSession = Depends(get_async_read_db)):
+    """
+    Employees ranked by how well every word of `q` matches the start of a word in their name, position or department,
+    with names counting most. A search that matches nothing is retried with close spellings of its words, and the
+    response's `fuzzy` is then true.
+    """
+    if not SEARCH_ENABLED:
+        raise HTTPException(status_code=501, detail="Search requires SQLite's FTS5 extension")
+
+    async def build():
+        try:
+            return await db.run_sync(lambda session: search_employees(params.q, params.limit, params.cursor, session))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    return await cached_json_response(request, db, (Employee, Rank, Position, Department), build)
+
+@router.get("/changes", response_model=EmployeeChanges)
+async def get_employee_changes(request: Request, params: ChangeParams = Depends(), db: AsyncSession = Depends(get_async_read_db)):
+    """
+    Employees created, updated or deleted after sequence number `since`, for keeping a cached copy up to date: the
+    current row of each one upserted and the IDs of those deleted. Pass the response's `seq` as the next `since`, and
+    ask again straight away while `more` is true. A `410 Gone` means the changes have been compacted away and every
+    employee has to be fetched again.
+    """
+    async def build():
+        if params.since is None:
+            return {"seq": await db.run_sync(latest_seq), "more": False, "upserts": [], "deletes": []}
+        try:
+            return await db.run_sync(lambda session: get_changes(params.since, params.limit, session))
+        except ChangeLogExpired as e:
+            raise HTTPException(status_code=410, detail=str(e))
+    return await cached_json_response(request, db, (Employee,), build)
 
-@router.get("/{id}")
-async def get_employee(id: int, db: Session = Depends(get_db)):
-    employee = db.query(Employee).filter(Employee.id == id).first()
+@router.get("/{id}", response_model=EmployeeRead)
+async def get_employee(id: int, db: AsyncSession = Depends(get_async_read_db)):
+    employee = await db.get(Employee, id)
     if not employee:
         raise HTTPException(status_code=404, detail="Employee not found")
     return employee
 
-@router.put("/{id}")
-async def update_employee(id: int, updated: CreateEmployee, db: Session = Depends(get_db)):
-    employee = db.query(Employee).filter(Employee.id == id).first()
+@router.put("/{id}", response_model=EmployeeRead)
+async def update_employee(id: int, updated: CreateEmployee, db: AsyncSession = Depends(get_async_db)):
+    employee = await db.get(Employee, id)
     if not employee:
         raise HTTPException(status_code=404, detail="Employee not found")
     for field, value in updated.model_dump().items():
         setattr(employee, field, value)
-    db.commit()
+    employee.row_hash = None # No longer matches the CSV row it was ingested from
+    await db.run_sync(bump_table_versions, Employee)
+    await db.commit()
     return employee
     
-@router.delete("/{id}")
-async def delete_employee(id: int, db: Session = Depends(get_db)):
-    employee = db.query(Employee).filter(Employee.id == id).first()
+@router.delete("/{id}", response_model=EmployeeRead)
+async def delete_employee(id: int, db: AsyncSession = Depends(get_async_db)):
+    employee = await db.get(Employee, id)
     if not employee:
         raise HTTPException(status_code=404, detail="Employee not found")
-    db.delete(employee)
-    db.commit()
+    await db.delete(employee)
+    await db.run_sync(bump_table_versions, Employee)
+    await db.commit()
     return employee
\ No newline at end of file
@@ -0,0 +1,56 @@
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db import AsyncReadSessionLocal, get_async_read_db
+from models import IngestJob
+from schemas import IngestJobStatus
+
+JOB_EVENTS_INTERVAL = 0.5 # Seconds between progress checks on an event stream
+FINISHED_STATES = ("succeeded", "failed")
+
+router = APIRouter(
+    prefix="/jobs",
+    tags=["jobs"],
+    responses={404: {"description": "Not found"}},
+)
+
+@router.get("/", response_model=list[IngestJobStatus])
+async def get_jobs(division_id: int | None = Query(None, ge=1), limit: int = Query(50, ge=1, le=500), db: AsyncSession = Depends(get_async_read_db)):
+    stmt = select(IngestJob).order_by(IngestJob.submitted_at.desc()).limit(limit)
+    if division_id is not None:
+        stmt = stmt.where(IngestJob.division_id == division_id)
+    return (await db.scalars(stmt)).all()
+
+@router.get("/{id}", response_model=IngestJobStatus)
+async def get_job(id: str, db: AsyncSession = Depends(get_async_read_db)):
+    job = await db.get(IngestJob, id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/{id}/events")
+async def get_job_events(id: str, request: Request):
+    """
+    Stream a job's progress as server-sent events. An event carrying the job's status is sent whenever it changes, and
+    the stream ends once the job has succeeded or failed.
+    """
+    async with AsyncReadSessionLocal() as db:
+        if not await db.get(IngestJob, id):
+            raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        last = None
+        while not await request.is_disconnected():
+            async with AsyncReadSessionLocal() as db:
+                status = IngestJobStatus.model_validate(await db.get(IngestJob, id))
+            if status != last:
+                yield f"data: {status.model_dump_json()}\n\n"
+                last = status
+            if status.state in FINISHED_STATES:
+                return
+            await asyncio.sleep(JOB_EVENTS_INTERVAL)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from db import get_db
+from db import get_async_db, get_async_read_db
+from cache import lookup_cache, bump_table_versions, cached_json_response
 from models import Position
-from schemas import CreatePosition
+from schemas import CreatePosition, PositionRead
 
 router = APIRouter(
     prefix="/positions",
@@ -11,21 +13,24 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
-@router.get("/")
-async def get_positions(db: Session = Depends(get_db)):
-    positions = db.query(Position).all()
-    return positions
+@router.get("/", response_model=list[PositionRead])
+async def get_positions(request: Request, db: AsyncSession = Depends(get_async_read_db)):
+    async def build():
+        return (await db.execute(select(Position.__table__))).all()
+    return await cached_json_response(request, db, (Position,), build)
 
-@router.get("/{id}")
-async def get_position(id: int, db: Session = Depends(get_db)):
-    position = db.query(Position).filter(Position.id == id).first()
+@router.get("/{id}", response_model=PositionRead)
+async def get_position(id: int, db: AsyncSession = Depends(get_async_read_db)):
+    position = await db.get(Position, id)
     if not position:
         raise HTTPException(status_code=404, detail="Position not found")
     return position
 
 @router.post("/")
-async def create_position(position: CreatePosition, db: Session = Depends(get_db)):
+async def create_position(position: CreatePosition, db: AsyncSession = Depends(get_async_db)):
     db_position = Position(**position.model_dump())
     db.add(db_position)
-    db.commit()
+    await db.run_sync(bump_table_versions, Position)
+    await db.commit()
+    lookup_cache.invalidate(Position)
     return position
\ No newline at end of file
@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from db import get_db
+from db import get_async_db, get_async_read_db
+from cache import lookup_cache, bump_table_versions, cached_json_response
 from models import Rank
-from schemas import CreateRank
+from schemas import CreateRank, RankRead
 
 router = APIRouter(
     prefix="/ranks",
@@ -11,21 +13,24 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
-@router.get("/")
-async def get_ranks(db: Session = Depends(get_db)):
-    ranks = db.query(Rank).all()
-    return ranks
+@router.get("/", response_model=list[RankRead])
+async def get_ranks(request: Request, db: AsyncSession = Depends(get_async_read_db)):
+    async def build():
+        return (await db.execute(select(Rank.__table__))).all()
+    return await cached_json_response(request, db, (Rank,), build)
 
-@router.get("/{id}")
-async def get_rank(id: int, db: Session = Depends(get_db)):
-    rank = db.query(Rank).filter(Rank.id == id).first()
+@router.get("/{id}", response_model=RankRead)
+async def get_rank(id: int, db: AsyncSession = Depends(get_async_read_db)):
+    rank = await db.get(Rank, id)
     if not rank:
         raise HTTPException(status_code=404, detail="Rank not found")
     return rank
 
 @router.post("/")
-async def create_rank(rank: CreateRank, db: Session = Depends(get_db)):
+async def create_rank(rank: CreateRank, db: AsyncSession = Depends(get_async_db)):
     db_rank = Rank(**rank.model_dump())
     db.add(db_rank)
-    db.commit()
+    await db.run_sync(bump_table_versions, Rank)
+    await db.commit()
+    lookup_cache.invalidate(Rank)
     return rank
\ No newline at end of file
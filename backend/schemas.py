@@ -1,5 +1,6 @@
-from typing import Optional
-from pydantic import BaseModel, Field
+from typing import Annotated, Literal, Optional
+from typing_extensions import TypedDict
+from pydantic import BaseModel, Field, model_validator
 from datetime import date, datetime
 
 class CreateDivision(BaseModel):
@@ -17,6 +18,30 @@ class CreateDepartment(BaseModel):
 class CreateSalaryBand(BaseModel):
     id: int = Field(..., ge=1)
 
+class DivisionRead(BaseModel):
+    id: int
+
+    model_config = {
+        "from_attributes": True
+    }
+
+class RankRead(BaseModel):
+    id: int
+    name: str
+
+    model_config = {
+        "from_attributes": True
+    }
+
+class PositionRead(RankRead):
+    pass
+
+class DepartmentRead(RankRead):
+    pass
+
+class SalaryBandRead(DivisionRead):
+    pass
+
 class CreateEmployee(BaseModel):
     first_name: str = Field(..., min_length=1)
     surname: str = Field(..., min_length=1)
@@ -32,3 +57,116 @@ class CreateEmployee(BaseModel):
     model_config = {
         "from_attributes": True
     }
+
+# The fields and constraints of `CreateEmployee` as a TypedDict, which validates straight into a dict without building a
+# model per row. Every key is required, including `last_updated`.
+EmployeeRow = TypedDict("EmployeeRow", {
+    name: Annotated[(field.annotation, *field.metadata)] if field.metadata else field.annotation
+    for name, field in CreateEmployee.model_fields.items()
+})
+
+class EmployeeRead(BaseModel):
+    id: int
+    first_name: str
+    surname: str
+    division_id: int
+    rank_id: int
+    position_id: int
+    department_id: int
+    salary_band_id: int
+    contact_number: str
+    start_date: date
+    last_updated: datetime
+
+    model_config = {
+        "from_attributes": True
+    }
+
+class EmployeePage(BaseModel):
+    items: list[EmployeeRead]
+    total: Optional[int] = Field(default=None, description="Every matching employee, on the first page only.")
+    next_cursor: Optional[str] = None
+
+class EmployeeChanges(BaseModel):
+    seq: int = Field(description="Pass as the next `since`.")
+    more: bool = Field(default=False, description="Further changes are ready to fetch straight away.")
+    upserts: list[EmployeeRead]
+    deletes: list[int]
+
+class BulkEmployeeOperation(BaseModel):
+    op: Literal["create", "update", "delete"] = "create"
+    id: Optional[int] = Field(default=None, ge=1, description="Required for `update` and `delete`.")
+    employee: Optional[CreateEmployee] = Field(default=None, description="Required for `create` and `update`.")
+
+    @model_validator(mode="after")
+    def check_fields(self):
+        if self.op in ("update", "delete") and self.id is None:
+            raise ValueError(f"`id` is required to {self.op} an employee")
+        if self.op in ("create", "update") and self.employee is None:
+            raise ValueError(f"`employee` is required to {self.op} an employee")
+        return self
+
+class BulkEmployeeResult(BaseModel):
+    index: int
+    status: Literal["created", "updated", "deleted", "failed"]
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+class BulkEmployeeSummary(BaseModel):
+    created: int
+    updated: int
+    deleted: int
+    failed: int
+    results: list[BulkEmployeeResult]
+
+class EmployeeFilters(BaseModel):
+    id: Optional[int] = Field(default=None, ge=1)
+    division_id: Optional[int] = Field(default=None, ge=1)
+    rank_id: Optional[int] = Field(default=None, ge=1)
+    position_id: Optional[int] = Field(default=None, ge=1)
+    department_id: Optional[int] = Field(default=None, ge=1)
+    salary_band_id: Optional[int] = Field(default=None, ge=1)
+    start_date_from: Optional[date] = Field(default=None, description="Employees who started on or after this date")
+    start_date_to: Optional[date] = Field(default=None, description="Employees who started on or before this date")
+    q: Optional[str] = Field(default=None, min_length=1, description="Names containing every word as a prefix, e.g. 'jo sm' for John Smith")
+
+class PageParams(BaseModel):
+    sort: str = Field(default="id", description="Column to sort by. Prefix with '-' for descending.")
+    limit: int = Field(default=50, ge=1, le=1000)
+    cursor: Optional[str] = Field(default=None, description="`next_cursor` from the previous page.")
+
+class SearchParams(BaseModel):
+    q: str = Field(..., min_length=1, description="Words matched as prefixes of names, positions and departments")
+    limit: int = Field(default=20, ge=1, le=100)
+    cursor: Optional[str] = Field(default=None, description="`next_cursor` from the previous page.")
+
+class ChangeParams(BaseModel):
+    since: Optional[int] = Field(default=None, ge=0, description="`seq` from the previous response. Leave out to get the current `seq` before fetching every employee.")
+    limit: int = Field(default=1000, ge=1, le=10000)
+
+AggregateDimension = Literal["division_id", "department_id", "rank_id", "position_id", "salary_band_id"]
+
+class AggregateFilters(BaseModel):
+    division_id: Optional[int] = Field(default=None, ge=1)
+    department_id: Optional[int] = Field(default=None, ge=1)
+    rank_id: Optional[int] = Field(default=None, ge=1)
+    position_id: Optional[int] = Field(default=None, ge=1)
+    salary_band_id: Optional[int] = Field(default=None, ge=1)
+
+class IngestJobStatus(BaseModel):
+    id: str
+    division_id: int
+    filename: str
+    state: Literal["queued", "running", "succeeded", "failed"]
+    rows_parsed: int
+    created: int
+    updated: int
+    errors: list[dict]
+    detail: Optional[str] = None
+    submitted_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    model_config = {
+        "from_attributes": True
+    }
@@ -0,0 +1,254 @@
+import os, re, unicodedata
+from threading import Lock
+from time import monotonic
+from sqlalchemy import Connection, ColumnElement, event, false, null, make_url, select, table, column, text, func
+from sqlalchemy.orm import Session
+
+from db import DB_URL, Base
+from cache import get_table_versions
+from models import Employee, Rank, Position, Department
+from utils import encode_cursor, decode_cursor
+
+# An FTS5 index over employee names and their position and department names. Triggers queue the ID of every employee
+# written, whatever the writer, and the queue is applied with a couple of set-based statements before each session
+# commits. FTS5 writes a segment per statement, so indexing from the triggers row by row made ingestion several times
+# slower. SQLite only; other databases fall back to substring matching.
+SEARCH_ENABLED = make_url(DB_URL).get_backend_name() == "sqlite"
+SEARCH_WEIGHTS = (10.0, 10.0, 2.0, 2.0) # bm25 weights of first_name, surname, position and department
+# Searches matching more employees than this are returned in ID order, since bm25 scores every match at ~2µs each
+SEARCH_RANK_MAX_MATCHES = int(os.getenv("SEARCH_RANK_MAX_MATCHES", 5000))
+FUZZY_SEARCH = os.getenv("FUZZY_SEARCH", "1") == "1" # Retry searches that match nothing with misspelt words corrected
+FUZZY_VOCABULARY_TTL = float(os.getenv("FUZZY_VOCABULARY_TTL", 60)) # Seconds between checks for a changed employees table
+
+employee_search = table("employee_search", column("rowid"), column("rank"), column("employee_search"))
+
+SEARCH_DDL = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS employee_search USING fts5(
+        first_name, surname, position, department, tokenize='unicode61 remove_diacritics 2', prefix='1 2 3'
+    )
+    """,
+    "CREATE VIRTUAL TABLE IF NOT EXISTS employee_search_terms USING fts5vocab(employee_search, row)",
+    "CREATE TABLE IF NOT EXISTS employee_search_queue (id INTEGER PRIMARY KEY)",
+    """
+    CREATE TRIGGER IF NOT EXISTS employee_search_insert AFTER INSERT ON employees BEGIN
+        INSERT OR IGNORE INTO employee_search_queue (id) VALUES (new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS employee_search_update AFTER UPDATE OF first_name, surname, position_id, department_id ON employees
+    WHEN new.first_name IS NOT old.first_name OR new.surname IS NOT old.surname
+        OR new.position_id IS NOT old.position_id OR new.department_id IS NOT old.department_id
+    BEGIN
+        INSERT OR IGNORE INTO employee_search_queue (id) VALUES (old.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS employee_search_delete AFTER DELETE ON employees BEGIN
+        INSERT OR IGNORE INTO employee_search_queue (id) VALUES (old.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS employee_search_position AFTER UPDATE OF name ON positions BEGIN
+        INSERT OR IGNORE INTO employee_search_queue (id) SELECT id FROM employees WHERE position_id = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS employee_search_department AFTER UPDATE OF name ON departments BEGIN
+        INSERT OR IGNORE INTO employee_search_queue (id) SELECT id FROM employees WHERE department_id = new.id;
+    END
+    """,
+)
+Base.metadata.info.setdefault("ddl", []).extend(SEARCH_DDL) # See utils.schema_fingerprint
+INDEX_EMPLOYEES = """
+    INSERT INTO employee_search (rowid, first_name, surname, position, department)
+    SELECT employees.id, employees.first_name, employees.surname, positions.name, departments.name
+    FROM employees JOIN positions ON positions.id = employees.position_id JOIN departments ON departments.id = employees.department_id
+"""
+
+@event.listens_for(Base.metadata, "after_create")
+def create_search_index(target, connection: Connection, **kw):
+    """
+    Create the search index and its triggers after `Base.metadata.create_all`, which runs on startup. An index
+    created for a database that already has employees is filled from them, and writes queued outside a session, such
+    as by the sqlite3 shell, are applied.
+    """
+    if not SEARCH_ENABLED:
+        return
+    exists = connection.scalar(text("SELECT 1 FROM sqlite_master WHERE name = 'employee_search'"))
+    for statement in SEARCH_DDL:
+        connection.exec_driver_sql(statement)
+    if not exists:
+        connection.exec_driver_sql(f"INSERT INTO employee_search (employee_search, rank) VALUES ('rank', 'bm25({', '.join(map(str, SEARCH_WEIGHTS))})')")
+        connection.exec_driver_sql(INDEX_EMPLOYEES)
+        connection.exec_driver_sql("DELETE FROM employee_search_queue")
+    else:
+        apply_search_queue(connection)
+
+def apply_search_queue(connection: Connection):
+    """Reindex the employees whose IDs are queued, dropping those that no longer exist, and empty the queue."""
+    if connection.scalar(text("SELECT 1 FROM employee_search_queue LIMIT 1")) is None:
+        return
+    connection.exec_driver_sql("DELETE FROM employee_search WHERE rowid IN (SELECT id FROM employee_search_queue)")
+    connection.exec_driver_sql(INDEX_EMPLOYEES + " WHERE employees.id IN (SELECT id FROM employee_search_queue)")
+    connection.exec_driver_sql("DELETE FROM employee_search_queue")
+
+@event.listens_for(Session, "before_commit")
+def apply_queued_search_writes(session: Session):
+    """Applies the search queue in the transaction being committed, so searches never see a half-indexed write."""
+    if SEARCH_ENABLED and session.in_transaction() and not session.info.get("read_only"):
+        session.flush() # Commit only flushes pending objects after this event
+        apply_search_queue(session.connection())
+
+def tokenize(query: str) -> list[str]:
+    """Split a search query into terms the way the index's `unicode61` tokenizer does: lowercased, without diacritics."""
+    stripped = "".join(char for char in unicodedata.normalize("NFKD", query) if not unicodedata.combining(char))
+    return re.findall(r"[^\W_]+", stripped.lower())
+
+def match_expression(terms: list[str | list[str]], columns: tuple[str, ...] = ()) -> str:
+    """
+    An FTS5 MATCH expression requiring every term, each as a prefix. A list of terms matches any of them as whole
+    words, for typo corrections. Terms are quoted so words such as OR and NEAR are not read as operators.
+    """
+    phrases = []
+    for term in terms:
+        if isinstance(term, str):
+            phrases.append(f'"{term}"*')
+        else:
+            phrases.append("(" + " OR ".join(f'"{alternative}"' for alternative in term) + ")")
+    expression = " AND ".join(phrases)
+    return f"{{{' '.join(columns)}}} : ({expression})" if columns else expression
+
+def name_match(query: str) -> ColumnElement[bool]:
+    """
+    A condition on `Employee` matching names that contain every word of `query` as a prefix, e.g. "jo sm" matches
+    John Smith, answered from the search index.
+    """
+    if not SEARCH_ENABLED:
+        return (Employee.first_name + " " + Employee.surname).icontains(query.strip(), autoescape=True)
+    terms = tokenize(query)
+    if not terms:
+        return false()
+    matches = select(employee_search.c.rowid).where(employee_search.c.employee_search.match(match_expression(terms, ("first_name", "surname"))))
+    return Employee.id.in_(matches)
+
+def single_edits(term: str, alphabet: str) -> set[str]:
+    """Every string one deletion, adjacent transposition, substitution or insertion away from `term`."""
+    splits = [(term[:i], term[i:]) for i in range(len(term) + 1)]
+    deletes = {left + right[1:] for left, right in splits if right}
+    transposes = {left + right[1] + right[0] + right[2:] for left, right in splits if len(right) > 1}
+    substitutes = {left + char + right[1:] for left, right in splits if right for char in alphabet}
+    inserts = {left + char + right for left, right in splits for char in alphabet}
+    return deletes | transposes | substitutes | inserts
+
+class SearchVocabulary:
+    """
+    Process-wide copy of the terms in the search index, for correcting misspelt search words without a query per
+    candidate spelling. Reloaded when the employees table version has changed, which is checked at most every `ttl`
+    seconds, so corrections can briefly miss newly added names. Searches themselves always run against the index.
+    """
+    def __init__(self, ttl: float = FUZZY_VOCABULARY_TTL):
+        self.ttl = ttl
+        self._terms: frozenset[str] = frozenset()
+        self._alphabet = ""
+        self._version = None
+        self._checked = None
+        self._lock = Lock()
+
+    def get(self, db: Session) -> tuple[frozenset[str], str]:
+        """The indexed terms and every character they use, loading them with a single query if stale."""
+        if self._checked is None or monotonic() - self._checked > self.ttl:
+            version = get_table_versions(db, Employee)
+            if version != self._version:
+                terms = frozenset(db.scalars(text("SELECT term FROM employee_search_terms")))
+                alphabet = "".join(sorted({char for term in terms for char in term}))
+                with self._lock:
+                    self._terms, self._alphabet, self._version = terms, alphabet, version
+            self._checked = monotonic()
+        return self._terms, self._alphabet
+
+    def corrections(self, term: str, db: Session) -> list[str]:
+        """
+        Indexed terms one edit away from `term`, which covers most typing errors. Words shorter than three characters
+        are too ambiguous to correct.
+        """
+        if len(term) < 3:
+            return []
+        terms, alphabet = self.get(db)
+        return sorted(variant for variant in single_edits(term, alphabet) if variant in terms)
+
+search_vocabulary = SearchVocabulary()
+
+def count_matches(expression: str, db: Session, limit: int | None = None) -> int:
+    """Matches of an FTS5 expression, counting no further than `limit`."""
+    matches = select(employee_search.c.rowid).where(employee_search.c.employee_search.match(expression)).limit(limit).subquery()
+    return db.scalar(select(func.count()).select_from(matches))
+
+def correct_terms(terms: list[str], db: Session) -> list[str | list[str]]:
+    """Each term that is the prefix of an indexed term as it is, and each other term as its corrections."""
+    return [term if count_matches(match_expression([term]), db, 1) else search_vocabulary.corrections(term, db) for term in terms]
+
+def search_employees(query: str, limit: int, cursor: str | None, db: Session) -> dict:
+    """
+    Employees matching every word of `query` as a prefix of their name, position or department. Up to
+    `SEARCH_RANK_MAX_MATCHES` matches are ranked best first with bm25, names weighing most; broader searches, such as a
+    single letter, are listed by ID with `ranked` false and `total` null. If nothing matches, words that are not the
+    prefix of any indexed term are swapped for indexed spellings one edit away before searching again, and `fuzzy` is
+    true.
+
+    Paginated with an offset cursor, which also carries how the first page was searched. Ranking scores every match
+    whatever the page, so skipping rows adds little. `total` is only given on the first page.
+    """
+    terms: list[str | list[str]] = tokenize(query)
+    if cursor:
+        try:
+            offset, ranked, fuzzy = decode_cursor(cursor)
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Invalid cursor '{cursor}'") from e
+        if not (type(offset) is int and offset >= 0 and isinstance(ranked, bool) and isinstance(fuzzy, bool)):
+            raise ValueError(f"Invalid cursor '{cursor}'")
+    else:
+        offset, ranked, fuzzy = 0, True, False
+    if not terms:
+        return {"items": [], "total": 0, "next_cursor": None, "ranked": True, "fuzzy": False}
+
+    total = None
+    if not cursor:
+        total = count_matches(match_expression(terms), db, SEARCH_RANK_MAX_MATCHES + 1)
+        if not total and FUZZY_SEARCH:
+            corrected = correct_terms(terms, db)
+            if all(corrected) and corrected != terms:
+                terms, fuzzy = corrected, True
+                total = count_matches(match_expression(terms), db, SEARCH_RANK_MAX_MATCHES + 1)
+        ranked = total <= SEARCH_RANK_MAX_MATCHES
+        total = total if ranked else None
+    elif fuzzy:
+        terms = correct_terms(terms, db)
+        if not all(terms):
+            return {"items": [], "total": None, "next_cursor": None, "ranked": ranked, "fuzzy": fuzzy}
+
+    expression = match_expression(terms)
+    # Cut to a page inside the subquery, so only the page is joined to employees. Unranked pages leave out `rank`, which
+    # would still be computed for every match
+    score = employee_search.c.rank if ranked else null()
+    matches = select(employee_search.c.rowid.label("id"), score.label("score")).where(employee_search.c.employee_search.match(expression))
+    matches = matches.order_by(employee_search.c.rank if ranked else employee_search.c.rowid).limit(limit + 1).offset(offset).subquery()
+    stmt = (
+        select(
+            Employee.id, Employee.first_name, Employee.surname, Employee.division_id,
+            Rank.name.label("rank"), Position.name.label("position"), Department.name.label("department"),
+            Employee.contact_number, Employee.start_date, (-matches.c.score).label("score"),
+        )
+        .join(matches, matches.c.id == Employee.id)
+        .join(Rank, Employee.rank_id == Rank.id)
+        .join(Position, Employee.position_id == Position.id)
+        .join(Department, Employee.department_id == Department.id)
+        .order_by(matches.c.score if ranked else Employee.id, Employee.id)
+    )
+    items = [row._asdict() for row in db.execute(stmt)]
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(offset + limit, ranked, fuzzy)
+    return {"items": items, "total": total, "next_cursor": next_cursor, "ranked": ranked, "fuzzy": fuzzy}
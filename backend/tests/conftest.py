@@ -0,0 +1,36 @@
+import os, sys, tempfile
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{Path(tempfile.mkdtemp()) / 'test.db'}")
+os.environ.setdefault("CONFIG_PATH", str(BACKEND_DIR / "config.yaml"))
+os.environ.setdefault("SCHEMA_DIR_PATH", str(BACKEND_DIR / "division_schemas"))
+
+def pytest_configure(config):
+    # The filter parsers.py installs on import is reset by pytest for every test, so it is repeated here
+    config.addinivalue_line("filterwarnings", "ignore:Length of header or names does not match length of data:pandas.errors.ParserWarning")
+
+@pytest.fixture(scope="session")
+def db():
+    """A session on the test database, with its tables and change log triggers created and the config seeded."""
+    import changes # Registers the change log triggers with `create_all`
+    from db import engine, get_db_context
+    from models import Base
+    from utils import seed_db
+
+    Base.metadata.create_all(bind=engine)
+    with get_db_context() as db:
+        seed_db(db)
+        yield db
+
+@pytest.fixture(scope="session")
+def client(db):
+    """A client of the API, started up against the test database."""
+    from fastapi.testclient import TestClient
+    from main import app
+
+    with TestClient(app) as client:
+        yield client
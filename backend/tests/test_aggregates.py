@@ -0,0 +1,39 @@
+from datetime import date, datetime
+
+import pytest
+
+from cache import response_cache
+from db_ops import add_employees_from_records
+from read_index import employee_index
+
+QUERIES = [
+    {},
+    {"group_by": ["division_id", "rank_id"]},
+    {"division_id": 1},
+    {"division_id": 2, "rank_id": 5}, # Matches no one
+    {"group_by": ["department_id"], "division_id": 2, "rank_id": 5},
+]
+
+@pytest.fixture(scope="module", autouse=True)
+def employees(db):
+    records = [
+        {"first_name": f"Aggregate{i}", "surname": "Employee", "rank_id": 1 + i % 3, "position_id": 1 + i % 2, "department_id": 1 + i % 4, "salary_band_id": 1, "contact_number": "0412345678", "start_date": date(2015 + i % 5, 1, 5)}
+        for i in range(20)
+    ]
+    add_employees_from_records(records, 1, db, datetime(2024, 1, 1))
+
+def fetch(client, monkeypatch, path: str, params: dict, read_index: bool) -> dict:
+    monkeypatch.setattr(employee_index, "enabled", read_index)
+    response_cache.clear() # Cached by URL, whichever backend built it
+    response = client.get(path, params=params)
+    assert response.status_code == 200
+    return response.json()
+
+@pytest.mark.parametrize("path", ["/aggregates/headcount", "/aggregates/start-dates"])
+@pytest.mark.parametrize("params", QUERIES)
+def test_backends_agree(client, monkeypatch, path, params):
+    assert fetch(client, monkeypatch, path, params, False) == fetch(client, monkeypatch, path, params, True)
+
+def test_headcount_of_no_one_is_zero(client, monkeypatch):
+    for read_index in (False, True):
+        assert fetch(client, monkeypatch, "/aggregates/headcount", {"division_id": 2, "rank_id": 5}, read_index) == {"groups": [{"headcount": 0}], "total": 0}
@@ -0,0 +1,25 @@
+from datetime import date, datetime
+
+from sqlalchemy import delete
+
+from changes import get_changes, latest_seq
+from db_ops import add_employees_from_records
+from models import Employee
+from schemas import EmployeeChanges, EmployeeRead
+
+def test_changes_serve_employee_read_columns(db):
+    since = latest_seq(db)
+    records = [
+        {"first_name": first_name, "surname": "Changes", "rank_id": 1, "position_id": 1, "department_id": 1, "salary_band_id": 1, "contact_number": "0412345678", "start_date": date(2020, 1, 5)}
+        for first_name in ("Ada", "Grace")
+    ]
+    add_employees_from_records(records, 1, db, datetime(2024, 1, 1))
+    db.commit()
+    deleted = db.scalar(delete(Employee).where(Employee.first_name == "Grace", Employee.surname == "Changes").returning(Employee.id))
+    db.commit()
+
+    changes = get_changes(since, 100, db)
+    assert [set(employee) for employee in changes["upserts"]] == [set(EmployeeRead.model_fields)]
+    assert changes["upserts"][0]["first_name"] == "Ada"
+    assert changes["deletes"] == [deleted]
+    EmployeeChanges.model_validate(changes)
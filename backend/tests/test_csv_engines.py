@@ -0,0 +1,83 @@
+"""
+Both CSV engines must give the same records and errors for a file, including files `read_csv` pads, rejects or reads
+values from as missing, whether parsed whole, in chunks, column-wise or row-wise.
+"""
+from datetime import datetime
+from io import BytesIO, StringIO
+
+import pytest
+
+import parsers
+from db_ops import validate_employee_records
+
+HEADER = "name,position,department,salary_band,contact_number,start_date\n"
+ROW = "John Smith,Senior Software Engineer,Engineering,1,0412 345 678,2020-01-05\n"
+CASES = {
+    "valid": ROW + '"Anne, Marie",Junior Data Engineer,Product,2,0412-345-678,2021-03-01\n',
+    "regex mismatch": ROW + "Cher,Senior Software Engineer,Engineering,1,0412 345 678,2020-01-05\n",
+    "unknown department": ROW + "Jane Doe,Senior Software Engineer,Accounts,1,0412 345 678,2020-01-05\n",
+    "empty string": ROW + ",Senior Software Engineer,Engineering,2,,2020-01-05\n",
+    "missing values": ROW + "None,<NA>,NA,2,null,2020-01-05\n",
+    "empty integer": ROW + "Jane Doe,Junior Data Engineer,Engineering,,0412 345 678,2020-01-05\n",
+    "bad integer": ROW + "Jane Doe,Junior Data Engineer,Engineering,two,0412 345 678,2020-01-05\n",
+    "empty date": ROW + "Jane Doe,Junior Data Engineer,Engineering,2,0412 345 678,\n",
+    "bad date": ROW + "Jane Doe,Junior Data Engineer,Engineering,2,0412 345 678,not a date\n",
+    "short row": ROW + "Jane Doe,Junior Data Engineer,Engineering,2,0412 345 678\n",
+    "short row without integer": ROW + "Jane Doe,Junior Data Engineer,Engineering\n",
+    "long first row": ROW.strip() + ",extra\n" + ROW,
+    "long later row": ROW + ROW.strip() + ",extra\n",
+    "every row long": (ROW.strip() + ",extra\n") * 2,
+    "every row long, shifted fields parse": (ROW.replace("0412 345 678", "0412345678").strip() + ",extra\n") * 2,
+    "empty": "",
+}
+
+def outcome(read) -> tuple:
+    """The records, parse errors and validation errors of a read, or the exception it raised."""
+    try:
+        chunks = list(read())
+    except Exception as e:
+        return type(e).__name__, str(e)
+    records = [record for chunk, _ in chunks for record in chunk]
+    errors = [error for _, chunk in chunks for error in chunk]
+    return repr(records), errors, validation_errors(records)
+
+def validation_errors(records: list[dict]):
+    try:
+        return validate_employee_records(records, 1, datetime(2024, 1, 1))[1]
+    except Exception as e:
+        return type(e).__name__, str(e)
+
+def read_with(monkeypatch, engine: str, read):
+    monkeypatch.setattr(parsers, "CSV_ENGINE", engine)
+    return outcome(read)
+
+@pytest.mark.parametrize("vectorized", [True, False])
+@pytest.mark.parametrize("case", CASES)
+def test_engines_agree(case, vectorized, db, tmp_path, monkeypatch):
+    path = tmp_path / "employees.csv"
+    path.write_text(HEADER + CASES[case] if CASES[case] else "")
+    plan = parsers.csv_parser.plans[1]
+    reads = {
+        "path": lambda: parsers.csv_parser.iter_csv(path, plan, db, vectorized=vectorized),
+        "chunks of one row": lambda: parsers.csv_parser.iter_csv(path, plan, db, chunksize=1, vectorized=vectorized),
+        "file object": lambda: parsers.csv_parser.iter_csv(BytesIO(path.read_bytes()), plan, db, vectorized=vectorized),
+        "whole": lambda: [parsers.csv_parser.parse_csv(StringIO(path.read_text()), plan, db, vectorized=vectorized)],
+    }
+    for name, read in reads.items():
+        assert read_with(monkeypatch, "pyarrow", read) == read_with(monkeypatch, "pandas", read), name
+
+def test_engines_agree_after_chunks_read_with_pyarrow(db, tmp_path, monkeypatch):
+    rows = [ROW.replace("John", f"John{i}") for i in range(25)]
+    rows[17] = rows[17].replace(",2020-01-05", "") # Short row, so pyarrow hands the rest of the file to `read_csv`
+    rows[21] = rows[21].replace("Engineering", "Accounts")
+    path = tmp_path / "employees.csv"
+    path.write_text(HEADER + "".join(rows))
+    read = lambda: parsers.csv_parser.iter_csv(path, parsers.csv_parser.plans[1], db, chunksize=5)
+    assert read_with(monkeypatch, "pyarrow", read) == read_with(monkeypatch, "pandas", read)
+
+@pytest.mark.parametrize("case", CASES)
+def test_vectorized_and_row_wise_agree(case, db, tmp_path):
+    path = tmp_path / "employees.csv"
+    path.write_text(HEADER + CASES[case] if CASES[case] else "")
+    read = lambda vectorized: outcome(lambda: parsers.csv_parser.iter_csv(path, parsers.csv_parser.plans[1], db, vectorized=vectorized))
+    assert read(True) == read(False)
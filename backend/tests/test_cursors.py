@@ -0,0 +1,43 @@
+import pytest
+
+from read_index import employee_index
+from utils import encode_cursor
+
+@pytest.mark.parametrize("sort, cursor", [
+    ("id", "not a cursor"),
+    ("id", encode_cursor(5)),
+    ("id", encode_cursor(1, 2, 3)),
+    ("id", encode_cursor(None, [1])),
+    ("start_date", encode_cursor(1, 2)),
+    ("start_date", encode_cursor("2020-13-01", 2)),
+    ("rank_id", encode_cursor({"rank": 1}, 2)),
+])
+@pytest.mark.parametrize("read_index", [False, True])
+def test_malformed_cursor_is_rejected(client, sort, cursor, read_index, monkeypatch):
+    monkeypatch.setattr(employee_index, "enabled", read_index)
+    response = client.get("/employees/", params={"sort": sort, "cursor": cursor})
+    assert response.status_code == 400
+    assert response.json()["detail"] == f"Invalid cursor '{cursor}'"
+
+@pytest.mark.parametrize("read_index", [False, True])
+def test_cursor_pages(client, read_index, monkeypatch):
+    monkeypatch.setattr(employee_index, "enabled", read_index)
+    assert client.get("/employees/", params={"sort": "-start_date", "cursor": encode_cursor("2020-01-05", 2)}).status_code == 200
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor",
+    encode_cursor(0, True),
+    encode_cursor("x", True, False),
+    encode_cursor(-5, True, False),
+    encode_cursor(1.5, True, False),
+    encode_cursor(True, True, False),
+    encode_cursor(0, "yes", False),
+    encode_cursor(0, True, None),
+])
+def test_malformed_search_cursor_is_rejected(client, cursor):
+    response = client.get("/employees/search", params={"q": "smith", "cursor": cursor})
+    assert response.status_code == 400
+    assert response.json()["detail"] == f"Invalid cursor '{cursor}'"
+
+def test_search_cursor_pages(client):
+    assert client.get("/employees/search", params={"q": "smith", "cursor": encode_cursor(0, True, False)}).status_code == 200
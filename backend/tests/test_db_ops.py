@@ -0,0 +1,11 @@
+from datetime import date, datetime
+
+from db_ops import add_employees_from_records
+from models import Employee
+
+def test_add_employees_from_records_defaults_to_now(db):
+    record = {"first_name": "Default", "surname": "Timestamp", "rank_id": 1, "position_id": 1, "department_id": 1, "salary_band_id": 1, "contact_number": "0412345678", "start_date": date(2020, 1, 5)}
+    before = datetime.now()
+    add_employees_from_records([record], 1, db)
+    employee = db.query(Employee).filter_by(first_name="Default", surname="Timestamp").one()
+    assert employee.last_updated >= before
@@ -0,0 +1,14 @@
+import jobs
+from models import IngestJob
+
+def test_recover_jobs(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "UPLOAD_DIR", tmp_path)
+    for job_id, state in (("queued", "queued"), ("lost", "queued"), ("running", "running"), ("done", "succeeded")):
+        db.add(IngestJob(id=job_id, division_id=1, filename=f"{job_id}.csv", state=state))
+        if job_id != "lost":
+            (tmp_path / f"{job_id}.csv").write_text("")
+    db.commit()
+
+    assert jobs.recover_jobs(db) == [("queued", 1)]
+    states = {job.id: (job.state, job.detail is not None, (tmp_path / f"{job.id}.csv").exists()) for job in db.query(IngestJob)}
+    assert states == {"queued": ("queued", False, True), "lost": ("failed", True, False), "running": ("failed", True, False), "done": ("succeeded", False, True)}
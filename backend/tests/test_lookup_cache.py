@@ -0,0 +1,25 @@
+from cache import LookupCache, bump_table_versions
+from db import get_db_context
+from models import Rank
+
+def test_lookup_cache_sees_writes_from_other_sessions(db):
+    cache = LookupCache()
+    db.commit()
+    assert "Apprentice" not in cache.get_table(Rank, db)
+
+    with get_db_context() as other: # Another worker, which cannot invalidate this process's cache
+        other.add(Rank(name="Apprentice"))
+        bump_table_versions(other, Rank)
+        other.commit()
+
+    assert "Apprentice" not in cache.get_table(Rank, db) # The version is read once per transaction
+    db.commit()
+    assert "Apprentice" in cache.get_table(Rank, db)
+
+def test_lookup_cache_reads_version_once_per_transaction(db):
+    cache = LookupCache()
+    db.commit()
+    table = cache.get_table(Rank, db)
+    assert cache.get_table(Rank, db) is table
+    db.commit()
+    assert cache.get_table(Rank, db) is table # Unchanged version, so the table is not reloaded
@@ -0,0 +1,65 @@
+"""A database created before `row_hash` and the employee indexes were added must keep working once `init_db` has run."""
+import sqlite3
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+
+from db import make_engine
+from db_ops import add_employees_from_records
+from models import Employee
+from utils import get_config, init_db
+
+# The schema as the first release created it
+BASELINE_DDL = """
+CREATE TABLE divisions (id INTEGER NOT NULL, PRIMARY KEY (id));
+CREATE INDEX ix_divisions_id ON divisions (id);
+CREATE TABLE ranks (id INTEGER NOT NULL, name VARCHAR NOT NULL, PRIMARY KEY (id), UNIQUE (name));
+CREATE INDEX ix_ranks_id ON ranks (id);
+CREATE TABLE positions (id INTEGER NOT NULL, name VARCHAR NOT NULL, PRIMARY KEY (id), UNIQUE (name));
+CREATE INDEX ix_positions_id ON positions (id);
+CREATE TABLE departments (id INTEGER NOT NULL, name VARCHAR NOT NULL, PRIMARY KEY (id), UNIQUE (name));
+CREATE INDEX ix_departments_id ON departments (id);
+CREATE TABLE salary_bands (id INTEGER NOT NULL, PRIMARY KEY (id));
+CREATE INDEX ix_salary_bands_id ON salary_bands (id);
+CREATE TABLE employees (
+    id INTEGER NOT NULL, first_name VARCHAR NOT NULL, surname VARCHAR NOT NULL, division_id INTEGER NOT NULL,
+    rank_id INTEGER NOT NULL, position_id INTEGER NOT NULL, department_id INTEGER NOT NULL, salary_band_id INTEGER NOT NULL,
+    contact_number VARCHAR NOT NULL, start_date DATE NOT NULL, last_updated DATETIME NOT NULL,
+    PRIMARY KEY (id), CONSTRAINT uq_employee_name UNIQUE (first_name, surname),
+    FOREIGN KEY(division_id) REFERENCES divisions (id), FOREIGN KEY(rank_id) REFERENCES ranks (id),
+    FOREIGN KEY(position_id) REFERENCES positions (id), FOREIGN KEY(department_id) REFERENCES departments (id),
+    FOREIGN KEY(salary_band_id) REFERENCES salary_bands (id)
+);
+CREATE INDEX ix_employees_id ON employees (id);
+INSERT INTO divisions (id) VALUES (1);
+INSERT INTO ranks (id, name) VALUES (1, 'Graduate');
+INSERT INTO positions (id, name) VALUES (1, 'Software Engineer');
+INSERT INTO departments (id, name) VALUES (1, 'Engineering');
+INSERT INTO salary_bands (id) VALUES (1);
+INSERT INTO employees VALUES (1, 'Old', 'Employee', 1, 1, 1, 1, 1, '0412345678', '2019-02-01', '2024-01-01 00:00:00');
+"""
+
+@pytest.fixture
+def baseline_db(tmp_path):
+    path = tmp_path / "baseline.db"
+    with sqlite3.connect(path) as connection:
+        connection.executescript(BASELINE_DDL)
+    engine = make_engine(f"sqlite:///{path}")
+    with Session(engine) as db:
+        yield db
+    engine.dispose()
+
+@pytest.mark.parametrize("fast", [False, True])
+def test_init_db_migrates_baseline_schema(baseline_db, fast):
+    init_db(baseline_db, get_config(), fast=fast)
+    assert [employee.first_name for employee in baseline_db.scalars(select(Employee))] == ["Old"]
+
+    record = {"first_name": "New", "surname": "Employee", "rank_id": 1, "position_id": 1, "department_id": 1, "salary_band_id": 1, "contact_number": "0412345678", "start_date": date(2020, 1, 5)}
+    add_employees_from_records([record], 1, baseline_db, datetime(2024, 2, 1))
+    assert baseline_db.scalar(select(Employee.row_hash).where(Employee.first_name == "New")) is not None
+    assert not init_db(baseline_db, get_config(), fast=True) # The fingerprint now matches
+
+    indexes = {index.name for index in Employee.__table__.indexes}
+    assert indexes <= set(baseline_db.scalars(text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'employees'")))
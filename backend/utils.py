@@ -1,8 +1,18 @@
-import os, yaml
+import os, yaml, json
+from base64 import urlsafe_b64encode, urlsafe_b64decode
 from collections import defaultdict
+from hashlib import sha256
+from sqlalchemy import insert, select, text
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateIndex, CreateTable
 
-from models import Division, Rank, Position, Department, SalaryBand
+from models import Base, Division, Employee, Rank, Position, Department, SalaryBand, SchemaFingerprint
+from cache import lookup_cache, bump_table_versions
+
+# Skip `init_db` when nothing it sets up has changed since the last start, and defer loading pandas and the division
+# schemas to the first upload. Schema mistakes are then reported on first use rather than at startup.
+FAST_STARTUP = os.getenv("FAST_STARTUP", "0") == "1"
 
 def get_config() -> dict:
     """Fetch YAML config file defined at `CONFIG_PATH`."""
@@ -11,8 +21,12 @@ def get_config() -> dict:
         config: dict[str, list] = yaml.safe_load(f)
     return config
 
-def seed_db(db: Session, config: dict = get_config()):
-    """Seed database with data defined in YAML config file."""
+def seed_db(db: Session, config: dict | None = None):
+    """
+    Seed database with data defined in YAML config file, `CONFIG_PATH` by default. Each reference table is read once
+    and only the values it is missing are inserted.
+    """
+    config = get_config() if config is None else config
     model_map = {
         Division: config.get("divisions", []),
         Rank: config.get("ranks", []),
@@ -21,24 +35,72 @@ def seed_db(db: Session, config: dict = get_config()):
         SalaryBand: config.get("salary_bands", []),
     }
     for model, values in model_map.items():
-         for value in values:
-                if issubclass(model, (Division, SalaryBand)):
-                    exists = db.query(model).filter_by(id=value).first()
-                else:
-                    exists = db.query(model).filter_by(name=value).first()
-                
-                if not exists:
-                    if issubclass(model, (Division, SalaryBand)):
-                        db.add(model(id=value))
-                    else:
-                        db.add(model(name=value))
+        key = "id" if issubclass(model, (Division, SalaryBand)) else "name"
+        existing = set(db.scalars(select(getattr(model, key))))
+        missing = [value for value in dict.fromkeys(values) if value not in existing]
+        if missing:
+            db.execute(insert(model), [{key: value} for value in missing])
+            bump_table_versions(db, model)
     db.commit()
+    lookup_cache.invalidate()
+
+def schema_fingerprint(db: Session, config: dict) -> str:
+    """
+    Hash of everything `init_db` sets up: the config, the DDL of every table and index in the metadata, and the DDL
+    other modules list in `Base.metadata.info["ddl"]` for the triggers and virtual tables their listeners create.
+    """
+    dialect = db.get_bind().dialect
+    ddl = [str(CreateTable(table).compile(dialect=dialect)) for table in Base.metadata.sorted_tables]
+    ddl += [str(CreateIndex(index).compile(dialect=dialect)) for table in Base.metadata.sorted_tables for index in sorted(table.indexes, key=lambda index: index.name)]
+    ddl += sorted(Base.metadata.info.get("ddl", [])) # Sorted, as modules register in import order
+    return sha256(json.dumps([config, ddl], sort_keys=True, default=str).encode()).hexdigest()
+
+def init_db(db: Session, config: dict | None = None, fast: bool = FAST_STARTUP) -> bool:
+    """
+    Create tables and seed database with data defined in YAML config file, as the API and ingestion script do on every
+    start. With `fast`, nothing is done if the schema fingerprint stored by the last run matches. Returns whether it ran.
+    """
+    config = get_config() if config is None else config
+    migrate_db(db)
+    fingerprint = schema_fingerprint(db, config)
+    if fast and stored_fingerprint(db) == fingerprint:
+        return False
+    Base.metadata.create_all(bind=db.get_bind())
+    db.merge(SchemaFingerprint(id=1, fingerprint=fingerprint))
+    seed_db(db, config) # Commits the fingerprint with the seeded rows
+    return True
+
+def migrate_db(db: Session):
+    """
+    Bring a database created by an earlier version up to the current models where `create_all` cannot, as it never
+    alters a table that already exists and only creates indexes along with their table.
+    """
+    with db.get_bind().begin() as connection: # Outside the session, whose commit hooks expect the current schema
+        columns = {row[1] for row in connection.execute(text("PRAGMA table_info(employees)"))}
+        if not columns:
+            return # A new database, which `create_all` sets up whole
+        if "row_hash" not in columns:
+            connection.execute(text("ALTER TABLE employees ADD COLUMN row_hash VARCHAR"))
+        for index in Employee.__table__.indexes:
+            index.create(connection, checkfirst=True)
+
+def stored_fingerprint(db: Session) -> str | None:
+    """The schema fingerprint stored by the last `init_db`, or None if it has never run against this database."""
+    try:
+        return db.scalar(select(SchemaFingerprint.fingerprint))
+    except OperationalError: # No such table yet
+        db.rollback()
+        return None
 
 def clean_contact_number(contact_number: str) -> str:
     """Sanitise contact number string."""
     sanitised_contact_number = contact_number.strip().replace(" ", "").replace("-", "")
     return sanitised_contact_number
 
+def clean_contact_number_series(contact_numbers):
+    """Vectorized `clean_contact_number` over a pandas Series of strings."""
+    return contact_numbers.str.strip().str.replace(" ", "", regex=False).str.replace("-", "", regex=False)
+
 def summarize_errors(errors: list[dict], max_samples=5):
     """Group errors by field and error message. Mainly for use on ValidationErrors returned by Pydantic."""
     grouped = defaultdict(lambda: {"count": 0, "sample_rows": []})
@@ -58,4 +120,30 @@ def summarize_errors(errors: list[dict], max_samples=5):
             "sample_rows": info["sample_rows"]
         }
         for (field, message), info in grouped.items()
-    ]
\ No newline at end of file
+    ]
+
+def merge_error_summaries(summaries: list[list[dict]], max_samples=5):
+    """Merge several `summarize_errors` outputs into one, as if the underlying errors had been summarized together."""
+    merged = {}
+
+    for summary in summaries:
+        for group in summary:
+            key = (group["field"], group["error"])
+            if key not in merged:
+                merged[key] = {"field": group["field"], "error": group["error"], "count": 0, "sample_rows": []}
+            merged_group = merged[key]
+            merged_group["count"] += group["count"]
+            merged_group["sample_rows"].extend(group["sample_rows"][:max_samples - len(merged_group["sample_rows"])])
+
+    return list(merged.values())
+
+def encode_cursor(*values) -> str:
+    """Encode the sort key of the last row on a page as an opaque keyset pagination cursor."""
+    return urlsafe_b64encode(json.dumps(values, default=str).encode()).decode()
+
+def decode_cursor(cursor: str) -> list:
+    """Decode a cursor made by `encode_cursor`. Raises ValueError if it is malformed."""
+    try:
+        return json.loads(urlsafe_b64decode(cursor.encode()))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor '{cursor}'") from e
\ No newline at end of file
@@ -1,14 +1,60 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useCallback } from 'react';
 
 const API_URL = import.meta.env.VITE_API_URL;
+const PAGE_SIZE = 100;
+const SEARCH_DEBOUNCE_MS = 300;
+const FILTER_PARAMS = {
+  division: 'division_id',
+  rank: 'rank_id',
+  position: 'position_id',
+  department: 'department_id',
+  salaryBand: 'salary_band_id',
+};
 
 /**
- * Fetches employees and related metadata (divisions, ranks, etc.).
- * Returns enriched data ready for display and filtering.
- * @returns {Object} employees, setEmployees, loading, setLoading
+ * Builds the `/employees/` query string for a search query and filters.
+ * A search prefixed with '#' matches an employee ID, anything else matches names.
+ * @returns {string} URL-encoded query parameters
  */
-export default function useEmployeesData() {
+function buildEmployeeParams(searchQuery, filters) {
+  const params = new URLSearchParams();
+  const qClean = searchQuery.trim();
+  if (qClean.startsWith('#')) {
+    const id = qClean.replace('#', '');
+    if (id) params.set('id', id);
+  } else if (qClean) {
+    params.set('q', qClean);
+  }
+  Object.entries(FILTER_PARAMS).forEach(([filter, param]) => {
+    if (filters[filter]) params.set(param, filters[filter]);
+  });
+  return params.toString();
+}
+
+/**
+ * Converts a columnar `/employees/enriched` page (one array per field) into row objects for display.
+ * @returns {Object[]} employees
+ */
+function columnsToEmployees(columns) {
+  const fields = Object.keys(columns);
+  return (columns.id ?? []).map((_, i) => {
+    const employee = Object.fromEntries(fields.map(field => [field, columns[field][i]]));
+    return { ...employee, division: employee.division_id, salary_band: employee.salary_band_id };
+  });
+}
+
+/**
+ * Fetches related metadata (divisions, ranks, etc.) once for the filters, and employees a page at a time with
+ * rank, position and department names already joined by the server.
+ * Searching and filtering happen server-side; changes to either refetch the first page.
+ * @param {string} searchQuery Name search, or '#' followed by an employee ID
+ * @param {Object} filters Division, rank, position, department and salaryBand IDs
+ * @returns {Object} employees, total, meta, loading, setLoading, hasMore, loadMore, reload
+ */
+export default function useEmployeesData(searchQuery = '', filters = {}) {
   const [employees, setEmployees] = useState([]);
+  const [total, setTotal] = useState(0);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
   const [meta, setMeta] = useState({
     divisions: [],
@@ -18,46 +64,84 @@ export default function useEmployeesData() {
     salaryBands: []
   });
 
+  const params = buildEmployeeParams(searchQuery, filters);
+  const [debouncedParams, setDebouncedParams] = useState(params);
+
+  useEffect(() => {
+    const timeout = setTimeout(() => setDebouncedParams(params), SEARCH_DEBOUNCE_MS);
+    return () => clearTimeout(timeout);
+  }, [params]);
+
   useEffect(() => {
-    async function fetchData() {
-      setLoading(true);
+    async function fetchMeta() {
       try {
-        const [employeeRes, divisionRes, rankRes, positionRes, departmentRes, bandRes] = await Promise.all([
-          fetch(`${API_URL}/employees/`),
+        const [divisionRes, rankRes, positionRes, departmentRes, bandRes] = await Promise.all([
           fetch(`${API_URL}/divisions/`),
           fetch(`${API_URL}/ranks/`),
           fetch(`${API_URL}/positions/`),
           fetch(`${API_URL}/departments/`),
           fetch(`${API_URL}/bands/`)
         ]);
-        const [employeeData, divisions, ranks, positions, departments, bands] = await Promise.all([
-          employeeRes.json(), divisionRes.json(), rankRes.json(), positionRes.json(), departmentRes.json(), bandRes.json()
+        const [divisions, ranks, positions, departments, bands] = await Promise.all([
+          divisionRes.json(), rankRes.json(), positionRes.json(), departmentRes.json(), bandRes.json()
         ]);
-
-        const rankMap = Object.fromEntries(ranks.map(r => [r.id, r.name]));
-        const positionMap = Object.fromEntries(positions.map(p => [p.id, p.name]));
-        const departmentMap = Object.fromEntries(departments.map(d => [d.id, d.name]));
-
-        const enriched = employeeData.map(e => ({
-          ...e,
-          division: e.division_id,
-          rank: rankMap[e.rank_id],
-          position: positionMap[e.position_id],
-          department: departmentMap[e.department_id],
-          salary_band: e.salary_band_id
-        }));
-
-        setEmployees(enriched);
         setMeta({ divisions, ranks, positions, departments, salaryBands: bands });
       } catch (err) {
         console.error(err);
-      } finally {
-        setLoading(false);
       }
     }
 
-    fetchData();
+    fetchMeta();
   }, []);
 
-  return { employees, setEmployees, meta, loading, setLoading };
-}
\ No newline at end of file
+  const fetchPage = useCallback(async (cursor) => {
+    const query = new URLSearchParams(debouncedParams);
+    query.set('limit', PAGE_SIZE);
+    query.set('format', 'columnar');
+    if (cursor) query.set('cursor', cursor);
+    const res = await fetch(`${API_URL}/employees/enriched?${query}`);
+    if (!res.ok) throw new Error(`Failed to fetch employees (${res.status})`);
+    const page = await res.json();
+    return { ...page, items: columnsToEmployees(page.columns) };
+  }, [debouncedParams]);
+
+  /**
+   * Refetches the first page of employees for the current search and filters.
+   */
+  const reload = useCallback(async () => {
+    setLoading(true);
+    try {
+      const page = await fetchPage(null);
+      setEmployees(page.items);
+      setTotal(page.total);
+      setNextCursor(page.next_cursor);
+    } catch (err) {
+      console.error(err);
+      setEmployees([]);
+      setTotal(0);
+      setNextCursor(null);
+    } finally {
+      setLoading(false);
+    }
+  }, [fetchPage]);
+
+  useEffect(() => {
+    reload();
+  }, [reload]);
+
+  /**
+   * Appends the next page of employees, if there is one.
+   */
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    try {
+      const page = await fetchPage(nextCursor);
+      setEmployees(prev => [...prev, ...page.items]);
+      setNextCursor(page.next_cursor);
+    } catch (err) {
+      console.error(err);
+    }
+  };
+
+  return { employees, total, meta, loading, setLoading, hasMore: nextCursor !== null, loadMore, reload };
+}
@@ -1,4 +1,4 @@
-import { useMemo, useState } from 'react';
+import { useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { MdAdd, MdFileUpload, MdDelete } from "react-icons/md";
 
@@ -11,14 +11,6 @@ const API_URL = import.meta.env.VITE_API_URL;
 export default function EmployeeDashboard() {
   const navigate = useNavigate();
   
-  const {
-    employees,
-    setEmployees,
-    loading,
-    setLoading,
-    meta: { divisions, ranks, positions, departments, salaryBands },
-  } = useEmployeesData();
-
   const [searchQuery, setSearchQuery] = useState('');
   const [filters, setFilters] = useState({
     division: '',
@@ -28,39 +20,18 @@ export default function EmployeeDashboard() {
     salaryBand: '',
   });
 
-  const [selectedIds, setSelectedIds] = useState([]);
-
-  const filteredEmployees = useMemo(() => {
-    const qClean = searchQuery.trim();
-    const isIDSearch = qClean.startsWith('#');
-    const q = qClean.replace('#', '').toLowerCase();
-
-    return employees.filter(employee => {
-      const matchesSearch = isIDSearch
-        ? String(employee.id) === q
-        : [
-            `${employee.first_name} ${employee.surname}`,
-            new Date(employee.start_date).toLocaleDateString('en-GB'),
-            employee.rank,
-            employee.position,
-            employee.department,
-            employee.division_id,
-            employee.salary_band_id,
-            employee.contact_number,
-          ]
-            .map(val => String(val).toLowerCase())
-            .some(val => val.includes(q));
-
-      const matchesFilters =
-        (!filters.rank || employee.rank === filters.rank) &&
-        (!filters.position || employee.position === filters.position) &&
-        (!filters.department || employee.department === filters.department) &&
-        (!filters.division || String(employee.division_id) === filters.division) &&
-        (!filters.salaryBand || String(employee.salary_band_id) === filters.salaryBand);
+  const {
+    employees,
+    total,
+    loading,
+    setLoading,
+    hasMore,
+    loadMore,
+    reload,
+    meta: { divisions, ranks, positions, departments, salaryBands },
+  } = useEmployeesData(searchQuery, filters);
 
-      return matchesSearch && matchesFilters;
-    });
-  }, [searchQuery, employees, filters]);
+  const [selectedIds, setSelectedIds] = useState([]);
 
   /**
    * Deletes employees based on selected IDs.
@@ -79,23 +50,7 @@ export default function EmployeeDashboard() {
         )
       );
 
-      const res = await fetch(`${API_URL}/employees/`);
-      const newEmployeeData = await res.json();
-
-      const rankMap = Object.fromEntries(ranks.map(r => [r.id, r.name]));
-      const positionMap = Object.fromEntries(positions.map(p => [p.id, p.name]));
-      const departmentMap = Object.fromEntries(departments.map(d => [d.id, d.name]));
-
-      const enriched = newEmployeeData.map(employee => ({
-        ...employee,
-        rank: rankMap[employee.rank_id],
-        position: positionMap[employee.position_id],
-        department: departmentMap[employee.department_id],
-        salary_band: employee.salary_band_id,
-        division: employee.division_id,
-      }));
-
-      setEmployees(enriched);
+      await reload();
       setSelectedIds([]);
     } catch (err) {
       console.error('Error deleting employees:', err);
@@ -120,19 +75,19 @@ export default function EmployeeDashboard() {
             label="Rank"
             value={filters.rank}
             onChange={val => setFilters(prev => ({ ...prev, rank: val }))}
-            options={ranks.map(r => ({ label: r.name, value: r.name }))}
+            options={ranks.map(r => ({ label: r.name, value: r.id }))}
           />
           <FilterSelect
             label="Position"
             value={filters.position}
             onChange={val => setFilters(prev => ({ ...prev, position: val }))}
-            options={positions.map(p => ({ label: p.name, value: p.name }))}
+            options={positions.map(p => ({ label: p.name, value: p.id }))}
           />
           <FilterSelect
             label="Department"
             value={filters.department}
             onChange={val => setFilters(prev => ({ ...prev, department: val }))}
-            options={departments.map(d => ({ label: d.name, value: d.name }))}
+            options={departments.map(d => ({ label: d.name, value: d.id }))}
           />
           <FilterSelect
             label="Salary Band"
@@ -159,7 +114,7 @@ export default function EmployeeDashboard() {
         <div className="flex items-center justify-between mb-4 flex-wrap gap-2">
           <input
             type="text"
-            placeholder="Search"
+            placeholder="Search by name, or #ID"
             className="flex-1 min-w-[200px] max-w-[600px] p-2 border border-gray-300 rounded"
             value={searchQuery}
             onChange={e => setSearchQuery(e.target.value)}
@@ -189,8 +144,21 @@ export default function EmployeeDashboard() {
           </div>
         </div>
         <div className="overflow-x-auto">
-          <EmployeeTable employees={filteredEmployees} selectedIds={selectedIds} setSelectedIds={setSelectedIds} loading={loading} onRowClick={(id) => {navigate(`/employees/${id}`)}} />
+          <EmployeeTable employees={employees} selectedIds={selectedIds} setSelectedIds={setSelectedIds} loading={loading} onRowClick={(id) => {navigate(`/employees/${id}`)}} />
         </div>
+        {!loading && (
+          <div className="flex items-center justify-between mt-4 text-sm text-gray-600">
+            <span>Showing {employees.length} of {total} employees</span>
+            {hasMore && (
+              <button
+                className="py-2 px-4 bg-gray-200 rounded hover:bg-gray-300 cursor-pointer"
+                onClick={loadMore}
+              >
+                Load More
+              </button>
+            )}
+          </div>
+        )}
       </main>
     </div>
   );
@@ -10,6 +10,7 @@ export default function UploadEmployees() {
   const [divisions, setDivisions] = useState([]);
   const [error, setError] = useState('');
   const [loading, setLoading] = useState(false);
+  const [job, setJob] = useState(null);
 
   useEffect(() => {
     fetch(`${API_URL}/divisions/`)
@@ -32,6 +33,26 @@ export default function UploadEmployees() {
     setFile(uploaded || null);
   };
 
+  /**
+   * Follows an ingestion job's progress over server-sent events until it succeeds or fails.
+   * @returns {Promise<Object>} the finished job
+   */
+  const followJob = (jobId) => new Promise((resolve, reject) => {
+    const events = new EventSource(`${API_URL}/jobs/${jobId}/events`);
+    events.onmessage = (event) => {
+      const status = JSON.parse(event.data);
+      setJob(status);
+      if (status.state === 'succeeded' || status.state === 'failed') {
+        events.close();
+        resolve(status);
+      }
+    };
+    events.onerror = () => {
+      events.close();
+      reject(new Error('Lost connection to the upload job'));
+    };
+  });
+
   const handleSubmit = async (e) => {
     e.preventDefault();
     setError('');
@@ -50,10 +71,12 @@ export default function UploadEmployees() {
         body: formData,
       });
 
-      if (!res.ok) {
-        const data = await res.json();
-        throw new Error(data.detail || 'Upload failed');
-      }
+      const data = await res.json();
+      if (!res.ok) throw new Error(data.detail || 'Upload failed');
+
+      setJob(data);
+      const finished = await followJob(data.id);
+      if (finished.state === 'failed') throw new Error(finished.detail || 'Upload failed');
 
       navigate('/');
     } catch (err) {
@@ -87,6 +110,11 @@ export default function UploadEmployees() {
             className="block w-full p-2 border rounded"
           />
         </div>
+        {job && (
+          <p className="text-sm text-gray-600">
+            {job.state === 'queued' ? 'Queued...' : `Parsed ${job.rows_parsed} rows: ${job.created} created, ${job.updated} updated`}
+          </p>
+        )}
         {error && <p className="text-red-500 text-sm">{error}</p>}
         <button
           type="submit"